@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能回归测试套件
+
+对注册表中的每个模型（create_model_variants 中的三个变体、e2e.py 的 TorchModel、
+post_order_visit_demo 的 DemoModel、relax_analysis_demo 的 SimpleModel）测量：
+- 转换与编译时间
+- VM 推理延迟（time_evaluator 多次重复）
+- 内存：StaticPlanBlockMemory 规划后的分配字节数与嵌入参数字节数
+- 分析时间：well_formed、estimate_memory_usage、post_order_visit 全图遍历
+
+结果写成 JSON，并与保存的基线比较。计时类指标的判定考虑测量噪声：
+只有相对变化超过阈值、且中位数之差超过合并标准误差的 NOISE_SIGMAS 倍时才算回归。
+存在回归时以非零状态码退出，可直接用于 CI。
+
+用法:
+    python perf_suite.py --output results.json
+    python perf_suite.py --baseline baseline.json --output results.json
+    python perf_suite.py --output baseline.json --models small,torch_mlp
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import torch
+
+EXAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYSIS_DIR = os.path.join(EXAMPLE_DIR, "relax", "analysis")
+# 分析示例之间以模块名互相导入，需要把所在目录加入搜索路径
+for _path in (EXAMPLE_DIR, ANALYSIS_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import tvm  # noqa: E402
+from tvm import relax  # noqa: E402
+from tvm.relax.analysis import estimate_memory_usage, post_order_visit, well_formed  # noqa: E402
+from tvm.relax.frontend.torch import from_exported_program  # noqa: E402
+
+from e2e import TorchModel  # noqa: E402
+from memory_estimation_demo import LargeModel, MediumModel, SmallModel  # noqa: E402
+from memory_validation_harness import lower_for_memory_estimation  # noqa: E402
+from post_order_visit_demo import DemoModel  # noqa: E402
+from precision_conversion import parameter_bytes  # noqa: E402
+from relax_analysis_demo import SimpleModel  # noqa: E402
+from symbolic_memory_estimation import estimate_symbolic_memory_usage, evaluate_memory  # noqa: E402
+
+
+SCHEMA_VERSION = 1
+
+# 各类指标默认的相对回归阈值
+DEFAULT_THRESHOLDS = {
+    "latency": 0.10,
+    "compile": 0.25,
+    "analysis": 0.25,
+    "memory": 0.01,
+}
+
+# 中位数之差需超过合并标准误差的倍数才视为超出噪声
+NOISE_SIGMAS = 3.0
+
+
+def _model_registry():
+    """模型名称 -> (构造函数, 输入形状)；只登记类与形状，运行到某个模型时才构造它"""
+    # small / medium / large 与 create_model_variants 中的模型和输入形状一致
+    return {
+        "small": (SmallModel, (1, 10)),
+        "medium": (MediumModel, (1, 3, 32, 32)),
+        "large": (LargeModel, (1, 3, 32, 32)),
+        "torch_mlp": (TorchModel, (1, 784)),
+        "demo_cnn": (DemoModel, (1, 3, 32, 32)),
+        "simple": (SimpleModel, (1, 10)),
+    }
+
+
+def _metric(kind, samples, unit):
+    samples = [float(s) for s in samples]
+    return {
+        "kind": kind,
+        "unit": unit,
+        "value": float(np.median(samples)),
+        "std": float(np.std(samples)) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+def _timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, samples
+
+
+def _analysis_pass(mod):
+    func = mod["main"]
+    well_formed(mod)
+    estimate_memory_usage(mod)
+    count = 0
+
+    def visitor(_):
+        nonlocal count
+        count += 1
+
+    post_order_visit(func, visitor)
+    return count
+
+
+def benchmark_model(name, factory, input_shape, target="llvm", compile_repeat=1,
+                    number=10, repeat=20, analysis_repeat=5):
+    """
+    测量单个模型的所有指标，返回 {指标名: 指标字典}
+
+    异常:
+        RuntimeError: 模型 name 的导出或编译失败，原始异常作为 __cause__
+    """
+    print(f"[{name}] 测量中...")
+    model = factory().eval()
+    example_input = torch.randn(*input_shape)
+
+    def convert():
+        with torch.no_grad():
+            return from_exported_program(torch.export.export(model, (example_input,)))
+
+    try:
+        mod, convert_samples = _timed(convert, 1)
+        ex, compile_samples = _timed(lambda: tvm.compile(mod, target=target), compile_repeat)
+    except Exception as e:
+        raise RuntimeError(f"模型 {name} 导出或编译失败: {type(e).__name__}: {e}") from e
+
+    dev = tvm.cpu()
+    vm = relax.VirtualMachine(ex, dev)
+    input_nd = tvm.nd.array(example_input.numpy(), dev)
+    vm["main"](input_nd)
+    timing = vm.time_evaluator("main", dev, number=number, repeat=repeat)(input_nd)
+
+    _, after_plan = lower_for_memory_estimation(mod)
+    planned_bytes = evaluate_memory(estimate_symbolic_memory_usage(after_plan)["main"], {})["total"]
+
+    _, analysis_samples = _timed(lambda: _analysis_pass(mod), analysis_repeat)
+
+    return {
+        "convert_s": _metric("compile", convert_samples, "s"),
+        "compile_s": _metric("compile", compile_samples, "s"),
+        "latency_ms": _metric("latency", np.array(timing.results) * 1000, "ms"),
+        "planned_memory_bytes": _metric("memory", [planned_bytes], "bytes"),
+        "parameter_bytes": _metric("memory", [parameter_bytes(mod)], "bytes"),
+        "analysis_s": _metric("analysis", analysis_samples, "s"),
+    }
+
+
+def run_suite(model_names=None, target="llvm", **kwargs):
+    """运行套件，返回可直接写成 JSON 的结果字典"""
+    registry = _model_registry()
+    model_names = model_names or list(registry)
+    unknown = [name for name in model_names if name not in registry]
+    if unknown:
+        raise ValueError(f"未知模型: {unknown}，可选: {list(registry)}")
+
+    results = {
+        "schema_version": SCHEMA_VERSION,
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "tvm": tvm.__version__,
+            "torch": torch.__version__,
+            "target": str(target),
+        },
+        "models": {},
+    }
+    for name in model_names:
+        factory, input_shape = registry[name]
+        results["models"][name] = benchmark_model(name, factory, input_shape, target=target, **kwargs)
+    return results
+
+
+def _median_stderr(metric):
+    """中位数的标准误差，近似为 1.2533 * std / sqrt(n)"""
+    n = len(metric.get("samples", ())) or 1
+    return 1.2533 * metric.get("std", 0.0) / np.sqrt(n)
+
+
+def compare_results(current, baseline, thresholds=None, noise_sigmas=NOISE_SIGMAS):
+    """
+    与基线比较
+
+    对越小越好的指标，满足以下两个条件时判定为回归：
+    - 相对变化超过该类指标的阈值
+    - 差值超过 noise_sigmas 倍的两次中位数合并标准误差（单次测量的指标标准差为 0，只看阈值）
+    返回:
+        比较记录列表，每项包含 {'model', 'metric', 'baseline', 'current', 'change', 'status'}，
+        status 为 regression / improvement / unchanged / new
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    rows = []
+    for model, metrics in current["models"].items():
+        for metric, cur in metrics.items():
+            base = baseline.get("models", {}).get(model, {}).get(metric)
+            if base is None:
+                rows.append({"model": model, "metric": metric, "baseline": None,
+                             "current": cur["value"], "change": None, "status": "new"})
+                continue
+
+            delta = cur["value"] - base["value"]
+            change = delta / base["value"] if base["value"] else (0.0 if delta == 0 else float("inf"))
+            noise = noise_sigmas * np.hypot(_median_stderr(base), _median_stderr(cur))
+            threshold = thresholds[cur["kind"]]
+            if abs(change) > threshold and abs(delta) > noise:
+                status = "regression" if delta > 0 else "improvement"
+            else:
+                status = "unchanged"
+            rows.append({"model": model, "metric": metric, "baseline": base["value"],
+                         "current": cur["value"], "change": change, "status": status})
+    return rows
+
+
+def print_comparison(rows):
+    print(f"\n{'模型':<14}{'指标':<24}{'基线':>14}{'当前':>14}{'变化':>10}  状态")
+    for row in rows:
+        baseline = "-" if row["baseline"] is None else f"{row['baseline']:.6g}"
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        print(f"{row['model']:<14}{row['metric']:<24}{baseline:>14}{row['current']:>14.6g}{change:>10}  {row['status']}")
+    regressions = [row for row in rows if row["status"] == "regression"]
+    print(f"\n回归 {len(regressions)} 项，改进 {sum(row['status'] == 'improvement' for row in rows)} 项")
+    return regressions
+
+
+def _parse_thresholds(items):
+    thresholds = {}
+    for item in items or []:
+        kind, value = item.split("=")
+        if kind not in DEFAULT_THRESHOLDS:
+            raise argparse.ArgumentTypeError(f"未知指标类别: {kind}，可选: {list(DEFAULT_THRESHOLDS)}")
+        thresholds[kind] = float(value)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TVM 示例模型的性能回归测试套件")
+    parser.add_argument("--models", default=None, help="逗号分隔的模型名称，默认全部")
+    parser.add_argument("--list", action="store_true", help="列出注册的模型后退出")
+    parser.add_argument("--target", default="llvm", help="编译目标")
+    parser.add_argument("--output", default="perf_results.json", help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=None, help="基线 JSON 路径，提供时进行比较")
+    parser.add_argument("--threshold", action="append", metavar="KIND=REL",
+                        help="覆盖某类指标的相对阈值，如 latency=0.05，可重复")
+    parser.add_argument("--noise-sigmas", type=float, default=NOISE_SIGMAS, help="噪声判定的标准误差倍数")
+    parser.add_argument("--repeat", type=int, default=20, help="延迟测量的重复次数")
+    parser.add_argument("--number", type=int, default=10, help="每次重复内的运行次数")
+    parser.add_argument("--compile-repeat", type=int, default=1, help="编译时间测量的重复次数")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(_model_registry()))
+        return 0
+
+    results = run_suite(
+        args.models.split(",") if args.models else None,
+        target=args.target,
+        compile_repeat=args.compile_repeat,
+        number=args.number,
+        repeat=args.repeat,
+    )
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_results(results, baseline, _parse_thresholds(args.threshold), args.noise_sigmas)
+    return 1 if print_comparison(rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
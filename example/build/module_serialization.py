@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IRModule 二进制序列化
+
+转换、调优与构建各阶段之间传递模块时，通常使用 tvm.ir.save_json 的文本格式或重新运行
+from_exported_program。嵌入大量常量时两者都很慢：JSON 中的常量以 base64 内联，
+文件大约是原始数据的 1.33 倍，加载时需要整体解析文本并逐个解码。
+
+本文件提供一种二进制格式（.tvmb）：
+- 节点表：save_json 的节点图编码为整数数组，所有字符串（类型名、字段名、属性值）进入一张去重的字符串表，
+  内容完全相同的节点记录只存一份，节点位置通过记录编号引用
+- 常量：原始字节以页对齐的形式存放在节点表之后，可选按常量单独压缩（zlib / lzma / zstd）
+- 加载：未压缩的 Relax 常量直接从 mmap 的文件映射构造 NDArray（DLPack 零拷贝），不经过 base64
+
+文件布局：
+    MAGIC | 节点表各段 | 页对齐的常量数据 | 尾部 JSON 目录 | 目录长度 (uint64) | MAGIC
+"""
+
+import base64
+import json
+import lzma
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+import torch
+import tvm
+from torch import nn
+from torch.export import export
+from tvm import relax
+from tvm.relax.frontend.torch import from_exported_program
+
+
+MAGIC = b"TVMBIR\x00\x01"
+FORMAT_VERSION = 1
+BINARY_SUFFIX = ".tvmb"
+PAGE_SIZE = mmap.PAGESIZE
+
+# save_json 中 NDArray 的二进制头（runtime::SaveDLTensor）
+_NDARRAY_MAGIC = 0xDD5E40F096B4A13F
+# 延迟绑定常量时使用的占位数组：int64[2] = [_PLACEHOLDER_MAGIC, 常量编号]
+_PLACEHOLDER_MAGIC = 0x74766D6269720001
+_RELAX_CONSTANT_TYPE_KEYS = ("relax.expr.Constant",)
+
+# 节点记录中字段值的类型标记
+_STR, _STR_MAP, _STR_LIST, _INT_LIST, _INT = range(5)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(data, codec, level):
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.compress(data, 6 if level is None else level)
+    if codec == "lzma":
+        return lzma.compress(data, preset=6 if level is None else level)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("codec='zstd' 需要安装 zstandard")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    raise ValueError(f"不支持的压缩方式: {codec}，可选 none / zlib / lzma / zstd")
+
+
+def _decompress(data, codec):
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lzma":
+        return lzma.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("读取 zstd 压缩的文件需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"未知的压缩方式: {codec}")
+
+
+class _UnsupportedLayout(Exception):
+    """节点图的结构不是预期的 {字段: 字符串 / 整数 / 字符串字典 / 列表}，改用 JSON 段保存"""
+
+
+class _NodeTableEncoder:
+    def __init__(self):
+        self.strings = {}
+        self.records = {}
+
+    def intern(self, value):
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def encode_node(self, node):
+        if not isinstance(node, dict):
+            raise _UnsupportedLayout(type(node).__name__)
+        intern = self.intern
+        out = [len(node)]
+        for field, value in node.items():
+            out.append(intern(field))
+            if isinstance(value, str):
+                out += [_STR, intern(value)]
+            elif isinstance(value, int) and not isinstance(value, bool):
+                out += [_INT, value]
+            elif isinstance(value, dict) and all(isinstance(v, str) for v in value.values()):
+                out += [_STR_MAP, len(value)]
+                for key, item in value.items():
+                    out += [intern(key), intern(item)]
+            elif isinstance(value, list) and all(isinstance(v, str) for v in value) and value:
+                out += [_STR_LIST, len(value)] + [intern(v) for v in value]
+            elif isinstance(value, list) and all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+                out += [_INT_LIST, len(value)] + value
+            else:
+                raise _UnsupportedLayout(f"{field}: {type(value).__name__}")
+        record = tuple(out)
+        index = self.records.get(record)
+        if index is None:
+            index = self.records[record] = len(self.records)
+        return index
+
+
+def _encode_node_table(nodes):
+    """返回 ({段名: 字节}, 统计)；节点图不符合预期结构时抛出 _UnsupportedLayout"""
+    encoder = _NodeTableEncoder()
+    node_records = np.fromiter((encoder.encode_node(node) for node in nodes), dtype=np.uint32, count=len(nodes))
+    flat = [value for record in encoder.records for value in record]
+    strings = list(encoder.strings)
+    sections = {
+        "string_lengths": np.array([len(s) for s in strings], dtype=np.uint32).tobytes(),
+        "string_data": "".join(strings).encode("utf-8", "surrogatepass"),
+        "records": np.array(flat, dtype=np.int64).tobytes(),
+        "node_records": node_records.tobytes(),
+    }
+    stats = {"num_nodes": len(nodes), "num_records": len(encoder.records), "num_strings": len(strings)}
+    return sections, stats
+
+
+def _decode_node_table(sections, num_records):
+    text = sections["string_data"].decode("utf-8", "surrogatepass")
+    ends = np.cumsum(np.frombuffer(sections["string_lengths"], dtype=np.uint32), dtype=np.int64).tolist()
+    strings = [text[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+    flat = np.frombuffer(sections["records"], dtype=np.int64).tolist()
+    records = []
+    pos = 0
+    for _ in range(num_records):
+        node = {}
+        num_fields = flat[pos]
+        pos += 1
+        for _ in range(num_fields):
+            field, kind = strings[flat[pos]], flat[pos + 1]
+            pos += 2
+            if kind == _STR:
+                node[field] = strings[flat[pos]]
+                pos += 1
+            elif kind == _INT:
+                node[field] = flat[pos]
+                pos += 1
+            elif kind == _STR_MAP:
+                count = flat[pos]
+                items = flat[pos + 1:pos + 1 + 2 * count]
+                node[field] = {strings[k]: strings[v] for k, v in zip(items[::2], items[1::2])}
+                pos += 1 + 2 * count
+            else:
+                count = flat[pos]
+                items = flat[pos + 1:pos + 1 + count]
+                node[field] = [strings[v] for v in items] if kind == _STR_LIST else items
+                pos += 1 + count
+        records.append(node)
+    # 相同的记录在 JSON 中重复出现即可，load_json 按位置建立节点
+    return [records[index] for index in np.frombuffer(sections["node_records"], dtype=np.uint32).tolist()]
+
+
+def _numpy_dtype(code, bits, lanes):
+    """DLDataType -> numpy dtype 字符串；无法直接映射（bfloat16、向量类型等）时返回 None"""
+    if lanes != 1:
+        return None
+    if code == 0 and bits in (8, 16, 32, 64):
+        return f"int{bits}"
+    if code == 1 and bits in (8, 16, 32, 64):
+        return f"uint{bits}"
+    if code == 1 and bits == 1:
+        return "bool"
+    if code == 2 and bits in (16, 32, 64):
+        return f"float{bits}"
+    return None
+
+
+def _split_ndarray(raw):
+    """
+    把 save_json 中的 NDArray 字节拆分为 (头, 数据, dtype, shape)
+
+    无法识别的格式整体作为头返回，加载时原样还原。
+    """
+    if len(raw) < 40:
+        return raw, b"", None, None
+    magic, _, _, _, ndim = struct.unpack_from("<QQiii", raw, 0)
+    code, bits, lanes = struct.unpack_from("<BBH", raw, 28)
+    data_offset = 40 + 8 * ndim
+    if magic != _NDARRAY_MAGIC or len(raw) < data_offset:
+        return raw, b"", None, None
+    shape = list(struct.unpack_from(f"<{ndim}q", raw, 32))
+    (nbytes,) = struct.unpack_from("<q", raw, 32 + 8 * ndim)
+    if nbytes != len(raw) - data_offset:
+        return raw, b"", None, None
+    dtype = _numpy_dtype(code, bits, lanes)
+    if dtype is not None and int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize != nbytes:
+        dtype = None
+    return raw[:data_offset], raw[data_offset:], dtype, shape
+
+
+def _placeholder_b64(index):
+    header = struct.pack("<QQiii", _NDARRAY_MAGIC, 0, 1, 0, 1) + struct.pack("<BBH", 0, 64, 1)
+    header += struct.pack("<qq", 2, 16)
+    return base64.b64encode(header + struct.pack("<qq", _PLACEHOLDER_MAGIC, index)).decode("ascii")
+
+
+def _lazy_constant_indices(nodes, num_arrays):
+    """只被 Relax Constant 引用的常量编号；TIR 中的常量等其它引用方式保持内联"""
+    relax_refs, other_refs = set(), set()
+    for node in nodes:
+        attrs = node.get("attrs") if isinstance(node, dict) else None
+        if not isinstance(attrs, dict) or not str(attrs.get("data", "")).isdigit():
+            continue
+        target = relax_refs if node.get("type_key") in _RELAX_CONSTANT_TYPE_KEYS else other_refs
+        target.add(int(attrs["data"]))
+    return {i for i in relax_refs - other_refs if i < num_arrays}
+
+
+def save_module_binary(mod, path, codec="none", level=None, compress_structure=True):
+    """
+    以二进制格式保存 IRModule
+
+    参数:
+        mod: 要保存的 IRModule
+        path: 输出路径，建议使用 .tvmb 后缀
+        codec: 常量数据的压缩方式，none / zlib / lzma / zstd；none 时加载可零拷贝映射
+        level: 压缩级别，None 使用各压缩方式的默认值
+        compress_structure: 节点表各段是否使用 zlib 压缩（体积小、解压快，默认开启）
+    返回:
+        文件字节数
+    """
+    graph = json.loads(tvm.ir.save_json(mod))
+    arrays = graph.pop("b64ndarrays", [])
+    nodes = graph.pop("nodes", None)
+    lazy = _lazy_constant_indices(nodes, len(arrays)) if isinstance(nodes, list) else set()
+
+    try:
+        if not isinstance(nodes, list):
+            raise _UnsupportedLayout("nodes")
+        sections, stats = _encode_node_table(nodes)
+        node_format = "table"
+    except _UnsupportedLayout:
+        # 未来版本的 JSON 结构变化时仍能保存，只是没有节点去重
+        if nodes is not None:
+            graph["nodes"] = nodes
+        sections = {"graph_json": json.dumps(graph, separators=(",", ":")).encode("utf-8")}
+        stats = {"num_nodes": len(nodes) if isinstance(nodes, list) else None}
+        node_format = "json"
+        graph = {}
+
+    structure_codec = "zlib" if compress_structure else "none"
+    footer = {
+        "version": FORMAT_VERSION,
+        "node_format": node_format,
+        "graph_fields": graph,
+        "stats": stats,
+        "sections": {},
+        "constants": [],
+    }
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for name, data in sections.items():
+            packed = _compress(data, structure_codec, 1)
+            footer["sections"][name] = {
+                "offset": f.tell(), "nbytes": len(packed), "raw_nbytes": len(data), "codec": structure_codec,
+            }
+            f.write(packed)
+
+        for index, encoded in enumerate(arrays):
+            header, data, dtype, shape = _split_ndarray(base64.b64decode(encoded))
+            packed = _compress(data, codec, level)
+            # 压缩后没有变小的常量按原样保存，加载时仍可零拷贝映射
+            entry_codec = codec if len(packed) < len(data) else "none"
+            f.write(b"\0" * (-f.tell() % PAGE_SIZE))
+            footer["constants"].append({
+                "header": base64.b64encode(header).decode("ascii"),
+                "offset": f.tell(),
+                "nbytes": len(packed) if entry_codec != "none" else len(data),
+                "raw_nbytes": len(data),
+                "codec": entry_codec,
+                "dtype": dtype,
+                "shape": shape,
+                "relax_constant": index in lazy,
+            })
+            f.write(packed if entry_codec != "none" else data)
+
+        footer_bytes = json.dumps(footer, separators=(",", ":")).encode("utf-8")
+        f.write(footer_bytes)
+        f.write(struct.pack("<Q", len(footer_bytes)))
+        f.write(MAGIC)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_footer(path):
+    """读取文件尾部的目录（段、常量与统计信息），不加载模块"""
+    with open(path, "rb") as f:
+        f.seek(-(8 + len(MAGIC)), os.SEEK_END)
+        (footer_len,) = struct.unpack("<Q", f.read(8))
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是 IRModule 二进制文件")
+        f.seek(-(8 + len(MAGIC) + footer_len), os.SEEK_END)
+        footer = json.loads(f.read(footer_len))
+        f.seek(0)
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 文件头损坏")
+    if footer["version"] > FORMAT_VERSION:
+        raise ValueError(f"{path} 的格式版本 {footer['version']} 高于当前支持的 {FORMAT_VERSION}")
+    return footer
+
+
+def _to_ndarray(array, zero_copy):
+    if zero_copy:
+        try:
+            # 映射为 ACCESS_COPY，数组可写，满足 DLPack 导出要求；数据页对齐，满足 NDArray 的对齐要求
+            return tvm.nd.from_dlpack(array)
+        except Exception:  # pylint: disable=broad-except
+            pass
+    return tvm.nd.array(np.ascontiguousarray(array))
+
+
+@relax.expr_functor.mutator
+class _ConstantBinder(relax.PyExprMutator):
+    """把加载时的占位常量替换为实际数据"""
+
+    def __init__(self, mod, resolve):
+        super().__init__(mod)
+        self.mod_ = mod
+        self.resolve = resolve
+
+    def transform(self):
+        for gvar, func in self.mod_.functions_items():
+            if isinstance(func, relax.Function):
+                self.builder_.update_func(gvar, self.visit_expr(func))
+        return self.builder_.get()
+
+    def visit_constant_(self, const):
+        data = const.data
+        if str(data.dtype) != "int64" or tuple(data.shape) != (2,):
+            return const
+        magic, index = data.numpy().tolist()
+        if magic != _PLACEHOLDER_MAGIC:
+            return const
+        return relax.Constant(self.resolve(index), span=const.span)
+
+
+def load_module_binary(path, use_mmap=True, lazy_constants=True):
+    """
+    加载 save_module_binary 保存的模块
+
+    参数:
+        path: 文件路径
+        use_mmap: 未压缩的 Relax 常量直接引用文件映射（零拷贝），文件在模块存活期间需保持不变
+        lazy_constants: Relax 常量不经过 base64 / JSON，加载后直接绑定；
+            关闭时所有常量内联到 JSON 中，由 load_json 解码（用于排查问题）
+    返回:
+        IRModule
+    """
+    footer = read_footer(path)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    def section(name):
+        entry = footer["sections"][name]
+        return _decompress(mm[entry["offset"]:entry["offset"] + entry["nbytes"]], entry["codec"])
+
+    if footer["node_format"] == "table":
+        graph = dict(footer["graph_fields"])
+        graph["nodes"] = _decode_node_table(
+            {name: section(name) for name in footer["sections"]}, footer["stats"]["num_records"]
+        )
+    else:
+        graph = json.loads(section("graph_json"))
+
+    constants = footer["constants"]
+    lazy = {}
+    arrays = []
+    for index, entry in enumerate(constants):
+        if lazy_constants and entry["relax_constant"] and entry["dtype"] is not None:
+            lazy[index] = entry
+            arrays.append(_placeholder_b64(index))
+            continue
+        data = _decompress(mm[entry["offset"]:entry["offset"] + entry["nbytes"]], entry["codec"])
+        arrays.append(base64.b64encode(base64.b64decode(entry["header"]) + data).decode("ascii"))
+    graph["b64ndarrays"] = arrays
+    mod = tvm.ir.load_json(json.dumps(graph, separators=(",", ":")))
+
+    mapped = False
+
+    def resolve(index):
+        nonlocal mapped
+        entry = lazy[index]
+        zero_copy = use_mmap and entry["codec"] == "none"
+        if zero_copy:
+            mapped = True
+            buffer, offset = mm, entry["offset"]
+        else:
+            buffer, offset = _decompress(mm[entry["offset"]:entry["offset"] + entry["nbytes"]], entry["codec"]), 0
+        count = entry["raw_nbytes"] // np.dtype(entry["dtype"]).itemsize
+        array = np.frombuffer(buffer, dtype=entry["dtype"], count=count, offset=offset).reshape(entry["shape"])
+        return _to_ndarray(array, zero_copy)
+
+    if lazy:
+        mod = _ConstantBinder(mod, resolve).transform()
+    if not mapped:
+        mm.close()
+    return mod
+
+
+def describe_module_binary(path):
+    """文件各部分的大小与节点去重统计"""
+    footer = read_footer(path)
+    sections = footer["sections"]
+    constants = footer["constants"]
+    return {
+        **footer["stats"],
+        "file_bytes": os.path.getsize(path),
+        "structure_bytes": sum(s["nbytes"] for s in sections.values()),
+        "structure_raw_bytes": sum(s["raw_nbytes"] for s in sections.values()),
+        "num_constants": len(constants),
+        "constant_bytes": sum(c["nbytes"] for c in constants),
+        "constant_raw_bytes": sum(c["raw_nbytes"] for c in constants),
+        "mmap_constants": sum(c["relax_constant"] and c["dtype"] is not None and c["codec"] == "none"
+                              for c in constants),
+    }
+
+
+class TransformerModel(nn.Module):
+    """基准测试用的 pre-LN Transformer 编码器，默认约 2500 万参数"""
+
+    def __init__(self, d_model=512, num_heads=8, num_layers=8, ffn_ratio=4):
+        super().__init__()
+        self.num_heads = num_heads
+        self.layers = nn.ModuleList()
+        for _ in range(num_layers):
+            self.layers.append(nn.ModuleDict({
+                "ln1": nn.LayerNorm(d_model),
+                "qkv": nn.Linear(d_model, 3 * d_model),
+                "proj": nn.Linear(d_model, d_model),
+                "ln2": nn.LayerNorm(d_model),
+                "fc1": nn.Linear(d_model, ffn_ratio * d_model),
+                "fc2": nn.Linear(ffn_ratio * d_model, d_model),
+            }))
+        self.ln_f = nn.LayerNorm(d_model)
+
+    def _attention(self, layer, x):
+        b, s, d = x.shape
+        h = self.num_heads
+        q, k, v = layer["qkv"](x).chunk(3, dim=-1)
+        q, k, v = (t.reshape(b, s, h, d // h).transpose(1, 2) for t in (q, k, v))
+        scores = torch.matmul(q, k.transpose(-2, -1)) * (d // h) ** -0.5
+        out = torch.matmul(torch.softmax(scores, dim=-1), v)
+        return layer["proj"](out.transpose(1, 2).reshape(b, s, d))
+
+    def forward(self, x):
+        for layer in self.layers:
+            x = x + self._attention(layer, layer["ln1"](x))
+            x = x + layer["fc2"](torch.nn.functional.gelu(layer["fc1"](layer["ln2"](x))))
+        return self.ln_f(x)
+
+
+def _convert(model, input_shape):
+    with torch.no_grad():
+        return from_exported_program(export(model.eval(), (torch.randn(*input_shape),)))
+
+
+def create_benchmark_modules(include_transformer=True):
+    """各分析示例中的模型（常量嵌入）以及大型 Transformer"""
+    analysis_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "relax", "analysis")
+    if analysis_dir not in sys.path:
+        sys.path.insert(0, analysis_dir)
+    from memory_estimation_demo import convert_to_relax, create_model_variants
+    from post_order_visit_demo import DemoModel
+    from relax_analysis_demo import SimpleModel
+
+    modules = {name: convert_to_relax(info) for name, info in create_model_variants().items()}
+    modules["demo_cnn"] = _convert(DemoModel(), (1, 3, 32, 32))
+    modules["simple"] = _convert(SimpleModel(), (1, 10))
+    if include_transformer:
+        modules["transformer"] = _convert(TransformerModel(), (1, 128, 512))
+        # 合法化后包含大量 PrimFunc，节点表的规模远大于常量
+        modules["transformer_legalized"] = relax.transform.LegalizeOps()(modules["transformer"])
+    return modules
+
+
+def _best_of(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def benchmark_serialization(modules, out_dir, codecs=("none", "zlib"), repeat=3, verify=True):
+    """
+    对比 save_json / load_json 与二进制格式的文件大小、保存时间与加载时间
+
+    参数:
+        modules: {名称: IRModule}
+        out_dir: 临时文件目录
+        codecs: 参与对比的常量压缩方式
+        repeat: 每项计时取 repeat 次中的最小值
+        verify: 检查加载结果与原模块结构相等
+    返回:
+        行列表，每行 {'model', 'format', 'bytes', 'save_s', 'load_s'}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = []
+    for name, mod in modules.items():
+        json_path = os.path.join(out_dir, f"{name}.json")
+
+        def save_json():
+            with open(json_path, "w") as f:
+                f.write(tvm.ir.save_json(mod))
+
+        def load_json():
+            with open(json_path) as f:
+                return tvm.ir.load_json(f.read())
+
+        _, save_s = _best_of(save_json, repeat)
+        _, load_s = _best_of(load_json, repeat)
+        rows.append({"model": name, "format": "json", "bytes": os.path.getsize(json_path),
+                     "save_s": save_s, "load_s": load_s})
+
+        for codec in codecs:
+            bin_path = os.path.join(out_dir, f"{name}.{codec}{BINARY_SUFFIX}")
+            _, save_s = _best_of(lambda: save_module_binary(mod, bin_path, codec=codec), repeat)
+            loaded, load_s = _best_of(lambda: load_module_binary(bin_path), repeat)
+            if verify:
+                tvm.ir.assert_structural_equal(loaded, mod)
+            rows.append({"model": name, "format": f"binary/{codec}", "bytes": os.path.getsize(bin_path),
+                         "save_s": save_s, "load_s": load_s, **describe_module_binary(bin_path)})
+    return rows
+
+
+def print_serialization_report(rows):
+    print(f"{'模型':<24}{'格式':<16}{'大小 (MB)':>12}{'保存 (s)':>12}{'加载 (s)':>12}{'节点/记录':>16}")
+    json_rows = {row["model"]: row for row in rows if row["format"] == "json"}
+    for row in rows:
+        base = json_rows[row["model"]]
+        dedup = f"{row['num_nodes']}/{row['num_records']}" if row.get("num_records") else "-"
+        print(f"{row['model']:<24}{row['format']:<16}{row['bytes'] / 2 ** 20:>12.2f}"
+              f"{row['save_s']:>12.3f}{row['load_s']:>12.3f}{dedup:>16}")
+        if row is not base:
+            print(f"{'':<40}大小 {row['bytes'] / base['bytes']:.2f}x，"
+                  f"保存 {base['save_s'] / row['save_s']:.1f}x 加速，加载 {base['load_s'] / row['load_s']:.1f}x 加速")
+
+
+def demo_module_serialization(out_dir="./serialized_modules", include_transformer=True):
+    """在示例模型与大型 Transformer 上对比 JSON 与二进制格式"""
+    print("=== IRModule 二进制序列化演示 ===")
+    modules = create_benchmark_modules(include_transformer)
+    rows = benchmark_serialization(modules, out_dir)
+    print_serialization_report(rows)
+
+
+if __name__ == "__main__":
+    demo_module_serialization()
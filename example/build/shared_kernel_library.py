@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨模型共享内核库
+
+分别用 tvm.compile 编译 small / medium / large 等模型变体，或同一结构的多个微调版本时，
+结构相同的 PrimFunc（同形状的 matmul、add、relu 等）会在每个模型中各编译一次，
+生成的机器码也在每个 .so 中各存一份。本文件提供共享内核库构建模式：
+- 每个模型按 incremental_build.py 的方式降低，PrimFunc 按 (名称 + 结构哈希, target) 命名
+- 所有模型中去重后的内核只编译一次，写入共享内核库；库以分片追加，已有分片从不重写，
+  之后加入的模型只编译库中还没有的内核
+- 每个模型的可执行文件只包含 VM 字节码与常量，通过 ExternFunc 按符号调用内核
+- 运行时每个分片只加载一次，导入到各模型的可执行文件中，同一进程中的模型共用一份内核代码
+
+清单文件记录各分片包含的内核符号与各模型依赖的内核，跨进程复用。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import torch
+import tvm
+from tvm import relax
+
+from incremental_build import IncrementalBuilder, _target_digest, link_lowered_functions
+
+
+class SharedKernelLibrary:
+    """
+    共享内核库
+
+    参数:
+        lib_dir: 内核库分片、模型可执行文件与清单的存放目录
+        target: 编译目标，如 "llvm"；不同 target 的库使用不同的清单，可放在同一目录
+        relax_pipeline: Relax 流水线，默认使用 relax.get_default_pipeline(target)
+    """
+
+    def __init__(self, lib_dir, target="llvm", relax_pipeline=None):
+        self.lib_dir = lib_dir
+        os.makedirs(lib_dir, exist_ok=True)
+        self.builder = IncrementalBuilder(target, relax_pipeline)
+        self.target = self.builder.target
+        self.digest = _target_digest(self.builder.target_key)
+        self.manifest_path = os.path.join(lib_dir, f"manifest_{self.digest}.json")
+        self.manifest = {"target": self.builder.target_key, "shards": [], "models": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+        # 内核符号 -> 所在分片文件名
+        self._kernel_shard = {
+            symbol: shard["path"] for shard in self.manifest["shards"] for symbol in shard["symbols"]
+        }
+        # 尚未编译的内核与尚未构建的模型
+        self._pending_kernels = {}
+        self._pending_models = {}
+        # 分片文件名 -> 已加载的运行时模块，同一进程中只加载一次
+        self._loaded_shards = {}
+        self.last_stats = {}
+
+    @property
+    def kernels(self):
+        """库中已编译的全部内核符号"""
+        return set(self._kernel_shard)
+
+    @property
+    def models(self):
+        return sorted(self.manifest["models"])
+
+    def add_model(self, name, mod):
+        """
+        降低模型并登记其内核，实际编译推迟到 build()
+
+        返回:
+            {'kernels': 模型使用的内核数, 'shared': 库中或已登记模型中已有的内核数, 'new': 新内核数}
+        """
+        lowered_funcs, kernels = self.builder.lower_module(mod)
+        new = [s for s in kernels if s not in self._kernel_shard and s not in self._pending_kernels]
+        for symbol in new:
+            self._pending_kernels[symbol] = kernels[symbol]
+        self._pending_models[name] = (lowered_funcs, sorted(kernels))
+        return {"kernels": len(kernels), "shared": len(kernels) - len(new), "new": len(new)}
+
+    def _path(self, filename):
+        return os.path.join(self.lib_dir, filename)
+
+    def _write_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _build_shard(self):
+        """把所有待编译的内核编译为一个新分片"""
+        symbols = sorted(self._pending_kernels)
+        funcs = {s: self._pending_kernels[s].with_attr("global_symbol", s) for s in symbols}
+        shard_id = hashlib.sha1("\n".join(symbols).encode("utf-8")).hexdigest()[:12]
+        filename = f"kernels_{len(self.manifest['shards']):04d}_{shard_id}_{self.digest}.so"
+
+        tvm.tir.build(tvm.IRModule(funcs), target=self.target).export_library(self._path(filename))
+        self.manifest["shards"].append({"path": filename, "symbols": symbols})
+        for symbol in symbols:
+            self._kernel_shard[symbol] = filename
+        self._pending_kernels = {}
+        return filename
+
+    def build(self):
+        """
+        编译待编译的内核（一个新分片），并为每个待构建的模型生成不含内核的可执行文件
+
+        返回:
+            {'kernels_compiled', 'models_built', 'kernel_time_s', 'link_time_s', 'shard'}
+        """
+        stats = {"kernels_compiled": len(self._pending_kernels), "models_built": len(self._pending_models)}
+        start = time.perf_counter()
+        stats["shard"] = self._build_shard() if self._pending_kernels else None
+        stats["kernel_time_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for name, (lowered_funcs, symbols) in self._pending_models.items():
+            filename = f"{name}_{self.digest}.so"
+            link_lowered_functions(lowered_funcs, self.target).export_library(self._path(filename))
+            self.manifest["models"][name] = {"path": filename, "kernels": symbols}
+        stats["link_time_s"] = time.perf_counter() - start
+        self._pending_models = {}
+
+        self._write_manifest()
+        self.last_stats = stats
+        return stats
+
+    def _shard(self, filename):
+        if filename not in self._loaded_shards:
+            self._loaded_shards[filename] = tvm.runtime.load_module(self._path(filename))
+        return self._loaded_shards[filename]
+
+    def load(self, name, device=None):
+        """
+        加载模型的可执行文件，导入其依赖的内核分片，返回 VirtualMachine
+
+        异常:
+            KeyError: 模型未构建
+        """
+        if name not in self.manifest["models"]:
+            raise KeyError(f"共享内核库中没有模型 {name}，已构建: {self.models}")
+        entry = self.manifest["models"][name]
+        executable = tvm.runtime.load_module(self._path(entry["path"]))
+        # VM 初始化时在导入的模块中按符号查找 ExternFunc，因此必须先导入内核分片
+        for filename in sorted({self._kernel_shard[s] for s in entry["kernels"]}):
+            executable.import_module(self._shard(filename))
+        return relax.VirtualMachine(executable, device or tvm.cpu())
+
+    def disk_bytes(self):
+        """{'kernels': 全部分片字节数, 'models': 全部模型可执行文件字节数}"""
+        return {
+            "kernels": sum(os.path.getsize(self._path(s["path"])) for s in self.manifest["shards"]),
+            "models": sum(os.path.getsize(self._path(m["path"])) for m in self.manifest["models"].values()),
+        }
+
+    def loaded_code_bytes(self, names):
+        """同一进程中加载 names 中的模型时，映射的共享库文件总字节数（每个分片只计一次）"""
+        files = {self.manifest["models"][n]["path"] for n in names}
+        files |= {self._kernel_shard[s] for n in names for s in self.manifest["models"][n]["kernels"]}
+        return sum(os.path.getsize(self._path(f)) for f in files)
+
+
+def create_model_family():
+    """
+    create_model_variants 中的三个模型，加上 medium 与 large 的“微调”版本
+
+    微调版本结构相同、权重不同，降低后内核完全相同，只有常量不同。
+    """
+    analysis_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "relax", "analysis")
+    if analysis_dir not in sys.path:
+        sys.path.insert(0, analysis_dir)
+    from memory_estimation_demo import LargeModel, MediumModel, convert_to_relax, create_model_variants
+
+    variants = create_model_variants()
+    for name, model_cls, count in [("medium", MediumModel, 2), ("large", LargeModel, 1)]:
+        for i in range(count):
+            variants[f"{name}_ft{i + 1}"] = dict(variants[name], model=model_cls())
+
+    modules = {}
+    inputs = {}
+    for name, info in variants.items():
+        with torch.no_grad():
+            modules[name] = convert_to_relax(info)
+        inputs[name] = info["input"].numpy()
+    return modules, inputs
+
+
+def benchmark_shared_library(modules, inputs, out_dir, target="llvm"):
+    """
+    对比逐个 tvm.compile 与共享内核库的编译时间、磁盘占用与加载的代码量，并检查输出一致
+
+    返回:
+        {'separate': {...}, 'shared': {...}, 'kernels_total', 'kernels_unique', 'max_abs_diff'}
+    """
+    separate_dir = os.path.join(out_dir, "separate")
+    os.makedirs(separate_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    separate_paths = {}
+    for name, mod in modules.items():
+        separate_paths[name] = os.path.join(separate_dir, f"{name}.so")
+        tvm.compile(mod, target=target).export_library(separate_paths[name])
+    separate_bytes = sum(os.path.getsize(p) for p in separate_paths.values())
+    separate = {"compile_s": time.perf_counter() - start, "disk_bytes": separate_bytes, "loaded_code_bytes": separate_bytes}
+
+    # 从空库开始，否则上次运行留下的分片会让内核编译时间归零
+    shutil.rmtree(os.path.join(out_dir, "shared"), ignore_errors=True)
+    library = SharedKernelLibrary(os.path.join(out_dir, "shared"), target)
+    start = time.perf_counter()
+    kernels_total = sum(library.add_model(name, mod)["kernels"] for name, mod in modules.items())
+    lower_s = time.perf_counter() - start
+    build_stats = library.build()
+    disk = library.disk_bytes()
+    shared = {
+        "compile_s": time.perf_counter() - start,
+        "lower_s": lower_s,
+        "kernel_s": build_stats["kernel_time_s"],
+        "link_s": build_stats["link_time_s"],
+        "disk_bytes": disk["kernels"] + disk["models"],
+        "kernel_bytes": disk["kernels"],
+        "loaded_code_bytes": library.loaded_code_bytes(list(modules)),
+    }
+
+    max_abs_diff = 0.0
+    dev = tvm.cpu()
+    for name in modules:
+        x = tvm.nd.array(inputs[name], dev)
+        expected = relax.VirtualMachine(tvm.runtime.load_module(separate_paths[name]), dev)["main"](x)
+        actual = library.load(name, dev)["main"](x)
+        for e, a in zip(expected, actual):
+            max_abs_diff = max(max_abs_diff, float(np.max(np.abs(e.numpy() - a.numpy()))))
+
+    return {
+        "separate": separate,
+        "shared": shared,
+        "kernels_total": kernels_total,
+        "kernels_unique": len(library.kernels),
+        "max_abs_diff": max_abs_diff,
+    }
+
+
+def print_shared_library_report(result):
+    print(f"内核: 共 {result['kernels_total']} 个，去重后 {result['kernels_unique']} 个")
+    print(f"{'模式':<10}{'编译(s)':>10}{'磁盘(MB)':>12}{'加载代码(MB)':>16}")
+    for mode in ("separate", "shared"):
+        row = result[mode]
+        print(
+            f"{mode:<10}{row['compile_s']:>10.2f}{row['disk_bytes'] / 2**20:>12.2f}"
+            f"{row['loaded_code_bytes'] / 2**20:>16.2f}"
+        )
+    shared = result["shared"]
+    print(
+        f"共享模式耗时拆分: 降低 {shared['lower_s']:.2f} s，内核 {shared['kernel_s']:.2f} s，"
+        f"链接 {shared['link_s']:.2f} s；内核库 {shared['kernel_bytes'] / 2**20:.2f} MB"
+    )
+    print(f"输出最大绝对误差: {result['max_abs_diff']:.2e}")
+
+
+def demo_shared_kernel_library(out_dir="./shared_kernel_build"):
+    """共享内核库演示：多个模型变体与微调版本共用一份内核"""
+    print("=== 共享内核库演示 ===")
+    modules, inputs = create_model_family()
+    print(f"模型: {sorted(modules)}")
+    result = benchmark_shared_library(modules, inputs, out_dir)
+    print_shared_library_report(result)
+
+    # 重新打开库（只依赖清单，与在新进程中打开相同），再加入一个微调版本：只链接可执行文件，不重新编译内核
+    from memory_estimation_demo import MediumModel, convert_to_relax
+
+    library = SharedKernelLibrary(os.path.join(out_dir, "shared"))
+    x = torch.from_numpy(inputs["medium"])
+    with torch.no_grad():
+        mod = convert_to_relax({"model": MediumModel(), "input": x, "input_spec": [("input", x.shape, "float32")]})
+    print(f"追加 medium_ft3: {library.add_model('medium_ft3', mod)}")
+    print(f"构建: {library.build()}")
+    out = library.load("medium_ft3")["main"](tvm.nd.array(inputs["medium"]))
+    print(f"medium_ft3 输出形状: {out[0].shape}")
+    return result
+
+
+if __name__ == "__main__":
+    demo_shared_kernel_library()
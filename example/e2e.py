@@ -1,3 +1,5 @@
+import time
+
 import torch
 from torch import nn
 from torch.export import export
@@ -22,18 +24,23 @@ class TorchModel(nn.Module):
         return x
 
 
-# Give an example argument to torch.export
-example_args = (torch.randn(1, 784, dtype=torch.float32),)
+def convert_torch_model(model: nn.Module, input_shape: tuple = (1, 784)):
+    """
+    将 PyTorch 模型转换为 IRModule，参数与模块分离
+    返回:
+        (mod, params)，params 为 {"main": [参数列表]}
+    """
+    # Give an example argument to torch.export
+    example_args = (torch.randn(*input_shape, dtype=torch.float32),)
 
-# Convert the model to IRModule
-with torch.no_grad():
-    exported_program = export(TorchModel().eval(), example_args)
-    mod_from_torch = from_exported_program(
-        exported_program, keep_params_as_input=True, unwrap_unit_return_tuple=True
-    )
+    # Convert the model to IRModule
+    with torch.no_grad():
+        exported_program = export(model.eval(), example_args)
+        mod = from_exported_program(
+            exported_program, keep_params_as_input=True, unwrap_unit_return_tuple=True
+        )
+    return relax.frontend.detach_params(mod)
 
-mod_from_torch, params_from_torch = relax.frontend.detach_params(mod_from_torch)
-mod_from_torch.show()
 
 def benchmark_ir_module(
     mod: tvm.IRModule,
@@ -78,11 +85,11 @@ def benchmark_ir_module(
     
     # 预热
     for _ in range(warmup):
-        _ = vm[func_name](dummy_input, *(list(params_from_torch.values())[0]))
+        _ = vm[func_name](dummy_input, *(list(params.values())[0]))
 
     # 正式测试
     timing_res = vm.time_evaluator(func_name, device, number=1, repeat=repeat)(
-        dummy_input, *(list(params_from_torch.values())[0])
+        dummy_input, *(list(params.values())[0])
     )
 
     # 解析结果
@@ -155,10 +162,10 @@ def profiling_ir_module(
     
     # # 预热
     # for _ in range(warmup):
-    #     _ = vm[func_name](dummy_input, *(list(params_from_torch.values())[0]))
+    #     _ = vm[func_name](dummy_input, *(list(params.values())[0]))
 
     # 正式测试
-    profile_res = vm.profile(func_name, dummy_input, *(list(params_from_torch.values())[0]))
+    profile_res = vm.profile(func_name, dummy_input, *(list(params.values())[0]))
 
     # 解析结果
     stats = {
@@ -176,13 +183,119 @@ def profiling_ir_module(
 
     return stats
 
-profiling_ir_module(
-    mod=mod_from_torch,
-    params=params_from_torch,
-    target="llvm",
-    input_shape=(1, 784),
-    input_dtype="float32",
-)
+def _time_callable(fn, warmup: int, repeat: int) -> dict:
+    """
+    对三种后端使用同一计时方式：预热后逐次调用，统计墙钟时间
+    返回:
+        包含 mean/median/max/min/std 的性能指标字典（单位 ms）
+    """
+    for _ in range(warmup):
+        fn()
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times[i] = (time.perf_counter() - start) * 1000
+    return {
+        "mean_ms": float(times.mean()),
+        "median_ms": float(np.median(times)),
+        "max_ms": float(times.max()),
+        "min_ms": float(times.min()),
+        "std_ms": float(times.std()),
+    }
+
+
+def benchmark_against_pytorch(
+    model: nn.Module,
+    batch_sizes: tuple = (1, 8, 32, 128),
+    feature_shape: tuple = (784,),
+    target: str = "llvm",
+    num_threads: int = None,
+    warmup: int = 3,
+    repeat: int = 20,
+    rtol: float = 1e-4,
+    atol: float = 1e-4,
+) -> list:
+    """
+    在相同输入、相同线程数、相同统计方式下对比 TVM VM、PyTorch eager 与 torch.compile
+    参数:
+        model: 待测试的 PyTorch 模型
+        batch_sizes: 测试的批次大小，每个形状分别导出并编译 TVM 模块
+        feature_shape: 除批次维以外的输入形状
+        target: TVM 编译目标，仅支持 CPU（与 torch.compile 的 CPU inductor 后端对应）
+        num_threads: 三种后端共用的线程数，默认使用 PyTorch 当前的线程数
+        warmup: 预热次数，torch.compile 的首次调用（编译）单独计时，不计入预热
+        repeat: 正式测试重复次数
+        rtol / atol: 与 eager 输出比较时的容差
+    返回:
+        每个形状一项的结果列表，包含各后端的性能指标、输出误差与加速比
+    """
+    num_threads = num_threads or torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    tvm.get_global_func("runtime.config_threadpool")(0, num_threads)
+    device = tvm.cpu()
+
+    model = model.eval()
+    compiled_model = torch.compile(model, backend="inductor", dynamic=False)
+
+    results = []
+    for batch in batch_sizes:
+        shape = (batch, *feature_shape)
+        x = torch.randn(*shape, dtype=torch.float32)
+
+        # TVM：按当前形状导出、编译
+        mod, params = convert_torch_model(model, shape)
+        vm = relax.VirtualMachine(tvm.compile(mod, target=target), device)
+        # 在计时之外取出函数，避免每次迭代都查找 vm["main"]
+        tvm_main = vm["main"]
+        tvm_args = [tvm.nd.array(x.numpy(), device), *(list(params.values())[0])]
+
+        with torch.no_grad():
+            eager_out = model(x).numpy()
+            start = time.perf_counter()
+            compiled_out = compiled_model(x).numpy()
+            compile_s = time.perf_counter() - start
+            tvm_out = tvm_main(*tvm_args).numpy()
+
+            stats = {
+                "tvm": _time_callable(lambda: tvm_main(*tvm_args), warmup, repeat),
+                "eager": _time_callable(lambda: model(x), warmup, repeat),
+                "torch_compile": _time_callable(lambda: compiled_model(x), warmup, repeat),
+            }
+
+        parity = {}
+        for name, out in (("tvm", tvm_out), ("torch_compile", compiled_out)):
+            max_abs = float(np.max(np.abs(out - eager_out)))
+            parity[name] = {
+                "max_abs_error": max_abs,
+                "match": bool(np.allclose(out, eager_out, rtol=rtol, atol=atol)),
+            }
+
+        results.append({
+            "shape": shape,
+            "stats": stats,
+            "parity": parity,
+            "torch_compile_first_call_s": compile_s,
+            "speedup_vs_eager": stats["eager"]["median_ms"] / stats["tvm"]["median_ms"],
+            "speedup_vs_torch_compile": stats["torch_compile"]["median_ms"] / stats["tvm"]["median_ms"],
+        })
+
+    # 打印摘要
+    print(f"TVM vs PyTorch ({num_threads} threads, median ms)")
+    print(f"{'shape':<16}{'tvm':>10}{'eager':>10}{'compile':>10}{'vs eager':>10}{'vs compile':>12}  parity")
+    for r in results:
+        s = r["stats"]
+        parity = "ok" if all(p["match"] for p in r["parity"].values()) else (
+            "MISMATCH " + ", ".join(f"{k}={v['max_abs_error']:.2e}" for k, v in r["parity"].items())
+        )
+        print(
+            f"{str(r['shape']):<16}{s['tvm']['median_ms']:>10.4f}{s['eager']['median_ms']:>10.4f}"
+            f"{s['torch_compile']['median_ms']:>10.4f}{r['speedup_vs_eager']:>9.2f}x"
+            f"{r['speedup_vs_torch_compile']:>11.2f}x  {parity}"
+        )
+
+    return results
+
 
 # from tvm.relax.frontend import nn
 
@@ -244,4 +357,19 @@ profiling_ir_module(
 #             ]
 #         )(mod)
 
-#     mod.show()
\ No newline at end of file
+#     mod.show()
+
+
+if __name__ == "__main__":
+    mod_from_torch, params_from_torch = convert_torch_model(TorchModel())
+    mod_from_torch.show()
+
+    profiling_ir_module(
+        mod=mod_from_torch,
+        params=params_from_torch,
+        target="llvm",
+        input_shape=(1, 784),
+        input_dtype="float32",
+    )
+
+    benchmark_against_pytorch(TorchModel(), batch_sizes=(1, 8, 32, 128))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TVM Relax 分析结果缓存
+
+按 (分析名称, 函数结构哈希) 缓存 well_formed、detect_recursion、computable_at_compile_time、
+free_vars、bound_vars、estimate_memory_usage 等分析的结果：
+- 函数级分析逐个函数缓存，pass 未修改的函数直接命中，不会重新分析
+- 模块级分析以所有函数的结构哈希组合作为键，任一函数变化即失效
+- LRU 淘汰，容量有上限
+
+Relax 函数是不可变对象，pass 修改函数时必然产生新对象、结构哈希随之改变，
+因此缓存无需显式失效。
+"""
+
+from collections import OrderedDict
+
+import tvm
+from tvm import relax
+from tvm.relax.analysis import (
+    all_vars, bound_vars, computable_at_compile_time, detect_recursion,
+    estimate_memory_usage, free_vars, well_formed
+)
+
+
+# 分析名称 -> (分析函数, 作用范围, 结果是否包含函数内的 Var)
+ANALYSES = {
+    "well_formed": (well_formed, "module", False),
+    "detect_recursion": (detect_recursion, "module", False),
+    "computable_at_compile_time": (computable_at_compile_time, "function", True),
+    "free_vars": (free_vars, "function", True),
+    "bound_vars": (bound_vars, "function", True),
+    "estimate_memory_usage": (estimate_memory_usage, "function", False),
+}
+
+
+class AnalysisCache:
+    """
+    以结构哈希为键的分析结果 LRU 缓存
+
+    参数:
+        maxsize: 最多缓存的分析结果条数
+        hash_memo_size: 最多记住的 "函数对象 -> 结构哈希" 条数，
+            同一函数对象重复查询时无需重新计算哈希
+    """
+
+    def __init__(self, maxsize=1024, hash_memo_size=4096):
+        self.maxsize = maxsize
+        self.hash_memo_size = hash_memo_size
+        self._results = OrderedDict()
+        # TVM 对象按底层句柄哈希，同一 IR 节点的不同 Python 包装会命中同一条目
+        self._hash_memo = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def structural_hash(self, func):
+        """返回函数的结构哈希，对同一函数对象只计算一次"""
+        if func in self._hash_memo:
+            self._hash_memo.move_to_end(func)
+            return self._hash_memo[func]
+        value = tvm.ir.structural_hash(func)
+        self._hash_memo[func] = value
+        if len(self._hash_memo) > self.hash_memo_size:
+            self._hash_memo.popitem(last=False)
+        return value
+
+    def _module_key(self, mod):
+        return tuple(
+            sorted(
+                (gvar.name_hint, self.structural_hash(func))
+                for gvar, func in mod.functions_items()
+            )
+        )
+
+    def _lookup(self, key, subject):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        cached_subject, result = entry
+        # 哈希冲突时结构不相等，视为未命中
+        if not cached_subject.same_as(subject) and not tvm.ir.structural_equal(cached_subject, subject):
+            return None
+        self._results.move_to_end(key)
+        return entry
+
+    def _store(self, key, subject, result):
+        self._results[key] = (subject, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def run(self, name, target):
+        """
+        运行（或从缓存读取）指定分析
+
+        参数:
+            name: ANALYSES 中的分析名称
+            target: 函数级分析传入 relax.Function，模块级分析传入 IRModule
+        """
+        analysis, scope, returns_vars = ANALYSES[name]
+        if scope == "module":
+            if not isinstance(target, tvm.IRModule):
+                raise TypeError(f"分析 {name} 需要 IRModule，实际为 {type(target).__name__}")
+            key = (name, self._module_key(target))
+        else:
+            if not isinstance(target, relax.Function):
+                raise TypeError(f"分析 {name} 需要 relax.Function，实际为 {type(target).__name__}")
+            key = (name, self.structural_hash(target))
+
+        entry = self._lookup(key, target)
+        if entry is not None:
+            self.stats["hits"] += 1
+            cached_subject, result = entry
+            if returns_vars and not cached_subject.same_as(target):
+                result = _remap_vars(result, cached_subject, target)
+            return result
+
+        self.stats["misses"] += 1
+        result = analysis(target)
+        self._store(key, target, result)
+        return result
+
+    def run_per_function(self, name, mod):
+        """对模块中每个 Relax 函数运行函数级分析，未修改的函数直接命中缓存"""
+        return {
+            gvar.name_hint: self.run(name, func)
+            for gvar, func in mod.functions_items()
+            if isinstance(func, relax.Function)
+        }
+
+    def clear(self):
+        self._results.clear()
+        self._hash_memo.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+
+def _remap_vars(result, src_func, dst_func):
+    """
+    将缓存结果中的 Var 映射到结构相等的另一个函数中对应的 Var
+
+    结构相等的函数中变量的遍历顺序一致，因此可以按 all_vars 的顺序一一对应。
+    """
+    mapping = dict(zip(all_vars(src_func), all_vars(dst_func)))
+    return [mapping.get(var, var) for var in result]
+
+
+def demo_analysis_cache(mod):
+    """分析缓存演示"""
+    print("\n=== 分析结果缓存演示 ===")
+
+    cache = AnalysisCache(maxsize=64)
+
+    # 第一次运行全部未命中，第二次全部命中
+    for _ in range(2):
+        cache.run("well_formed", mod)
+        cache.run("detect_recursion", mod)
+        for name in ("computable_at_compile_time", "free_vars", "bound_vars", "estimate_memory_usage"):
+            cache.run_per_function(name, mod)
+    print(f"重复分析同一模块后: {cache.stats}")
+
+    # 不改变 IR 的 pass 之后函数对象不变，函数级分析全部命中
+    mod = relax.transform.DeadCodeElimination()(mod)
+    cache.run_per_function("free_vars", mod)
+    print(f"运行 DeadCodeElimination 后: {cache.stats}")
+
+    # 修改 IR 的 pass 之后，只有被修改的函数会重新分析
+    mod = relax.transform.LegalizeOps()(mod)
+    cache.run("well_formed", mod)
+    cache.run_per_function("bound_vars", mod)
+    print(f"运行 LegalizeOps 后: {cache.stats}")
+    print(f"缓存条目数: {len(cache)}")
+    return cache
+
+
+if __name__ == "__main__":
+    from relax_analysis_demo import create_sample_relax_module
+
+    demo_analysis_cache(create_sample_relax_module()[0])
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relax 函数的 def-use 索引
+
+按 Python id() 记录变量并不可靠：同一个 Var 每次从 FFI 取出时都是新的包装对象，id 不同。
+而且每回答一个问题（某变量被谁使用、最后一次使用在哪里）都要重新遍历函数。
+
+DefUseIndex 对一个函数只遍历一次：
+- 变量以 Var 本身为键（TVM 对象按底层指针判等和哈希），映射到连续的槽位编号
+- 每个槽位的定义位置、所在块、使用次数、首次 / 最后一次使用位置存放在紧凑的 array.array 中，查询为 O(1)
+- 位置是绑定在函数中的顺序编号（跨块连续），函数返回值的使用位置记为 output_pos（绑定总数）
+- 替换或删除绑定时只更新受影响的槽位，活跃区间、死代码与原地复用分析都直接读取索引
+
+只索引函数参数与函数体顶层的绑定；If 分支内部的绑定计入其所在的顶层绑定。
+"""
+
+import bisect
+from array import array
+
+import tvm
+from tvm import relax
+from tvm.relax.analysis import contains_impure_call, post_order_visit
+
+
+NO_POS = -1
+
+
+class DefUseIndex:
+    """
+    Relax 函数的 def-use 索引
+
+    参数:
+        func: relax.Function
+
+    用法:
+        index = DefUseIndex(mod["main"])
+        index.users(var)          # 使用 var 的绑定位置（升序）
+        index.last_use(var)       # 最后一次使用的位置
+        index.replace_binding(pos, relax.VarBinding(var, new_value))
+        new_func = index.to_function()
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.params = list(func.params)
+        self.bindings = []
+        self.blocks = []
+        self._slots = {}
+        self._vars = []
+        # 每个槽位的属性
+        self._def_pos = array("i")
+        self._block = array("i")
+        self._use_count = array("i")
+        self._users = []
+        # 每个位置（含 output_pos）的属性：该位置使用到的槽位（按出现次数重复）与是否含非纯调用
+        self._uses_at = []
+        self._impure = array("b")
+        self._removed = array("b")
+
+        for param in self.params:
+            self._add_slot(param, NO_POS, NO_POS)
+        for block_index, block in enumerate(func.body.blocks):
+            self.blocks.append(block)
+            for binding in block.bindings:
+                pos = len(self.bindings)
+                self.bindings.append(binding)
+                self._add_slot(binding.var, pos, block_index)
+                self._record_binding(pos, binding)
+        self.output = func.body.body
+        self._uses_at.append(array("i"))
+        self._record_uses(self.output_pos, self.output)
+
+    @property
+    def output_pos(self):
+        """函数返回值的使用位置"""
+        return len(self.bindings)
+
+    def _add_slot(self, var, pos, block_index):
+        slot = len(self._vars)
+        self._slots[var] = slot
+        self._vars.append(var)
+        self._def_pos.append(pos)
+        self._block.append(block_index)
+        self._use_count.append(0)
+        self._users.append(array("i"))
+        return slot
+
+    def _record_binding(self, pos, binding):
+        if pos == len(self._uses_at):
+            self._uses_at.append(array("i"))
+            self._impure.append(0)
+            self._removed.append(0)
+        value = binding.value
+        self._impure[pos] = int(bool(contains_impure_call(value)))
+        self._record_uses(pos, value)
+
+    def _record_uses(self, pos, expr):
+        slots = self._slots
+        uses = self._uses_at[pos]
+
+        def visitor(node):
+            if isinstance(node, relax.Var):
+                slot = slots.get(node)
+                if slot is not None:
+                    uses.append(slot)
+
+        post_order_visit(expr, visitor)
+        for slot in uses:
+            self._use_count[slot] += 1
+            users = self._users[slot]
+            # 构建时位置递增，直接追加；增量更新时插入到有序位置
+            if not users or users[-1] < pos:
+                users.append(pos)
+            elif users[-1] != pos:
+                index = bisect.bisect_left(users, pos)
+                if users[index] != pos:
+                    users.insert(index, pos)
+
+    def _drop_uses(self, pos):
+        uses = self._uses_at[pos]
+        for slot in set(uses):
+            users = self._users[slot]
+            index = bisect.bisect_left(users, pos)
+            if index < len(users) and users[index] == pos:
+                del users[index]
+        for slot in uses:
+            self._use_count[slot] -= 1
+        released = sorted(set(uses))
+        self._uses_at[pos] = array("i")
+        return released
+
+    def _slot(self, var):
+        slot = self._slots.get(var)
+        if slot is None:
+            raise KeyError(f"变量 {var.name_hint} 不在索引中")
+        return slot
+
+    # ---- 查询 ----
+
+    def __contains__(self, var):
+        return var in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def variables(self):
+        """所有仍然有定义的变量（参数在前，其余按定义顺序）"""
+        return [var for var, slot in self._slots.items() if self._is_defined(slot)]
+
+    def _is_defined(self, slot):
+        pos = self._def_pos[slot]
+        return pos == NO_POS or not self._removed[pos]
+
+    def def_pos(self, var):
+        """定义位置；函数参数为 NO_POS"""
+        return self._def_pos[self._slot(var)]
+
+    def binding(self, var):
+        pos = self.def_pos(var)
+        return None if pos == NO_POS else self.bindings[pos]
+
+    def block(self, var):
+        """定义所在的块（DataflowBlock 或 BindingBlock）；函数参数返回 None"""
+        block_index = self._block[self._slot(var)]
+        return None if block_index == NO_POS else self.blocks[block_index]
+
+    def in_dataflow_block(self, var):
+        return isinstance(self.block(var), relax.DataflowBlock)
+
+    def use_count(self, var):
+        return self._use_count[self._slot(var)]
+
+    def users(self, var):
+        """使用 var 的位置（升序，不重复）；output_pos 表示被函数返回"""
+        return list(self._users[self._slot(var)])
+
+    def user_bindings(self, var):
+        return [self.bindings[pos] for pos in self._users[self._slot(var)] if pos != self.output_pos]
+
+    def first_use(self, var):
+        users = self._users[self._slot(var)]
+        return users[0] if users else NO_POS
+
+    def last_use(self, var):
+        users = self._users[self._slot(var)]
+        return users[-1] if users else NO_POS
+
+    def is_output(self, var):
+        return self.last_use(var) == self.output_pos
+
+    def is_last_use(self, var, pos):
+        """位置 pos 是否是 var 的最后一次使用"""
+        return self.last_use(var) == pos
+
+    def uses_at(self, pos):
+        """位置 pos 使用的变量（不重复，按槽位顺序）"""
+        return [self._vars[slot] for slot in sorted(set(self._uses_at[pos]))]
+
+    # ---- 派生分析 ----
+
+    def live_range(self, var):
+        """(定义位置, 最后一次使用位置)；未被使用的变量最后使用位置等于定义位置"""
+        slot = self._slot(var)
+        users = self._users[slot]
+        start = self._def_pos[slot]
+        return start, users[-1] if users else start
+
+    def live_at(self, pos):
+        """位置 pos 执行时仍然活跃（已定义且之后还会使用）的变量"""
+        return [var for var, slot in self._slots.items()
+                if self._def_pos[slot] < pos and self._users[slot] and self._users[slot][-1] >= pos
+                and self._is_defined(slot)]
+
+    def dead_bindings(self):
+        """没有使用者、且值中没有非纯调用的绑定位置"""
+        return [pos for pos, binding in enumerate(self.bindings)
+                if not self._removed[pos] and not self._impure[pos]
+                and self._use_count[self._slots[binding.var]] == 0]
+
+    def inplace_candidates(self):
+        """
+        可以原地写入某个参数的调用：参数在此处最后一次使用、与结果形状和 dtype 相同、定义在同一个 DataflowBlock 中
+
+        返回:
+            [(位置, 可复用的参数 Var)]
+        """
+        candidates = []
+        for pos, binding in enumerate(self.bindings):
+            value = binding.value
+            if self._removed[pos] or not isinstance(value, relax.Call):
+                continue
+            result_sinfo = binding.var.struct_info
+            block_index = self._block[self._slots[binding.var]]
+            for arg in value.args:
+                if not isinstance(arg, relax.Var) or arg not in self._slots:
+                    continue
+                slot = self._slots[arg]
+                if (
+                    self._users[slot][-1] == pos
+                    and self._block[slot] == block_index
+                    and isinstance(self.blocks[block_index], relax.DataflowBlock)
+                    and tvm.ir.structural_equal(arg.struct_info, result_sinfo)
+                ):
+                    candidates.append((pos, arg))
+                    break
+        return candidates
+
+    # ---- 增量更新 ----
+
+    def replace_binding(self, pos, new_binding):
+        """
+        用 new_binding 替换位置 pos 的绑定，只更新受影响的槽位
+
+        new_binding 的变量可以与原变量相同（只改写值），也可以是新变量；
+        后者要求原变量已经没有使用者。
+        返回:
+            因此次替换而不再被使用的变量列表
+        """
+        old = self.bindings[pos]
+        if self._removed[pos]:
+            raise ValueError(f"位置 {pos} 的绑定已被删除")
+        released = self._drop_uses(pos)
+        if not new_binding.var.same_as(old.var):
+            old_slot = self._slots[old.var]
+            if self._use_count[old_slot]:
+                raise ValueError(f"变量 {old.var.name_hint} 仍有 {self._use_count[old_slot]} 处使用，不能替换定义")
+            self._def_pos[old_slot] = NO_POS
+            del self._slots[old.var]
+            self._add_slot(new_binding.var, pos, self._block[old_slot])
+        self.bindings[pos] = new_binding
+        self._record_binding(pos, new_binding)
+        still_used = set(self._uses_at[pos])
+        return [self._vars[slot] for slot in released if slot not in still_used and self._use_count[slot] == 0]
+
+    def replace_output(self, expr):
+        """替换函数返回值，返回因此不再被使用的变量列表"""
+        released = self._drop_uses(self.output_pos)
+        self.output = expr
+        self._record_uses(self.output_pos, expr)
+        return [self._vars[slot] for slot in released if self._use_count[slot] == 0]
+
+    def remove_binding(self, pos):
+        """
+        删除位置 pos 的绑定（位置编号保持不变）
+
+        返回:
+            因此次删除而不再被使用的变量列表，可以继续删除它们的定义
+        """
+        binding = self.bindings[pos]
+        slot = self._slots[binding.var]
+        if self._use_count[slot]:
+            raise ValueError(f"变量 {binding.var.name_hint} 仍有 {self._use_count[slot]} 处使用，不能删除")
+        released = self._drop_uses(pos)
+        self._removed[pos] = 1
+        return [self._vars[s] for s in released if self._use_count[s] == 0]
+
+    def eliminate_dead_code(self):
+        """以工作表方式删除所有死绑定（包括删除后才变为死的绑定），返回删除的位置"""
+        worklist = self.dead_bindings()
+        removed = []
+        while worklist:
+            pos = worklist.pop()
+            if self._removed[pos]:
+                continue
+            for var in self.remove_binding(pos):
+                def_pos = self._def_pos[self._slots[var]]
+                if def_pos != NO_POS and not self._impure[def_pos] and not self._removed[def_pos]:
+                    worklist.append(def_pos)
+            removed.append(pos)
+        return sorted(removed)
+
+    def to_function(self):
+        """按当前索引中的绑定重建函数，块结构保持不变"""
+        new_blocks = []
+        pos = 0
+        for block in self.blocks:
+            bindings = []
+            for _ in block.bindings:
+                if not self._removed[pos]:
+                    bindings.append(self.bindings[pos])
+                pos += 1
+            block_cls = relax.DataflowBlock if isinstance(block, relax.DataflowBlock) else relax.BindingBlock
+            if bindings:
+                new_blocks.append(block_cls(bindings))
+        func = self.func
+        ret_sinfo = func.ret_struct_info if self.output.same_as(func.body.body) else self.output.struct_info
+        return relax.Function(
+            self.params,
+            relax.SeqExpr(new_blocks, self.output),
+            ret_sinfo,
+            func.is_pure,
+            func.attrs,
+            func.span,
+        )
+
+
+def demo_def_use_index(mod):
+    """def-use 索引演示：查询、活跃区间与增量的死代码删除"""
+    print("\n=== Def-Use 索引演示 ===")
+    main_func = mod["main"]
+    index = DefUseIndex(main_func)
+    print(f"索引变量数: {len(index)}，绑定数: {len(index.bindings)}")
+
+    for var in index.variables()[:8]:
+        print(f"  {var.name_hint:<12} 定义位置={index.def_pos(var):>3}  使用次数={index.use_count(var)}  "
+              f"首次={index.first_use(var):>3}  最后={index.last_use(var):>3}  "
+              f"dataflow={index.in_dataflow_block(var)}")
+
+    peak = max((len(index.live_at(pos)) for pos in range(len(index.bindings))), default=0)
+    print(f"同时活跃的变量数峰值: {peak}")
+    candidates = index.inplace_candidates()
+    print(f"可原地计算的调用: {[(pos, var.name_hint) for pos, var in candidates][:5]}")
+
+    # 增量更新：函数改为直接返回第一个参数，所有绑定依次变为死代码，只更新受影响的槽位
+    first_param = main_func.params[0]
+    index.replace_output(first_param)
+    removed = index.eliminate_dead_code()
+    pruned = index.to_function()
+    expected = relax.transform.DeadCodeElimination()(tvm.IRModule({"main": pruned}))["main"]
+    print(f"死代码删除: {len(removed)} 个绑定，剩余 {sum(len(b.bindings) for b in pruned.body.blocks)} 个，"
+          f"与 DeadCodeElimination 一致: {tvm.ir.structural_equal(pruned, expected)}")
+    return index
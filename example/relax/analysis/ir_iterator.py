@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TVM Relax 流式 IR 遍历
+
+post_order_visit 只支持推送式回调，调用方通常把结果收集到不断增长的列表中，
+且无法提前终止。本文件提供拉取式的生成器 API：
+- iter_nodes: 按后序或前序惰性产出 Relax 表达式节点，支持提前终止与子树剪枝
+- iter_bindings: 按绑定（执行）顺序惰性产出 VarBinding / MatchCast
+- find_first / find_first_impure_call / top_k_largest_tensors: 基于上述迭代器、
+  只占用有界内存的常用查询
+
+遍历使用显式栈，内存占用只与 IR 的嵌套深度有关，与节点总数无关。
+"""
+
+import heapq
+import itertools
+
+import numpy as np
+import tvm
+from tvm import relax
+from tvm.relax.analysis import contains_impure_call
+from tvm.relax.expr import Call, Function, If, SeqExpr, Tuple, TupleGetItem
+
+
+def _children(node):
+    """
+    惰性产出节点的子表达式，顺序与 post_order_visit（C++ ExprVisitor）一致
+
+    函数参数和绑定变量属于定义而非使用，与 post_order_visit 相同不会被产出。
+    """
+    if isinstance(node, Function):
+        yield node.body
+    elif isinstance(node, SeqExpr):
+        for block in node.blocks:
+            for binding in block.bindings:
+                yield binding.value
+        yield node.body
+    elif isinstance(node, Call):
+        yield node.op
+        yield from node.args
+    elif isinstance(node, Tuple):
+        yield from node.fields
+    elif isinstance(node, TupleGetItem):
+        yield node.tuple_value
+    elif isinstance(node, If):
+        yield node.cond
+        yield node.true_branch
+        yield node.false_branch
+
+
+def _iter_roots(obj):
+    """IRModule 展开为其中的各个 Relax 函数，其余对象原样返回"""
+    if isinstance(obj, tvm.IRModule):
+        for _, func in obj.functions_items():
+            if isinstance(func, Function):
+                yield func
+    else:
+        yield obj
+
+
+def iter_nodes(obj, order="post", prune=None, unique=False):
+    """
+    惰性遍历 Relax 函数、表达式或 IRModule 中的节点
+
+    参数:
+        obj: relax.Function / relax.Expr / IRModule
+        order: "post"（后序，与 post_order_visit 相同）或 "pre"（前序）
+        prune: 可选谓词，返回 True 时该节点仍会被产出，但不再深入其子树
+        unique: 为 True 时共享子表达式只产出一次（需要额外保存已访问节点集合）
+    返回:
+        节点生成器；调用方可随时 break 提前终止
+    """
+    if order not in ("post", "pre"):
+        raise ValueError(f"不支持的遍历顺序: {order}，应为 'post' 或 'pre'")
+
+    # TVM 对象按底层句柄哈希，不会因 FFI 包装对象不同而重复
+    visited = set() if unique else None
+
+    for root in _iter_roots(obj):
+        stack = []
+
+        def enter(node):
+            if visited is not None:
+                if node in visited:
+                    return False
+                visited.add(node)
+            descend = prune is None or not prune(node)
+            stack.append((node, _children(node) if descend else iter(())))
+            return True
+
+        if enter(root) and order == "pre":
+            yield root
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if order == "post":
+                    yield node
+                continue
+            if enter(child) and order == "pre":
+                yield child
+
+
+def _iter_seq_bindings(seq):
+    for block in seq.blocks:
+        for binding in block.bindings:
+            # 嵌套在 If 分支或局部函数中的绑定先于外层绑定执行
+            for nested in iter_nodes(binding.value, order="pre", prune=lambda n: isinstance(n, SeqExpr)):
+                if isinstance(nested, SeqExpr):
+                    yield from _iter_seq_bindings(nested)
+            yield binding
+    for nested in iter_nodes(seq.body, order="pre", prune=lambda n: isinstance(n, SeqExpr)):
+        if isinstance(nested, SeqExpr):
+            yield from _iter_seq_bindings(nested)
+
+
+def iter_bindings(obj):
+    """
+    按执行顺序惰性产出绑定（VarBinding / MatchCast）
+
+    参数:
+        obj: relax.Function / relax.Expr / IRModule
+    """
+    for root in _iter_roots(obj):
+        for node in iter_nodes(root, order="pre", prune=lambda n: isinstance(n, SeqExpr)):
+            if isinstance(node, SeqExpr):
+                yield from _iter_seq_bindings(node)
+
+
+def find_first(obj, predicate, order="post"):
+    """返回第一个满足谓词的节点，找到后立即停止遍历；不存在时返回 None"""
+    return next((node for node in iter_nodes(obj, order=order) if predicate(node)), None)
+
+
+def find_first_impure_call(obj):
+    """按绑定顺序查找第一个非纯调用"""
+    for binding in iter_bindings(obj):
+        value = binding.value
+        if isinstance(value, Call) and contains_impure_call(value):
+            return binding
+    return None
+
+
+def _static_tensor_bytes(sinfo):
+    if not isinstance(sinfo, relax.TensorStructInfo) or not isinstance(sinfo.shape, relax.ShapeExpr):
+        return None
+    dims = sinfo.shape.values
+    if not all(isinstance(dim, tvm.tir.IntImm) for dim in dims):
+        return None
+    dtype = tvm.DataType(sinfo.dtype)
+    numel = int(np.prod([dim.value for dim in dims], dtype=np.int64))
+    return numel * ((dtype.bits + 7) // 8) * dtype.lanes
+
+
+def top_k_largest_tensors(obj, k=5):
+    """
+    找出绑定结果中最大的 k 个静态形状张量，只维护大小为 k 的堆
+
+    返回:
+        按字节数降序排列的 [(字节数, 变量名, 形状, 数据类型)]
+    """
+    heap = []
+    counter = itertools.count()
+    for binding in iter_bindings(obj):
+        sinfo = binding.var.struct_info
+        size = _static_tensor_bytes(sinfo)
+        if size is None:
+            continue
+        # 堆中只保存必要的摘要信息，不持有 IR 节点
+        item = (size, next(counter), binding.var.name_hint, [int(d) for d in sinfo.shape.values], sinfo.dtype)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, item)
+    return [(size, name, shape, dtype) for size, _, name, shape, dtype in sorted(heap, reverse=True)]
+
+
+def demo_streaming_traversal(mod):
+    """流式遍历演示"""
+    print("\n=== 流式遍历演示 ===")
+
+    main_func = mod["main"]
+
+    # 边遍历边统计，不保存节点列表
+    node_count = sum(1 for _ in iter_nodes(main_func))
+    print(f"后序遍历节点总数: {node_count}")
+
+    # 前序遍历只取前 5 个节点后立即停止
+    print("前序遍历前 5 个节点:")
+    for node in itertools.islice(iter_nodes(main_func, order="pre"), 5):
+        print(f"  {type(node).__name__}")
+
+    # 剪枝：不进入 Call 的子树，只统计顶层调用
+    calls = sum(
+        1 for node in iter_nodes(main_func, prune=lambda n: isinstance(n, Call)) if isinstance(node, Call)
+    )
+    print(f"剪枝后遍历到的调用数: {calls}")
+
+    first_conv = find_first(main_func, lambda n: isinstance(n, Call) and "conv2d" in str(n.op))
+    print(f"第一个 conv2d 调用: {first_conv.op if first_conv is not None else '无'}")
+
+    impure = find_first_impure_call(main_func)
+    print(f"第一个非纯调用: {impure.var.name_hint if impure is not None else '无'}")
+
+    print("最大的 3 个张量:")
+    for size, name, shape, dtype in top_k_largest_tensors(main_func, k=3):
+        print(f"  {name}: {shape} {dtype} ({size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    from post_order_visit_demo import create_demo_module
+
+    demo_streaming_traversal(create_demo_module())
@@ -14,6 +14,10 @@ from tvm.ir import IRModule
 from tvm.relax.analysis.estimate_memory_usage import estimate_memory_usage
 import numpy as np
 from tvm.relax.frontend.torch import from_exported_program
+from symbolic_memory_estimation import (
+    estimate_symbolic_memory_usage, evaluate_memory, export_with_dynamic_batch,
+    get_batch_var, max_binding_within_budget
+)
 
 
 class SmallModel(nn.Module):
@@ -207,52 +211,44 @@ def demo_batch_size_impact():
     """批次大小对内存使用的影响演示"""
     print("\n=== 批次大小对内存使用的影响 ===")
     
-    batch_sizes = [1, 4, 8, 16, 32]
+    batch_sizes = np.array([1, 4, 8, 16, 32])
     
-    for batch_size in batch_sizes:
+    # 以符号批次维度只导出一次，不再为每个批次大小重新导出模型
+    mod = export_with_dynamic_batch(MediumModel(), torch.randn(1, 3, 32, 32))
+    
+    main_est = estimate_symbolic_memory_usage(mod)["main"]
+    batch_var = get_batch_var(mod["main"])
+    print(f"符号化总内存: {main_est['total']} 字节")
+    
+    # 向量化求值所有批次大小
+    totals = evaluate_memory(main_est, {batch_var.name: batch_sizes})["total"]
+    for batch_size, total in zip(batch_sizes, totals):
         print(f"\n--- Batch Size: {batch_size} ---")
-        
-        # 创建不同批次大小的输入
-        model = MediumModel()
-        model.eval()
-        
-        input_tensor = torch.randn(batch_size, 3, 32, 32)
-        input_spec = [("input", input_tensor.shape, "float32")]
-        
-        # 使用 from_exported_program 转换为 Relax 模块
-        exported = torch.export.export(model, (input_tensor,))
-        mod = from_exported_program(exported)
-        
-        # 估算内存
-        memory_est = estimate_memory_usage(mod)
-        print(memory_est)
+        print(f"估算内存: {total / (1024 * 1024):.2f} MB")
+    
+    # 8 GB 预算下的最大批次大小
+    max_batch = max_binding_within_budget(
+        main_est, batch_var.name, 8 * 1024 ** 3, range(1, 65537)
+    )
+    print(f"\n8 GB 内存预算下的最大批次大小: {max_batch}")
 
 
 def demo_dtype_impact():
     """数据类型对内存使用的影响演示"""
     print("\n=== 数据类型对内存使用的影响 ===")
     
-    dtypes = ["float32", "float16", "int8"]
+    # precision_conversion 依赖本模块中的模型定义，因此在函数内导入
+    from precision_conversion import compare_precisions, print_precision_report
     
-    model = SmallModel()
-    model.eval()
+    model_info = create_model_variants()['small']
     
-    for dtype in dtypes:
-        print(f"\n--- 数据类型: {dtype} ---")
-        
-        input_tensor = torch.randn(1, 10)
-        input_spec = [("input", input_tensor.shape, dtype)]
-        
-        try:
-            # 转换为Relax模块
-            mod = relax.frontend.from_pytorch(model, input_spec)
-            
-            # 估算内存
-            memory_est = estimate_memory_usage(mod)
-            print(memory_est)
-            
-        except Exception as e:
-            print(f"数据类型 {dtype} 转换失败: {e}")
+    # 在 from_exported_program 得到的 float32 模块上转换精度，
+    # 包括 float16 / bfloat16（float32 累加）以及 int8 权重量化
+    try:
+        results = compare_precisions(model_info)
+        print_precision_report(results)
+    except Exception as e:
+        print(f"数据类型转换失败: {e}")
 
 
 def demo_custom_memory_analysis():
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TVM Relax 内存估算验证工具
+
+将 estimate_memory_usage（通过符号化估算得到具体数值）以及 post_order_visit_demo 中
+demo_memory_footprint_analysis 的粗略估算，与模块在 CPU 上实际运行时的内存占用进行对比：
+- VM 池化分配器实际收到的 alloc_storage 请求（通过 set_instrument 采集）
+- 进程 RSS 峰值（在独立子进程中测量，避免编译阶段的内存干扰）
+
+用于在把估算结果用于容量规划之前，确认估算误差处于可接受范围。
+"""
+
+import multiprocessing
+import os
+import queue
+import resource
+import tempfile
+import time
+
+import numpy as np
+import tvm
+from tvm import relax
+
+from memory_estimation_demo import convert_to_relax, create_model_variants
+from post_order_visit_demo import demo_memory_footprint_analysis
+from symbolic_memory_estimation import estimate_symbolic_memory_usage, evaluate_memory
+
+
+# CPU 上池化分配器按页对齐分配请求
+POOLED_ALLOCATOR_PAGE_SIZE = 4096
+
+
+def _round_up(size, alignment):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _current_rss_bytes():
+    """读取当前进程的常驻内存大小（仅限 Linux）"""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss_bytes():
+    """读取当前进程的 RSS 峰值（Linux 上 ru_maxrss 单位为 KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def lower_for_memory_estimation(mod):
+    """
+    将高层 Relax 模块降低到包含显式分配的形式
+
+    返回:
+        (before_plan_mod, after_plan_mod)，分别包含 builtin.alloc_tensor
+        和经 StaticPlanBlockMemory 规划后的 memory.alloc_storage
+    """
+    before_plan = tvm.transform.Sequential(
+        [
+            relax.transform.LegalizeOps(),
+            relax.transform.AnnotateTIROpPattern(),
+            relax.transform.FoldConstant(),
+            relax.transform.FuseOps(),
+            relax.transform.FuseTIR(),
+            relax.transform.DeadCodeElimination(),
+            relax.transform.RewriteDataflowReshape(),
+            relax.transform.ToNonDataflow(),
+            relax.transform.RemovePurityChecking(),
+            relax.transform.CallTIRRewrite(),
+        ]
+    )(mod)
+    after_plan = relax.transform.StaticPlanBlockMemory()(before_plan)
+    return before_plan, after_plan
+
+
+def _static_estimate_bytes(mod, func_name="main"):
+    """静态形状模块的估算值（字节）"""
+    estimate = estimate_symbolic_memory_usage(mod)[func_name]
+    return int(evaluate_memory(estimate, {})["total"])
+
+
+def _measure_worker(lib_path, input_np, func_name, result_queue):
+    """子进程：加载编译产物并在 CPU 上运行一次，采集分配器与 RSS 数据"""
+    lib = tvm.runtime.load_module(lib_path)
+    dev = tvm.cpu()
+    clear_pool = tvm.get_global_func("vm.builtin.memory_manager.clear", allow_missing=True)
+    if clear_pool is not None:
+        clear_pool()
+
+    input_nd = tvm.nd.array(input_np, dev)
+    rss_before = _current_rss_bytes()
+    peak_before = _peak_rss_bytes()
+
+    vm = relax.VirtualMachine(lib, dev)
+    storage_requests = []
+
+    def alloc_instrument(func, func_symbol, before_run, ret_value, *args):
+        if before_run or func_symbol != "vm.builtin.alloc_storage":
+            return
+        for arg in args:
+            if isinstance(arg, tvm.runtime.ShapeTuple):
+                storage_requests.append(int(np.prod(list(arg), dtype=np.int64)))
+                break
+
+    vm.set_instrument(alloc_instrument)
+    vm[func_name](input_nd)
+
+    result_queue.put(
+        {
+            "storage_requests": storage_requests,
+            "rss_before": rss_before,
+            "rss_after": _current_rss_bytes(),
+            "peak_rss_before": peak_before,
+            "peak_rss_after": _peak_rss_bytes(),
+        }
+    )
+
+
+def _wait_for_result(proc, result_queue, timeout):
+    """以短超时轮询结果队列，同时检查子进程是否已经退出，子进程崩溃时立即报告"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return result_queue.get(timeout=1.0)
+        except queue.Empty:
+            pass
+        if not proc.is_alive():
+            # 子进程退出前可能刚写入结果
+            try:
+                return result_queue.get(timeout=1.0)
+            except queue.Empty:
+                raise RuntimeError(f"内存测量子进程异常退出，退出码 {proc.exitcode}") from None
+        if time.time() > deadline:
+            raise TimeoutError(f"内存测量超过 {timeout} s 未完成")
+
+
+def measure_memory_on_cpu(mod, input_np, func_name="main", timeout=600):
+    """
+    编译模块并在独立子进程中运行，测量实际内存使用
+
+    参数:
+        mod: 待测量的 IRModule（参数已嵌入为常量）
+        input_np: NumPy 输入
+        func_name: 入口函数名
+        timeout: 子进程超时时间（秒）
+    返回:
+        包含 allocator_bytes / allocator_pooled_bytes / rss_delta_bytes / peak_rss_delta_bytes 的字典
+    异常:
+        RuntimeError: 子进程没有返回结果就退出（如编译产物加载失败或崩溃）
+        TimeoutError: 超过 timeout 秒未完成
+    """
+    ex = tvm.compile(mod, target="llvm")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lib_path = os.path.join(tmp_dir, "model.so")
+        ex.export_library(lib_path)
+
+        ctx = multiprocessing.get_context("spawn")
+        result_queue = ctx.Queue()
+        proc = ctx.Process(target=_measure_worker, args=(lib_path, input_np, func_name, result_queue))
+        proc.start()
+        try:
+            raw = _wait_for_result(proc, result_queue, timeout)
+        finally:
+            proc.join(5)
+            if proc.is_alive():
+                proc.kill()
+            proc.join()
+
+    requests = raw["storage_requests"]
+    return {
+        "allocator_requests": len(requests),
+        "allocator_bytes": sum(requests),
+        "allocator_pooled_bytes": sum(_round_up(r, POOLED_ALLOCATOR_PAGE_SIZE) for r in requests),
+        "rss_delta_bytes": raw["rss_after"] - raw["rss_before"],
+        "peak_rss_delta_bytes": raw["peak_rss_after"] - raw["peak_rss_before"],
+    }
+
+
+def _relative_error(estimate, measured):
+    if measured == 0:
+        return float("inf") if estimate else 0.0
+    return (estimate - measured) / measured
+
+
+def validate_model_variant(model_info):
+    """对单个模型变体进行估算与实测对比"""
+    mod = convert_to_relax(model_info)
+    before_plan, after_plan = lower_for_memory_estimation(mod)
+
+    estimates = {
+        "estimate_before_plan": _static_estimate_bytes(before_plan),
+        "estimate_after_plan": _static_estimate_bytes(after_plan),
+        "estimate_footprint": demo_memory_footprint_analysis(mod)["estimated_memory"],
+    }
+    measured = measure_memory_on_cpu(mod, model_info["input"].numpy())
+
+    report = dict(estimates)
+    report.update(measured)
+    report["param_bytes"] = sum(
+        p.numel() * p.element_size() for p in model_info["model"].parameters()
+    )
+    for name, value in estimates.items():
+        report[f"{name}_error"] = _relative_error(value, measured["allocator_pooled_bytes"])
+    return report
+
+
+def print_validation_report(reports):
+    """打印估算误差报告"""
+    mb = 1024 * 1024
+    print("\n估算 vs 实测 (单位: MB, 误差相对于池化分配器实测值):")
+    header = f"{'模型':<8}{'规划前估算':>12}{'规划后估算':>12}{'足迹估算':>12}{'分配器实测':>12}{'RSS增量':>12}{'规划后误差':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, r in reports.items():
+        print(
+            f"{name:<8}"
+            f"{r['estimate_before_plan'] / mb:>12.2f}"
+            f"{r['estimate_after_plan'] / mb:>12.2f}"
+            f"{r['estimate_footprint'] / mb:>12.2f}"
+            f"{r['allocator_pooled_bytes'] / mb:>12.2f}"
+            f"{r['peak_rss_delta_bytes'] / mb:>12.2f}"
+            f"{r['estimate_after_plan_error']:>12.1%}"
+        )
+
+
+def run_memory_validation():
+    """对 create_model_variants 中的所有模型变体运行验证"""
+    print("TVM Relax 内存估算验证")
+    print("=" * 60)
+
+    reports = {}
+    for model_name, model_info in create_model_variants().items():
+        print(f"\n--- {model_name.upper()} 模型 ---")
+        try:
+            reports[model_name] = validate_model_variant(model_info)
+        except Exception as e:
+            print(f"模型 {model_name} 验证失败: {e}")
+
+    print_validation_report(reports)
+    return reports
+
+
+if __name__ == "__main__":
+    run_memory_validation()
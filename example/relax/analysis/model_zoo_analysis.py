@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型库批量静态分析
+
+各分析示例在单个进程中分析一个小模块。编译器升级后需要对数百个已转换的模型重新检查，
+本文件提供批量分析驱动：
+- 输入为一个目录，其中每个文件是一个序列化的 IRModule：tvm.ir.save_json 生成的 .json，
+  或 example/build/module_serialization.py 生成的二进制 .tvmb
+- 每个模块在进程池中独立分析：well_formed、detect_recursion、符号化内存估算、参数字节数与算子统计
+- 结果逐行流式写入同一张列式报告：.csv 逐行追加；.parquet 以分片文件组成目录，每批写一个分片
+- 中断后重新运行时读取已有报告，跳过已分析的模块
+
+单个模块分析失败只记录错误信息，不影响其余模块。
+"""
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tvm
+from tvm import relax, tir
+from tvm.relax.analysis import detect_recursion, well_formed
+
+from ir_iterator import iter_bindings, iter_nodes
+from precision_conversion import parameter_bytes
+from symbolic_memory_estimation import estimate_symbolic_memory_usage
+
+BUILD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "build")
+# 可识别的模块文件后缀
+MODULE_SUFFIXES = (".json", ".tvmb")
+
+
+# 报告的列，顺序固定，CSV 表头与 Parquet 模式均由此生成
+COLUMNS = [
+    "model", "path", "file_bytes", "status", "error",
+    "num_relax_functions", "num_prim_funcs", "well_formed", "recursive_functions",
+    "num_bindings", "num_calls", "op_counts",
+    "estimated_memory_bytes", "symbolic_memory", "parameter_bytes",
+    "load_s", "analysis_s",
+]
+
+# 每个工作进程处理的任务数上限，定期重启进程以回收大模块占用的内存
+MAX_TASKS_PER_CHILD = 32
+# Parquet 每个分片包含的行数
+PARQUET_BATCH_ROWS = 64
+
+
+def load_module(path):
+    """读取序列化的 IRModule，按后缀区分 JSON 与二进制格式"""
+    if path.endswith(".tvmb"):
+        if BUILD_DIR not in sys.path:
+            sys.path.insert(0, BUILD_DIR)
+        from module_serialization import load_module_binary
+
+        return load_module_binary(path)
+    with open(path) as f:
+        return tvm.ir.load_json(f.read())
+
+
+def _op_name(op):
+    if isinstance(op, tvm.ir.Op):
+        return op.name
+    if isinstance(op, relax.ExternFunc):
+        return f"extern:{op.global_symbol}"
+    if isinstance(op, tvm.ir.GlobalVar):
+        return "call_global"
+    return "call_closure"
+
+
+def analyze_module_file(path):
+    """
+    分析单个序列化模块，返回一行报告
+
+    在工作进程中执行；所有异常都转换为 status="error" 的行，保证主进程能继续流式写出。
+    """
+    row = {column: None for column in COLUMNS}
+    row.update(model=os.path.splitext(os.path.basename(path))[0], path=path, file_bytes=os.path.getsize(path))
+    try:
+        start = time.perf_counter()
+        mod = load_module(path)
+        row["load_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        relax_funcs = {g.name_hint: f for g, f in mod.functions_items() if isinstance(f, relax.Function)}
+        row["num_relax_functions"] = len(relax_funcs)
+        row["num_prim_funcs"] = sum(isinstance(f, tir.PrimFunc) for _, f in mod.functions_items())
+        row["well_formed"] = bool(well_formed(mod))
+        row["recursive_functions"] = json.dumps(
+            sorted(g.name_hint for group in detect_recursion(mod) for g in group)
+        )
+
+        ops = Counter(_op_name(node.op) for node in iter_nodes(mod) if isinstance(node, relax.Call))
+        row["num_bindings"] = sum(1 for _ in iter_bindings(mod))
+        row["num_calls"] = sum(ops.values())
+        row["op_counts"] = json.dumps(dict(ops.most_common()))
+
+        if "main" in relax_funcs:
+            total = estimate_symbolic_memory_usage(mod)["main"]["total"]
+            if isinstance(total, tir.IntImm):
+                row["estimated_memory_bytes"] = int(total.value)
+            else:
+                row["symbolic_memory"] = str(total)
+        row["parameter_bytes"] = parameter_bytes(mod)
+        row["analysis_s"] = time.perf_counter() - start
+        row["status"] = "ok"
+    except Exception as e:  # pylint: disable=broad-except
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"[:2000]
+    return row
+
+
+class _CSVReport:
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    @staticmethod
+    def done_paths(path, retry_failed):
+        if not os.path.exists(path):
+            return set()
+        with open(path, newline="") as f:
+            return {row["path"] for row in csv.DictReader(f) if not (retry_failed and row["status"] != "ok")}
+
+    def write(self, row):
+        self._writer.writerow(row)
+        # 每行立即落盘，中断时最多丢失正在写的一行
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetReport:
+    """以目录形式保存的 Parquet 数据集，每批行写为一个新分片，已有分片从不改写"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("写入 Parquet 报告需要安装 pyarrow，或改用 .csv 输出") from e
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._rows = []
+        self._next_part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+
+    @staticmethod
+    def done_paths(path, retry_failed):
+        if not os.path.isdir(path):
+            return set()
+        import pyarrow.parquet as pq
+
+        done = set()
+        for part in sorted(glob.glob(os.path.join(path, "part-*.parquet"))):
+            table = pq.read_table(part, columns=["path", "status"]).to_pydict()
+            done.update(p for p, s in zip(table["path"], table["status"]) if not (retry_failed and s != "ok"))
+        return done
+
+    def _flush(self):
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self._rows, schema=_parquet_schema())
+        part = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # 先写临时文件再改名，读取方不会看到写了一半的分片
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self._next_part += 1
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def close(self):
+        self._flush()
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        "file_bytes": pa.int64(), "num_relax_functions": pa.int64(), "num_prim_funcs": pa.int64(),
+        "well_formed": pa.bool_(), "num_bindings": pa.int64(), "num_calls": pa.int64(),
+        "estimated_memory_bytes": pa.int64(), "parameter_bytes": pa.int64(),
+        "load_s": pa.float64(), "analysis_s": pa.float64(),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in COLUMNS])
+
+
+def _open_report(path):
+    return _ParquetReport if path.endswith(".parquet") else _CSVReport
+
+
+def analyze_model_zoo(zoo_dir, output, workers=None, retry_failed=False, pattern=None):
+    """
+    并行分析目录中的所有模块，流式写出报告
+
+    参数:
+        zoo_dir: 序列化模块所在目录
+        output: 报告路径，.csv 或 .parquet（目录）
+        workers: 进程数，默认 CPU 核数
+        retry_failed: 重新分析上次失败的模块（报告中会保留旧的失败行）
+        pattern: 模块文件的匹配模式，默认匹配所有 .json 与 .tvmb 文件
+    返回:
+        {'total', 'skipped', 'ok', 'error', 'elapsed_s'}
+    """
+    report_cls = _open_report(output)
+    if pattern is None:
+        paths = sorted(p for p in glob.glob(os.path.join(zoo_dir, "*")) if p.endswith(MODULE_SUFFIXES))
+    else:
+        paths = sorted(glob.glob(os.path.join(zoo_dir, pattern)))
+    done = report_cls.done_paths(output, retry_failed)
+    pending = [p for p in paths if p not in done]
+    summary = {"total": len(paths), "skipped": len(paths) - len(pending), "ok": 0, "error": 0}
+    print(f"共 {len(paths)} 个模块，跳过已分析的 {summary['skipped']} 个，待分析 {len(pending)} 个")
+
+    start = time.perf_counter()
+    report = report_cls(output)
+    try:
+        # spawn 启动的工作进程不继承主进程中的 TVM 状态；定期重启以限制内存增长
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=MAX_TASKS_PER_CHILD,
+        ) as pool:
+            futures = [pool.submit(analyze_module_file, path) for path in pending]
+            for index, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                report.write(row)
+                summary[row["status"]] += 1
+                if row["status"] != "ok":
+                    print(f"  [{index}/{len(pending)}] {row['model']} 失败: {row['error']}")
+    finally:
+        report.close()
+    summary["elapsed_s"] = time.perf_counter() - start
+    return summary
+
+
+def export_demo_zoo(zoo_dir, binary=False):
+    """把各分析示例中的模型序列化到目录中，作为演示用的模型库；binary 为 True 时保存为 .tvmb"""
+    import torch
+
+    from memory_estimation_demo import MediumModel, convert_to_relax, create_model_variants
+    from post_order_visit_demo import create_demo_module
+    from relax_analysis_demo import create_sample_relax_module
+    from symbolic_memory_estimation import export_with_dynamic_batch
+
+    os.makedirs(zoo_dir, exist_ok=True)
+    modules = {name: convert_to_relax(info) for name, info in create_model_variants().items()}
+    modules["demo_cnn"] = create_demo_module()
+    modules["simple"] = create_sample_relax_module()[0]
+    modules["demo_cnn_legalized"] = relax.transform.LegalizeOps()(modules["demo_cnn"])
+    # 动态批次模型的内存估算是符号表达式，写入 symbolic_memory 列
+    modules["medium_dynamic_batch"] = export_with_dynamic_batch(MediumModel(), torch.randn(1, 3, 32, 32))
+    if binary:
+        if BUILD_DIR not in sys.path:
+            sys.path.insert(0, BUILD_DIR)
+        from module_serialization import save_module_binary
+
+    for name, mod in modules.items():
+        if binary:
+            save_module_binary(mod, os.path.join(zoo_dir, f"{name}.tvmb"))
+            continue
+        with open(os.path.join(zoo_dir, f"{name}.json"), "w") as f:
+            f.write(tvm.ir.save_json(mod))
+    return sorted(modules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行分析目录中的所有序列化 IRModule")
+    parser.add_argument("zoo_dir", help="序列化模块所在目录")
+    parser.add_argument("--output", default="model_zoo_report.csv", help="报告路径，.csv 或 .parquet")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--pattern", default=None, help="模块文件的匹配模式，默认所有 .json 与 .tvmb")
+    parser.add_argument("--retry-failed", action="store_true", help="重新分析上次失败的模块")
+    parser.add_argument("--export-demo-zoo", action="store_true", help="先把演示模型导出到 zoo_dir")
+    parser.add_argument("--binary", action="store_true", help="导出演示模型时使用 .tvmb 二进制格式")
+    args = parser.parse_args(argv)
+
+    if args.export_demo_zoo:
+        print(f"导出演示模型: {export_demo_zoo(args.zoo_dir, args.binary)}")
+    summary = analyze_model_zoo(args.zoo_dir, args.output, args.workers, args.retry_failed, args.pattern)
+    print(f"完成: {summary}，报告: {args.output}")
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
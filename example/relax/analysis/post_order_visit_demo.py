@@ -14,6 +14,8 @@ from tvm.relax.analysis import post_order_visit
 from tvm.relax.expr import Function, Call, Var, Constant, Tuple, DataflowBlock
 import json
 from tvm.relax.frontend.torch import from_exported_program
+from ir_iterator import demo_streaming_traversal
+from def_use_index import DefUseIndex, demo_def_use_index
 
 
 class DemoModel(nn.Module):
@@ -141,38 +143,29 @@ def demo_operation_analysis(mod):
 
 
 def demo_variable_tracking(mod):
-    """变量跟踪演示"""
+    """变量跟踪演示（基于 def_use_index.DefUseIndex，变量以 Var 本身为键）"""
     print("\n=== 变量跟踪演示 ===")
     
     main_func = mod["main"]
+    index = DefUseIndex(main_func)
     variables = {}
     variable_usage = {}
     
-    def variable_visitor(node):
-        if isinstance(node, Var):
-            var_name = node.name_hint
-            var_id = id(node)
-            
-            if var_id not in variables:
-                variables[var_id] = {
-                    'name': var_name,
-                    'type': str(node.struct_info) if hasattr(node, 'struct_info') else 'unknown',
-                    'first_seen': len(variables)
-                }
-                print(f"新变量: {var_name} (ID: {var_id})")
-            
-            # 跟踪使用次数
-            variable_usage[var_id] = variable_usage.get(var_id, 0) + 1
-    
-    post_order_visit(main_func, variable_visitor)
+    for var in index.variables():
+        variables[var] = {
+            'name': var.name_hint,
+            'type': str(var.struct_info),
+            'first_seen': len(variables),
+        }
+        variable_usage[var] = index.use_count(var)
+        print(f"变量: {var.name_hint} (定义位置: {index.def_pos(var)}, 最后使用: {index.last_use(var)})")
     
     print(f"\n变量统计:")
     print(f"总变量数: {len(variables)}")
     
     print("\n变量使用频率:")
-    for var_id, usage_count in sorted(variable_usage.items(), key=lambda x: x[1], reverse=True):
-        var_info = variables[var_id]
-        print(f"  {var_info['name']}: {usage_count} 次")
+    for var, usage_count in sorted(variable_usage.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {variables[var]['name']}: {usage_count} 次")
     
     return variables, variable_usage
 
@@ -332,6 +325,12 @@ def run_all_demos():
         patterns = demo_custom_analysis(mod)
         memory_info = demo_memory_footprint_analysis(mod)
         
+        # 流式遍历：不收集列表，可提前终止
+        demo_streaming_traversal(mod)
+        
+        # def-use 索引：一次构建，O(1) 查询与增量更新
+        demo_def_use_index(mod)
+        
         # 总结
         print("\n" + "=" * 60)
         print("演示总结:")
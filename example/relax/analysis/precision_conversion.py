@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TVM Relax 降精度转换与对比
+
+将 from_exported_program 生成的 float32 IRModule 转换为：
+- float16 / bfloat16：计算与权重使用低精度，matmul / conv2d 使用 float32 累加（out_dtype）
+- int8 权重量化（weight-only）：权重按输出通道对称量化为 int8，计算前反量化为 float32
+
+并对每个变体报告参数字节数、estimate_memory_usage 输出、CPU 延迟以及相对 float32 的数值误差。
+函数接口保持不变：输入仍为 float32，低精度转换在函数内部完成。
+"""
+
+import numpy as np
+import tvm
+from tvm import relax
+from tvm.relax.analysis import estimate_memory_usage, post_order_visit
+
+from memory_estimation_demo import convert_to_relax, create_model_variants
+from memory_validation_harness import lower_for_memory_estimation
+
+
+# 累加精度敏感、需要单独指定 out_dtype 的算子
+_ACCUMULATE_OPS = ("relax.matmul", "relax.nn.conv2d")
+# int8 权重量化生成的反量化函数名前缀
+DEQUANTIZE_PREFIX = "dequantize_int8_"
+
+
+def _is_float32_tensor(expr):
+    sinfo = expr.struct_info
+    return isinstance(sinfo, relax.TensorStructInfo) and sinfo.dtype == "float32"
+
+
+def _rebuild_with_out_dtype(call, args, out_dtype):
+    """以新的参数和 out_dtype 重新构造 matmul / conv2d 调用"""
+    if call.op.name == "relax.matmul":
+        return relax.op.matmul(args[0], args[1], out_dtype=out_dtype)
+    attrs = call.attrs
+    return relax.op.nn.conv2d(
+        args[0],
+        args[1],
+        strides=attrs.strides,
+        padding=attrs.padding,
+        dilation=attrs.dilation,
+        groups=attrs.groups,
+        data_layout=attrs.data_layout,
+        kernel_layout=attrs.kernel_layout,
+        out_layout=attrs.out_layout,
+        out_dtype=out_dtype,
+    )
+
+
+@relax.expr_functor.mutator
+class LowPrecisionRewriter(relax.PyExprMutator):
+    """
+    将 float32 计算改写为低精度计算
+
+    每个算子调用的 float32 张量参数被转换为目标精度；matmul / conv2d 以
+    accumulate_dtype 累加后再转换回目标精度。常量的转换由后续 FoldConstant 折叠。
+    函数的返回值转换回原来的 dtype，ret_struct_info 与函数接口保持不变。
+    """
+
+    def __init__(self, mod, dtype="float16", accumulate_dtype="float32"):
+        super().__init__(mod)
+        self.mod_ = mod
+        self.dtype = dtype
+        self.accumulate_dtype = accumulate_dtype
+
+    def transform(self):
+        for gvar, func in self.mod_.functions_items():
+            if isinstance(func, relax.Function):
+                self.builder_.update_func(gvar, self._restore_return_dtype(self.visit_expr(func), func))
+        return self.builder_.get()
+
+    def _restore_return_dtype(self, func, orig_func):
+        """在函数末尾把低精度的返回值 astype 回原函数的返回 dtype（与 ToMixedPrecision 处理输出的方式相同）"""
+        bindings = []
+
+        def emit(value):
+            value = self.builder_.normalize(value)
+            var = relax.Var(f"ret_{len(bindings)}", value.struct_info)
+            bindings.append(relax.VarBinding(var, value))
+            return var
+
+        def cast(expr, target):
+            sinfo = expr.struct_info
+            if isinstance(target, relax.TensorStructInfo) and isinstance(sinfo, relax.TensorStructInfo):
+                return emit(relax.op.astype(expr, target.dtype)) if sinfo.dtype != target.dtype else expr
+            if isinstance(target, relax.TupleStructInfo) and isinstance(sinfo, relax.TupleStructInfo):
+                fields = [cast(emit(relax.TupleGetItem(expr, i)), field) for i, field in enumerate(target.fields)]
+                return emit(relax.Tuple(fields))
+            return expr
+
+        ret = cast(func.body.body, orig_func.ret_struct_info)
+        if not bindings:
+            return func
+        body = relax.SeqExpr(list(func.body.blocks) + [relax.BindingBlock(bindings)], ret)
+        return relax.Function(
+            func.params, body, orig_func.ret_struct_info, func.is_pure, func.attrs, func.span
+        )
+
+    def visit_call_(self, call):
+        call = self.visit_expr_post_order(call)
+        if not isinstance(call.op, tvm.ir.Op) or call.op.name == "relax.astype":
+            return call
+
+        args = [
+            self.builder_.emit(relax.op.astype(arg, self.dtype)) if _is_float32_tensor(arg) else arg
+            for arg in call.args
+        ]
+        if call.op.name in _ACCUMULATE_OPS:
+            acc = self.builder_.emit(_rebuild_with_out_dtype(call, args, self.accumulate_dtype))
+            return relax.op.astype(acc, self.dtype)
+        return relax.Call(call.op, args, call.attrs, call.sinfo_args, call.span)
+
+
+def _quantize_per_channel(weight, axis):
+    """对称的按通道 int8 量化，返回 (int8 权重, float32 scale，形状可广播回权重)"""
+    reduce_axes = tuple(i for i in range(weight.ndim) if i != axis % weight.ndim)
+    scale = np.max(np.abs(weight), axis=reduce_axes, keepdims=True) / 127.0
+    scale = np.where(scale == 0, 1.0, scale).astype("float32")
+    q_weight = np.clip(np.round(weight / scale), -127, 127).astype("int8")
+    return q_weight, scale
+
+
+@relax.expr_functor.mutator
+class WeightOnlyInt8Rewriter(relax.PyExprMutator):
+    """
+    将 matmul / conv2d 的常量权重量化为 int8
+
+    权重以 int8 常量存储，计算前反量化为 float32，计算精度保持不变。
+    matmul 权重按最后一维（输出通道）量化，conv2d（OIHW）按第 0 维量化。
+
+    反量化放在按形状生成的私有 Relax 函数中：FoldConstant 不会对 Relax 函数调用求值，
+    若直接写成 multiply(astype(int8 常量), scale)，所有输入都是常量，会被折叠回 float32 权重。
+    """
+
+    def __init__(self, mod):
+        super().__init__(mod)
+        self.mod_ = mod
+        # (权重形状, scale 形状) -> 反量化函数的 GlobalVar
+        self._dequantize_gvars = {}
+
+    def _dequantize_func(self, shape, scale_shape):
+        key = (tuple(shape), tuple(scale_shape))
+        if key not in self._dequantize_gvars:
+            name = f"{DEQUANTIZE_PREFIX}{len(self._dequantize_gvars)}"
+            q_weight = relax.Var("q_weight", relax.TensorStructInfo(shape, "int8"))
+            scale = relax.Var("scale", relax.TensorStructInfo(scale_shape, "float32"))
+            bb = relax.BlockBuilder()
+            with bb.function(name, [q_weight, scale], private=True):
+                with bb.dataflow():
+                    out = bb.emit_output(relax.op.multiply(relax.op.astype(q_weight, "float32"), scale))
+                bb.emit_func_output(out)
+            self._dequantize_gvars[key] = self.builder_.add_func(bb.get()[name], name)
+        return self._dequantize_gvars[key]
+
+    def transform(self):
+        for gvar, func in self.mod_.functions_items():
+            if isinstance(func, relax.Function):
+                self.builder_.update_func(gvar, self.visit_expr(func))
+        return self.builder_.get()
+
+    def _lookup_constant(self, expr):
+        if isinstance(expr, relax.Var):
+            expr = self.lookup_binding(expr)
+        return expr if isinstance(expr, relax.Constant) else None
+
+    def visit_call_(self, call):
+        call = self.visit_expr_post_order(call)
+        if not isinstance(call.op, tvm.ir.Op) or call.op.name not in _ACCUMULATE_OPS:
+            return call
+
+        weight = self._lookup_constant(call.args[1])
+        if weight is None or weight.struct_info.dtype != "float32":
+            return call
+
+        axis = -1 if call.op.name == "relax.matmul" else 0
+        q_weight, scale = _quantize_per_channel(weight.data.numpy(), axis)
+        dequantize = self._dequantize_func(q_weight.shape, scale.shape)
+        dequantized = self.builder_.emit(
+            relax.Call(dequantize, [relax.const(q_weight, "int8"), relax.const(scale, "float32")])
+        )
+        args = [call.args[0], dequantized] + list(call.args[2:])
+        return relax.Call(call.op, args, call.attrs, call.sinfo_args, call.span)
+
+
+def convert_precision(mod, mode, accumulate_dtype="float32"):
+    """
+    将 float32 Relax 模块（权重以常量嵌入）转换为指定精度
+
+    参数:
+        mod: convert_to_relax / from_exported_program 的输出
+        mode: "float32" / "float16" / "bfloat16" / "int8_weight"
+        accumulate_dtype: 低精度模式下 matmul / conv2d 的累加精度
+    返回:
+        转换并折叠常量后的 IRModule
+    异常:
+        RuntimeError: 转换后的模块不满足 well_formed
+    """
+    # 先折叠权重上的 permute_dims 等操作，使权重成为直接的常量
+    mod = relax.transform.FoldConstant()(mod)
+    if mode == "float32":
+        return mod
+    if mode in ("float16", "bfloat16"):
+        mod = LowPrecisionRewriter(mod, mode, accumulate_dtype).transform()
+    elif mode == "int8_weight":
+        mod = WeightOnlyInt8Rewriter(mod).transform()
+    else:
+        raise ValueError(f"不支持的精度模式: {mode}")
+    # 折叠常量上的 astype，使权重以低精度存储；int8 权重的反量化在函数调用之后，不受影响
+    mod = tvm.transform.Sequential(
+        [
+            relax.transform.FoldConstant(),
+            relax.transform.CanonicalizeBindings(),
+            relax.transform.DeadCodeElimination(),
+        ]
+    )(mod)
+    if not relax.analysis.well_formed(mod):
+        raise RuntimeError(f"{mode} 转换后的模块不满足 well_formed")
+    return mod
+
+
+def parameter_bytes(mod):
+    """统计模块中所有常量（即嵌入的权重）占用的字节数"""
+    total = 0
+
+    def visitor(node):
+        nonlocal total
+        if isinstance(node, relax.Constant):
+            sinfo = node.struct_info
+            dtype = tvm.DataType(sinfo.dtype)
+            numel = int(np.prod([int(dim) for dim in sinfo.shape.values], dtype=np.int64))
+            total += numel * ((dtype.bits + 7) // 8) * dtype.lanes
+
+    for _, func in mod.functions_items():
+        if isinstance(func, relax.Function):
+            post_order_visit(func, visitor)
+    return total
+
+
+def quantized_weight_bytes(mod):
+    """
+    统计 int8 权重量化后仍以 int8 保存的权重
+
+    返回:
+        (int8 权重字节数, scale 字节数)，按反量化函数的调用统计
+    """
+    int8_bytes = 0
+    scale_bytes = 0
+
+    def visitor(node):
+        nonlocal int8_bytes, scale_bytes
+        if (
+            isinstance(node, relax.Call)
+            and isinstance(node.op, relax.GlobalVar)
+            and node.op.name_hint.startswith(DEQUANTIZE_PREFIX)
+        ):
+            q_weight, scale = node.args
+            if isinstance(q_weight, relax.Constant) and isinstance(scale, relax.Constant):
+                int8_bytes += q_weight.data.numpy().nbytes
+                scale_bytes += scale.data.numpy().nbytes
+
+    for _, func in mod.functions_items():
+        if isinstance(func, relax.Function):
+            post_order_visit(func, visitor)
+    return int8_bytes, scale_bytes
+
+
+def check_int8_weight_bytes(base_bytes, mod, rtol=0.01):
+    """
+    确认 int8_weight 模块中被量化的权重确实以 int8 存储：
+    参数字节数应为 base_bytes - 4 * int8 + int8 + scale，即被量化的权重缩小约 4 倍
+
+    返回:
+        被量化权重的压缩比（float32 字节数 / (int8 + scale) 字节数）
+    异常:
+        RuntimeError: 没有 int8 权重，或参数字节数与预期不符（权重被折叠回了 float32）
+    """
+    int8_bytes, scale_bytes = quantized_weight_bytes(mod)
+    if int8_bytes == 0:
+        raise RuntimeError("int8_weight 模块中没有 int8 权重，量化后的权重被折叠回了 float32")
+    expected = base_bytes - 3 * int8_bytes + scale_bytes
+    actual = parameter_bytes(mod)
+    if abs(actual - expected) > rtol * base_bytes:
+        raise RuntimeError(f"int8_weight 参数字节数为 {actual}，预期约为 {expected}（float32 为 {base_bytes}）")
+    return 4 * int8_bytes / (int8_bytes + scale_bytes)
+
+
+def _to_float32_numpy(nd):
+    """将输出转换为 float32 NumPy 数组；元组输出取第一项"""
+    if not isinstance(nd, tvm.nd.NDArray):
+        nd = nd[0]
+    return nd.numpy().astype(np.float32)
+
+
+def run_on_cpu(mod, input_np, func_name="main", number=10, repeat=10):
+    """编译并在 CPU 上运行，返回 (float32 输出, 平均延迟 ms)"""
+    dev = tvm.cpu()
+    ex = tvm.compile(mod, target="llvm")
+    vm = relax.VirtualMachine(ex, dev)
+    input_nd = tvm.nd.array(input_np, dev)
+    output = _to_float32_numpy(vm[func_name](input_nd))
+    timing_res = vm.time_evaluator(func_name, dev, number=number, repeat=repeat)(input_nd)
+    return output, timing_res.mean * 1000
+
+
+def compare_precisions(model_info, modes=("float32", "float16", "bfloat16", "int8_weight")):
+    """
+    对单个模型比较不同精度变体
+
+    返回:
+        {mode: {'param_bytes', 'memory_estimate', 'latency_ms', 'max_abs_error', 'max_rel_error'}}，
+        int8_weight 另有 'weight_compression'
+    异常:
+        RuntimeError: int8_weight 的参数字节数没有按预期减少
+    """
+    base_mod = convert_to_relax(model_info)
+    input_np = model_info["input"].numpy()
+
+    results = {}
+    reference = None
+    for mode in modes:
+        mod = convert_precision(base_mod, mode)
+        _, planned_mod = lower_for_memory_estimation(mod)
+        output, latency_ms = run_on_cpu(mod, input_np)
+        if reference is None:
+            reference = output
+
+        abs_error = np.abs(output - reference)
+        results[mode] = {
+            "param_bytes": parameter_bytes(mod),
+            "memory_estimate": estimate_memory_usage(planned_mod),
+            "latency_ms": latency_ms,
+            "max_abs_error": float(abs_error.max()),
+            "max_rel_error": float((abs_error / (np.abs(reference) + 1e-12)).max()),
+        }
+        if mode == "int8_weight":
+            results[mode]["weight_compression"] = check_int8_weight_bytes(
+                parameter_bytes(convert_precision(base_mod, "float32")), mod
+            )
+    return results
+
+
+def print_precision_report(results):
+    """打印精度对比报告"""
+    base = results.get("float32")
+    header = f"{'精度':<12}{'参数(KB)':>12}{'延迟(ms)':>12}{'加速比':>10}{'最大绝对误差':>16}{'最大相对误差':>16}"
+    print(header)
+    print("-" * len(header))
+    for mode, r in results.items():
+        speedup = base["latency_ms"] / r["latency_ms"] if base else float("nan")
+        print(
+            f"{mode:<12}{r['param_bytes'] / 1024:>12.2f}{r['latency_ms']:>12.4f}"
+            f"{speedup:>10.2f}{r['max_abs_error']:>16.3e}{r['max_rel_error']:>16.3e}"
+        )
+    if "int8_weight" in results:
+        print(f"int8 量化权重压缩比（含 scale）: {results['int8_weight']['weight_compression']:.2f}x")
+    for mode, r in results.items():
+        print(f"\n--- {mode} 内存估算 ---")
+        print(r["memory_estimate"])
+
+
+def demo_precision_conversion():
+    """降精度转换演示"""
+    print("=== 降精度转换与对比演示 ===")
+
+    for model_name, model_info in create_model_variants().items():
+        print(f"\n--- {model_name.upper()} 模型 ---")
+        try:
+            print_precision_report(compare_precisions(model_info))
+        except Exception as e:
+            print(f"模型 {model_name} 精度对比失败: {e}")
+
+
+if __name__ == "__main__":
+    demo_precision_conversion()
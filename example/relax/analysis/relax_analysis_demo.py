@@ -24,6 +24,7 @@ from tvm.relax.expr import Function, Var
 import numpy as np
 from tvm.relax.frontend.torch import from_exported_program
 from torch.export import export
+from analysis_cache import demo_analysis_cache
 
 
 class SimpleModel(nn.Module):
@@ -223,6 +224,9 @@ def run_comprehensive_demo():
         # 7. 高级分析
         demo_advanced_analysis()
         
+        # 8. 分析结果缓存
+        demo_analysis_cache(mod)
+        
         print("\n" + "=" * 50)
         print("所有演示完成！")
         
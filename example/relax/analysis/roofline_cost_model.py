@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态 Roofline 代价模型
+
+post_order_visit_demo 中的分析只统计张量与算子的数量。本文件在降低到 call_tir 之后，
+对每个内核静态计算：
+- FLOPs：遍历 PrimFunc 的循环嵌套，每个 BufferStore 中浮点运算的个数乘以外层循环次数
+- 访存字节数：内核输入与输出张量的字节数之和（必须的访存量，roofline 的下界）
+
+再结合一次性测得的机器参数（峰值 GFLOP/s、按工作集大小分档的内存带宽、单次函数调用开销、
+单个内核的启动开销），按 roofline 模型预测每个内核与整个函数的延迟，并标注每个内核是计算受限还是访存受限。
+流水线或消融搜索可以先用预测值淘汰候选，只编译、测量排名靠前的少数几个。
+"""
+
+import json
+import os
+import platform
+import time
+
+import numpy as np
+import tvm
+from tvm import relax, tir
+
+from memory_estimation_demo import convert_to_relax, create_model_variants
+
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tvm_examples", "machine_profile.json")
+
+# 带宽测量的工作集大小（字节）：大致对应 L1/L2、LLC 与主存
+BANDWIDTH_TIERS = (64 * 1024, 2 * 1024 ** 2, 64 * 1024 ** 2)
+
+_FLOAT_BINARY_OPS = (tir.Add, tir.Sub, tir.Mul, tir.Div, tir.FloorDiv, tir.Min, tir.Max)
+
+
+def lower_to_call_tir(mod):
+    """合法化并融合，得到每个绑定为一次 call_tir 的形式"""
+    return tvm.transform.Sequential(
+        [
+            relax.transform.LegalizeOps(),
+            relax.transform.AnnotateTIROpPattern(),
+            relax.transform.FoldConstant(),
+            relax.transform.FuseOps(),
+            relax.transform.FuseTIR(),
+            relax.transform.DeadCodeElimination(),
+        ]
+    )(mod)
+
+
+def _is_float(dtype):
+    return str(dtype).startswith(("float", "bfloat"))
+
+
+def _expr_flops(expr):
+    """表达式中的浮点运算次数；不进入 BufferLoad 的下标，下标计算不计入 FLOPs"""
+    if isinstance(expr, _FLOAT_BINARY_OPS):
+        return int(_is_float(expr.dtype)) + _expr_flops(expr.a) + _expr_flops(expr.b)
+    if isinstance(expr, tir.Call):
+        # exp / sqrt / tanh 等数学函数按 1 次计
+        return int(_is_float(expr.dtype)) + sum(_expr_flops(arg) for arg in expr.args)
+    if isinstance(expr, tir.Select):
+        return _expr_flops(expr.condition) + _expr_flops(expr.true_value) + _expr_flops(expr.false_value)
+    if isinstance(expr, tir.Cast):
+        return _expr_flops(expr.value)
+    if isinstance(expr, tir.Let):
+        return _expr_flops(expr.value) + _expr_flops(expr.body)
+    if hasattr(expr, "a") and hasattr(expr, "b"):
+        # 比较与逻辑运算：本身不计入，继续统计操作数
+        return _expr_flops(expr.a) + _expr_flops(expr.b)
+    return 0
+
+
+def _loop_extent(extent):
+    if isinstance(extent, tir.IntImm):
+        return int(extent.value)
+    raise ValueError(f"循环次数 {extent} 不是常量，代价模型只支持静态形状")
+
+
+def _stmt_flops(stmt, trips):
+    if isinstance(stmt, tir.For):
+        return _stmt_flops(stmt.body, trips * _loop_extent(stmt.extent))
+    if isinstance(stmt, tir.SeqStmt):
+        return sum(_stmt_flops(s, trips) for s in stmt.seq)
+    if isinstance(stmt, tir.BlockRealize):
+        return _stmt_flops(stmt.block, trips)
+    if isinstance(stmt, tir.Block):
+        # init 只做赋值，不计入
+        return _stmt_flops(stmt.body, trips)
+    if isinstance(stmt, tir.BufferStore):
+        return trips * _expr_flops(stmt.value)
+    if isinstance(stmt, tir.Evaluate):
+        return trips * _expr_flops(stmt.value)
+    if isinstance(stmt, tir.IfThenElse):
+        branches = [stmt.then_case] + ([stmt.else_case] if stmt.else_case is not None else [])
+        return max(_stmt_flops(s, trips) for s in branches)
+    if hasattr(stmt, "body"):
+        # LetStmt / AttrStmt / Allocate / DeclBuffer 等
+        return _stmt_flops(stmt.body, trips)
+    return 0
+
+
+def primfunc_flops(func):
+    """PrimFunc 的浮点运算次数"""
+    return _stmt_flops(func.body, 1)
+
+
+def _sinfo_bytes(sinfo):
+    """张量（或张量元组）的字节数；非张量返回 0，动态形状抛出 ValueError"""
+    if isinstance(sinfo, relax.TupleStructInfo):
+        return sum(_sinfo_bytes(field) for field in sinfo.fields)
+    if not isinstance(sinfo, relax.TensorStructInfo):
+        return 0
+    if sinfo.shape is None:
+        raise ValueError("张量形状未知")
+    try:
+        numel = int(np.prod([int(dim) for dim in sinfo.shape.values], dtype=np.int64))
+    except TypeError as e:
+        raise ValueError(f"形状 {sinfo.shape} 不是静态形状") from e
+    dtype = tvm.DataType(sinfo.dtype)
+    return numel * ((dtype.bits + 7) // 8) * dtype.lanes
+
+
+def analyze_costs(mod, func_name="main", lowered=False):
+    """
+    统计函数中每次 call_tir 的 FLOPs 与访存字节数
+
+    参数:
+        mod: 高层 Relax 模块；lowered 为 True 时视为已经过 lower_to_call_tir
+    返回:
+        (降低后的模块, 行列表)；每行 {'index', 'var', 'kernel', 'flops', 'bytes', 'intensity', 'status'}，
+        status 为 ok / dynamic / opaque（非 call_tir 调用，如外部库函数）
+    """
+    if not lowered:
+        mod = lower_to_call_tir(mod)
+    call_tir_op = tvm.ir.Op.get("relax.call_tir")
+    rows = []
+    for block in mod[func_name].body.blocks:
+        for binding in block.bindings:
+            call = binding.value
+            if not isinstance(call, relax.Call):
+                continue
+            row = {"index": len(rows), "var": binding.var.name_hint, "kernel": None,
+                   "flops": None, "bytes": None, "intensity": None, "status": "ok"}
+            if not call.op.same_as(call_tir_op):
+                if isinstance(call.op, tvm.ir.Op) and call.op.name.startswith("relax.call_dps_packed"):
+                    row.update(kernel=str(call.args[0].global_symbol), status="opaque")
+                    rows.append(row)
+                continue
+            gvar = call.args[0]
+            row["kernel"] = gvar.name_hint
+            try:
+                row["flops"] = primfunc_flops(mod[gvar])
+                row["bytes"] = sum(_sinfo_bytes(arg.struct_info) for arg in call.args[1].fields)
+                row["bytes"] += _sinfo_bytes(call.sinfo_args[0])
+                row["intensity"] = row["flops"] / row["bytes"] if row["bytes"] else float("inf")
+            except ValueError:
+                row["status"] = "dynamic"
+            rows.append(row)
+    return mod, rows
+
+
+def _single_op_module(make_expr, shapes, dtype="float32"):
+    bb = relax.BlockBuilder()
+    params = [relax.Var(f"x{i}", relax.TensorStructInfo(shape, dtype)) for i, shape in enumerate(shapes)]
+    with bb.function("main", params):
+        with bb.dataflow():
+            out = bb.emit_output(make_expr(*params))
+        bb.emit_func_output(out)
+    return bb.get()
+
+
+def _add_chain_module(length):
+    """length 个相互依赖的单元素 add，用于测量每多一个内核增加的开销"""
+    bb = relax.BlockBuilder()
+    x = relax.Var("x0", relax.TensorStructInfo((1,), "float32"))
+    y = relax.Var("x1", relax.TensorStructInfo((1,), "float32"))
+    with bb.function("main", [x, y]):
+        with bb.dataflow():
+            out = x
+            for _ in range(length - 1):
+                out = bb.emit(relax.op.add(out, y))
+            out = bb.emit_output(relax.op.add(out, y))
+        bb.emit_func_output(out)
+    return bb.get()
+
+
+def _time_module(mod, shapes, target, dev, min_repeat_ms=200):
+    vm = relax.VirtualMachine(tvm.compile(mod, target=target), dev)
+    args = [tvm.nd.array(np.random.rand(*shape).astype("float32"), dev) for shape in shapes]
+    vm["main"](*args)
+    return vm.time_evaluator("main", dev, repeat=5, min_repeat_ms=min_repeat_ms)(*args).median
+
+
+def measure_machine_profile(target="llvm", matmul_size=512, tiers=BANDWIDTH_TIERS):
+    """
+    一次性微基准测试，测量代价模型使用的机器参数
+
+    峰值算力与带宽都用 TVM 默认流水线编译的内核测得，反映当前编译器在本机上可达到的上限，
+    而不是硬件的理论峰值；NumPy（BLAS / memcpy）的结果一并记录，作为参考。
+
+    返回:
+        {'peak_gflops', 'bandwidth_gbps': [[工作集字节, GB/s], ...], 'call_overhead_us', 'kernel_launch_us',
+         'numpy_peak_gflops', 'numpy_bandwidth_gbps', 'host', 'target', 'num_threads', 'timestamp'}
+    """
+    dev = tvm.cpu()
+    n = matmul_size
+    matmul_s = _time_module(_single_op_module(relax.op.matmul, [(n, n), (n, n)]), [(n, n), (n, n)], target, dev)
+
+    bandwidth = []
+    for tier in tiers:
+        # add 读两个数组、写一个数组
+        numel = max(tier // (3 * 4), 1)
+        add_s = _time_module(_single_op_module(relax.op.add, [(numel,), (numel,)]), [(numel,), (numel,)], target, dev)
+        bandwidth.append([tier, 3 * 4 * numel / add_s / 1e9])
+
+    # 单次 VM 函数调用（含一个最小内核）的固定开销；每多一个内核增加的开销用 1 个与 33 个内核的差值测得，
+    # CPU 上通常接近 0
+    overhead_s = _time_module(_add_chain_module(1), [(1,), (1,)], target, dev)
+    chain = 33
+    chain_s = _time_module(_add_chain_module(chain), [(1,), (1,)], target, dev)
+    launch_s = max(chain_s - overhead_s, 0.0) / (chain - 1)
+
+    a = np.random.rand(n, n).astype("float32")
+    start = time.perf_counter()
+    for _ in range(10):
+        a @ a
+    numpy_gflops = 10 * 2 * n ** 3 / (time.perf_counter() - start) / 1e9
+    big = np.random.rand(tiers[-1] // 8).astype("float32")
+    out = np.empty_like(big)
+    start = time.perf_counter()
+    for _ in range(10):
+        np.copyto(out, big)
+    numpy_gbps = 10 * 2 * big.nbytes / (time.perf_counter() - start) / 1e9
+
+    return {
+        "peak_gflops": 2 * n ** 3 / matmul_s / 1e9,
+        "bandwidth_gbps": bandwidth,
+        "call_overhead_us": overhead_s * 1e6,
+        "kernel_launch_us": launch_s * 1e6,
+        "numpy_peak_gflops": numpy_gflops,
+        "numpy_bandwidth_gbps": numpy_gbps,
+        "host": platform.node(),
+        "target": str(target),
+        "num_threads": os.environ.get("TVM_NUM_THREADS", os.cpu_count()),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def load_machine_profile(path=DEFAULT_PROFILE_PATH, target="llvm", refresh=False):
+    """读取缓存的机器参数；主机、target 或线程数不一致、缺少字段或 refresh 为 True 时重新测量并保存"""
+    if not refresh and os.path.exists(path):
+        with open(path) as f:
+            profile = json.load(f)
+        key = (platform.node(), str(target), str(os.environ.get("TVM_NUM_THREADS", os.cpu_count())))
+        if (profile["host"], profile["target"], str(profile["num_threads"])) == key and "kernel_launch_us" in profile:
+            return profile
+    profile = measure_machine_profile(target)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return profile
+
+
+def _bandwidth_for(working_set, profile):
+    """按工作集大小选择带宽档位：取第一个不小于工作集的档位，超过所有档位时取主存带宽"""
+    for tier, gbps in profile["bandwidth_gbps"]:
+        if working_set <= tier:
+            return gbps
+    return profile["bandwidth_gbps"][-1][1]
+
+
+def predict_latency(rows, profile):
+    """
+    按 roofline 模型预测每个内核与整个函数的延迟
+
+    单个内核: max(FLOPs / 峰值算力, 字节数 / 带宽) + 内核启动开销；
+    整个函数: 各内核之和 + 一次函数调用开销。计算时间较大时为 compute-bound，否则为 memory-bound。
+    返回:
+        {'ops': 带 'predicted_us' / 'bound' 的行列表, 'total_us', 'ridge_point', 'unpredicted'}
+    """
+    peak = profile["peak_gflops"] * 1e9
+    launch = profile["kernel_launch_us"]
+    ops = []
+    total = profile["call_overhead_us"]
+    for row in rows:
+        row = dict(row, predicted_us=None, bound=None)
+        if row["status"] == "ok":
+            compute_us = row["flops"] / peak * 1e6
+            memory_us = row["bytes"] / (_bandwidth_for(row["bytes"], profile) * 1e9) * 1e6
+            row["predicted_us"] = max(compute_us, memory_us) + launch
+            row["bound"] = "compute" if compute_us > memory_us else "memory"
+            total += row["predicted_us"]
+        ops.append(row)
+    return {
+        "ops": ops,
+        "total_us": total,
+        "ridge_point": peak / (profile["bandwidth_gbps"][-1][1] * 1e9),
+        "unpredicted": [row["var"] for row in ops if row["predicted_us"] is None],
+    }
+
+
+def rank_candidates(modules, profile, func_name="main"):
+    """
+    不编译，按预测的端到端延迟对候选模块排序
+
+    参数:
+        modules: {名称: 高层 Relax 模块}
+    返回:
+        [(名称, 预测微秒)]，按预测值升序；无法预测（含动态形状或外部调用）的候选排在最后
+    """
+    ranked = []
+    for name, mod in modules.items():
+        _, rows = analyze_costs(mod, func_name)
+        prediction = predict_latency(rows, profile)
+        ranked.append((name, float("inf") if prediction["unpredicted"] else prediction["total_us"]))
+    return sorted(ranked, key=lambda item: item[1])
+
+
+def measure_kernel_latencies(lowered_mod, inputs_np, target="llvm", repeat=20, func_name="main"):
+    """
+    编译并运行降低后的模块，用 set_instrument 测量每个内核的单次调用延迟
+
+    返回:
+        ({内核名: 单次调用的延迟中位数（微秒）}, 端到端延迟中位数（微秒）)
+    """
+    dev = tvm.cpu()
+    vm = relax.VirtualMachine(tvm.compile(lowered_mod, target=target), dev)
+    inputs = [tvm.nd.array(x, dev) for x in inputs_np]
+    vm[func_name](*inputs)
+    e2e_us = vm.time_evaluator(func_name, dev, number=10, repeat=repeat)(*inputs).median * 1e6
+
+    kernels = {gvar.name_hint for gvar, func in lowered_mod.functions_items() if isinstance(func, tir.PrimFunc)}
+    samples = {}
+    starts = {}
+
+    def timing_instrument(func, func_symbol, before_run, ret_value, *args):
+        if func_symbol not in kernels:
+            return
+        if before_run:
+            starts[func_symbol] = time.perf_counter_ns()
+        else:
+            samples.setdefault(func_symbol, []).append((time.perf_counter_ns() - starts[func_symbol]) / 1e3)
+
+    vm.set_instrument(timing_instrument)
+    for _ in range(repeat):
+        vm[func_name](*inputs)
+    return {name: float(np.median(values)) for name, values in samples.items()}, e2e_us
+
+
+def print_roofline_report(prediction, measured=None, e2e_measured_us=None):
+    print(f"{'变量':<10}{'内核':<36}{'MFLOP':>10}{'KB':>10}{'FLOP/B':>8}{'受限':>9}{'预测 µs':>10}{'实测 µs':>10}")
+    for row in prediction["ops"]:
+        if row["predicted_us"] is None:
+            print(f"{row['var']:<10}{str(row['kernel']):<36}  {row['status']}")
+            continue
+        actual = "-" if not measured or row["kernel"] not in measured else f"{measured[row['kernel']]:.1f}"
+        print(f"{row['var']:<10}{row['kernel'][:35]:<36}{row['flops'] / 1e6:>10.2f}{row['bytes'] / 1024:>10.1f}"
+              f"{row['intensity']:>8.2f}{row['bound']:>9}{row['predicted_us']:>10.1f}{actual:>10}")
+    line = f"端到端预测: {prediction['total_us']:.1f} µs（ridge point {prediction['ridge_point']:.1f} FLOP/B）"
+    if e2e_measured_us is not None:
+        line += f"，实测: {e2e_measured_us:.1f} µs，比值 {prediction['total_us'] / e2e_measured_us:.2f}"
+    print(line)
+
+
+def demo_roofline_cost_model(validate=True):
+    """在 create_model_variants 的模型上预测延迟，并与实测对比"""
+    print("=== Roofline 代价模型演示 ===")
+    profile = load_machine_profile()
+    tiers = ", ".join(f"{tier // 1024} KB: {gbps:.1f} GB/s" for tier, gbps in profile["bandwidth_gbps"])
+    print(f"机器参数: {profile['peak_gflops']:.1f} GFLOP/s（NumPy {profile['numpy_peak_gflops']:.1f}），"
+          f"带宽 {tiers}，调用开销 {profile['call_overhead_us']:.1f} µs，"
+          f"内核启动开销 {profile['kernel_launch_us']:.2f} µs")
+
+    for name, info in create_model_variants().items():
+        print(f"\n--- {name} ---")
+        lowered, rows = analyze_costs(convert_to_relax(info))
+        prediction = predict_latency(rows, profile)
+        measured, e2e_us = None, None
+        if validate:
+            measured, e2e_us = measure_kernel_latencies(lowered, [info["input"].numpy()])
+        print_roofline_report(prediction, measured, e2e_us)
+
+
+if __name__ == "__main__":
+    demo_roofline_cost_model()
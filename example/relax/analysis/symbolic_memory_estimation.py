@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TVM Relax 符号化内存估算
+
+estimate_memory_usage 对动态形状的分配只统计数量。本文件为每个分配生成以函数
+tir.Var（由 defined_symbolic_vars / tir_vars_in_struct_info 得到）表示的符号化大小表达式，
+并提供基于 NumPy 的向量化求值器，可一次性计算大量具体绑定下的内存占用，
+例如直接回答 "8 GB 内最多能跑多大的 batch"，而无需为每个批次大小重新导出模型。
+"""
+
+import numpy as np
+import torch
+import tvm
+from tvm import relax, tir
+from tvm.relax.analysis import defined_symbolic_vars, tir_vars_in_struct_info
+from tvm.relax.frontend.torch import from_exported_program
+
+
+# 与 estimate_memory_usage 中 MemoryEstimator 识别的分配算子保持一致
+_BUILTIN_ALLOC_TENSOR = "relax.builtin.alloc_tensor"
+_MEMORY_ALLOC_TENSOR = "relax.memory.alloc_tensor"
+_MEMORY_ALLOC_STORAGE = "relax.memory.alloc_storage"
+
+
+def _dtype_bytes(dtype):
+    """计算单个元素占用的字节数，公式与 estimate_memory_usage 相同"""
+    dtype = tvm.DataType(str(dtype))
+    return ((dtype.bits + 7) // 8) * dtype.lanes
+
+
+def _shape_size_expr(shape_values, dtype):
+    """由形状维度和数据类型构造字节数表达式"""
+    size = tir.IntImm("int64", _dtype_bytes(dtype))
+    for dim in shape_values:
+        size = size * tir.Cast("int64", dim) if dim.dtype != "int64" else size * dim
+    return size
+
+
+def _allocation_from_binding(binding):
+    """从单个 VarBinding 中提取分配信息，不是分配则返回 None"""
+    if not isinstance(binding, relax.VarBinding):
+        return None
+
+    value = binding.value
+    if isinstance(value, relax.Call) and isinstance(value.op, tvm.ir.Op):
+        op_name = value.op.name
+        if op_name == _MEMORY_ALLOC_TENSOR:
+            # memory.alloc_tensor 从已有 storage 上切分，不产生新的物理内存
+            return None
+        if op_name == _BUILTIN_ALLOC_TENSOR:
+            shape_arg, dtype_arg = value.args[0], value.args[1]
+            if not isinstance(shape_arg, relax.ShapeExpr):
+                raise TypeError(f"{op_name} 的形状参数不是 ShapeExpr: {type(shape_arg)}")
+            return {
+                "name": binding.var.name_hint,
+                "op": op_name,
+                "shape": list(shape_arg.values),
+                "dtype": str(dtype_arg.value),
+                "size": _shape_size_expr(shape_arg.values, dtype_arg.value),
+            }
+        if op_name == _MEMORY_ALLOC_STORAGE:
+            size_arg = value.args[0]
+            if not isinstance(size_arg, relax.ShapeExpr):
+                raise TypeError(f"{op_name} 的大小参数不是 ShapeExpr: {type(size_arg)}")
+            return {
+                "name": binding.var.name_hint,
+                "op": op_name,
+                "shape": list(size_arg.values),
+                "dtype": str(value.args[3].value),
+                "size": _shape_size_expr(size_arg.values, "uint8"),
+            }
+
+    # 高层 IR（如 from_exported_program 的直接输出）没有显式分配，
+    # 此时把每个产生张量的调用结果视为一次分配
+    sinfo = binding.var.struct_info
+    if (
+        isinstance(value, relax.Call)
+        and isinstance(sinfo, relax.TensorStructInfo)
+        and isinstance(sinfo.shape, relax.ShapeExpr)
+    ):
+        return {
+            "name": binding.var.name_hint,
+            "op": str(value.op),
+            "shape": list(sinfo.shape.values),
+            "dtype": sinfo.dtype,
+            "size": _shape_size_expr(sinfo.shape.values, sinfo.dtype),
+        }
+    return None
+
+
+def estimate_symbolic_memory_usage(mod):
+    """
+    对 IRModule 中的每个 Relax 函数进行符号化内存估算
+
+    参数:
+        mod: IRModule 或单个 relax.Function（会包装为名为 "main" 的模块）
+    返回:
+        {函数名: {'symbolic_vars', 'input_vars', 'allocations', 'total'}}，
+        其中 allocations 每一项的 'size' 与 'total' 均为以 symbolic_vars 表示的 PrimExpr（字节）
+    """
+    if isinstance(mod, relax.Function):
+        mod = tvm.IRModule({"main": mod})
+
+    analyzer = tvm.arith.Analyzer()
+    results = {}
+    for gvar, func in mod.functions_items():
+        if not isinstance(func, relax.Function):
+            continue
+
+        symbolic_vars = list(defined_symbolic_vars(func))
+        param_vars = set()
+        for param in func.params:
+            param_vars.update(v.name for v in tir_vars_in_struct_info(param.struct_info))
+
+        allocations = []
+        total = tir.IntImm("int64", 0)
+        if isinstance(func.body, relax.SeqExpr):
+            for block in func.body.blocks:
+                for binding in block.bindings:
+                    alloc = _allocation_from_binding(binding)
+                    if alloc is None:
+                        continue
+                    alloc["size"] = analyzer.simplify(alloc["size"])
+                    allocations.append(alloc)
+                    total = total + alloc["size"]
+
+        results[gvar.name_hint] = {
+            "symbolic_vars": symbolic_vars,
+            # 只出现在函数内部（例如由 match_cast 引入）的变量无法由输入形状确定
+            "input_vars": [v for v in symbolic_vars if v.name in param_vars],
+            "allocations": allocations,
+            "total": analyzer.simplify(total),
+        }
+    return results
+
+
+def _expr_to_numpy_source(expr, var_names):
+    """把 TIR 表达式翻译为可作用于 NumPy 数组的 Python 源码"""
+    if isinstance(expr, tir.IntImm):
+        return f"np.int64({expr.value})"
+    if isinstance(expr, tir.Var):
+        if expr.name not in var_names:
+            raise ValueError(f"表达式中的符号变量 {expr.name} 不在绑定列表 {var_names} 中")
+        return f"_v[{var_names.index(expr.name)}]"
+    if isinstance(expr, tir.Cast):
+        return _expr_to_numpy_source(expr.value, var_names)
+
+    binary_ops = {
+        tir.Add: "({} + {})",
+        tir.Sub: "({} - {})",
+        tir.Mul: "({} * {})",
+        tir.FloorDiv: "np.floor_divide({}, {})",
+        tir.FloorMod: "np.mod({}, {})",
+        tir.Max: "np.maximum({}, {})",
+        tir.Min: "np.minimum({}, {})",
+    }
+    for node_type, template in binary_ops.items():
+        if isinstance(expr, node_type):
+            return template.format(
+                _expr_to_numpy_source(expr.a, var_names),
+                _expr_to_numpy_source(expr.b, var_names),
+            )
+    raise TypeError(f"不支持的 TIR 表达式类型: {type(expr).__name__}")
+
+
+def compile_vectorized_evaluator(expr, var_names):
+    """
+    将符号化大小表达式编译为向量化求值函数
+
+    参数:
+        expr: 以 tir.Var 表示的 PrimExpr
+        var_names: 求值函数参数对应的符号变量名（顺序即参数顺序）
+    返回:
+        f(*arrays) -> np.ndarray[int64]，每个参数为同形状的整数数组或标量
+    """
+    source = _expr_to_numpy_source(expr, list(var_names))
+    code = compile(f"lambda *_v: {source}", "<symbolic_memory>", "eval")
+    return eval(code, {"np": np})  # pylint: disable=eval-used
+
+
+def evaluate_memory(estimate, bindings):
+    """
+    在多组具体绑定下批量求值单个函数的内存估算
+
+    参数:
+        estimate: estimate_symbolic_memory_usage 返回结果中某个函数的条目
+        bindings: {符号变量名: 整数或一维数组}，数组长度相同
+    返回:
+        {'total': np.ndarray, 'allocations': {分配名: np.ndarray}}（单位：字节）
+    """
+    var_names = list(bindings.keys())
+    values = [np.asarray(bindings[name], dtype=np.int64) for name in var_names]
+    shape = np.broadcast_shapes(*(v.shape for v in values)) if values else ()
+
+    def _evaluate(expr):
+        return np.broadcast_to(compile_vectorized_evaluator(expr, var_names)(*values), shape)
+
+    total = _evaluate(estimate["total"])
+    per_alloc = {alloc["name"]: _evaluate(alloc["size"]) for alloc in estimate["allocations"]}
+    return {"total": total, "allocations": per_alloc}
+
+
+def max_binding_within_budget(estimate, var_name, budget_bytes, candidates, fixed_bindings=None):
+    """
+    在候选取值中找出内存总量不超过预算的最大取值
+
+    参数:
+        estimate: 单个函数的符号化估算结果
+        var_name: 待搜索的符号变量名（如批次维度）
+        budget_bytes: 内存预算（字节）
+        candidates: 候选取值序列，例如 range(1, 65537)
+        fixed_bindings: 其他符号变量的固定取值
+    返回:
+        满足预算的最大取值；若均不满足则返回 None
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    bindings = dict(fixed_bindings or {})
+    bindings[var_name] = candidates
+    totals = evaluate_memory(estimate, bindings)["total"]
+    fits = np.nonzero(totals <= budget_bytes)[0]
+    if fits.size == 0:
+        return None
+    return int(candidates[fits].max())
+
+
+def get_batch_var(func):
+    """返回第一个输入第 0 维对应的符号变量，常用于表示批次大小"""
+    sinfo = func.params[0].struct_info
+    if not isinstance(sinfo, relax.TensorStructInfo) or not isinstance(sinfo.shape, relax.ShapeExpr):
+        return None
+    dim = sinfo.shape.values[0]
+    return dim if isinstance(dim, tir.Var) else None
+
+
+def export_with_dynamic_batch(model, example_input, max_batch=65536):
+    """以符号批次维度导出 PyTorch 模型并转换为 Relax 模块"""
+    model.eval()
+    batch = torch.export.Dim("batch", min=1, max=max_batch)
+    # 批次为 1 的示例输入会被 torch.export 特化为常量，这里使用批次 2 导出
+    example_input = example_input.expand(2, *example_input.shape[1:]).contiguous()
+    with torch.no_grad():
+        exported = torch.export.export(model, (example_input,), dynamic_shapes=({0: batch},))
+        mod = from_exported_program(exported)
+    return mod
+
+
+def format_symbolic_estimate(func_name, estimate):
+    """生成易读的符号化内存估算报告"""
+    lines = [f"函数 {func_name} 的符号化内存估算:"]
+    lines.append(f"  符号变量: {[v.name for v in estimate['symbolic_vars']]}")
+    lines.append(f"  分配数量: {len(estimate['allocations'])}")
+    for alloc in estimate["allocations"]:
+        lines.append(f"    {alloc['name']}: {alloc['size']} 字节 ({alloc['op']}, {alloc['dtype']})")
+    lines.append(f"  总计: {estimate['total']} 字节")
+    return "\n".join(lines)
+
+
+def demo_symbolic_memory_estimation():
+    """符号化内存估算演示"""
+    print("=== 符号化内存估算演示 ===")
+
+    from memory_estimation_demo import MediumModel
+
+    mod = export_with_dynamic_batch(MediumModel(), torch.randn(1, 3, 32, 32))
+    estimates = estimate_symbolic_memory_usage(mod)
+    main_est = estimates["main"]
+    print(format_symbolic_estimate("main", main_est))
+
+    batch_var = get_batch_var(mod["main"])
+    batch_sizes = np.array([1, 4, 8, 16, 32])
+    totals = evaluate_memory(main_est, {batch_var.name: batch_sizes})["total"]
+
+    print("\n不同批次大小下的内存占用:")
+    for batch_size, total in zip(batch_sizes, totals):
+        print(f"  batch={batch_size:<4d} {total / (1024 * 1024):.2f} MB")
+
+    budget = 8 * 1024 ** 3
+    max_batch = max_binding_within_budget(main_est, batch_var.name, budget, range(1, 65537))
+    print(f"\n8 GB 内存预算下的最大批次大小: {max_batch}")
+
+
+if __name__ == "__main__":
+    demo_symbolic_memory_estimation()
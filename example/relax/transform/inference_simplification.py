@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推理图化简报告
+
+docs/help/decompose_ops_for_inference_analysis.md 分析了 DecomposeOpsForInference 如何改写
+batch_norm 等算子，但没有说明它与 FoldConstant、CanonicalizeBindings、DeadCodeElimination
+组成的化简链在真实模型上实际省下了多少。本文件对 from_exported_program 得到的模块依次执行：
+    DecomposeOpsForInference -> FoldConstant -> CanonicalizeBindings -> DeadCodeElimination
+并报告每个阶段：
+- 绑定数、算子调用数（按算子分类）、常量个数与字节数的变化
+- 规划前后的内存估算（estimate_symbolic_memory_usage 在 StaticPlanBlockMemory 前后求值）
+- CPU 延迟，以及与原模块输出的最大误差
+
+最后检查化简后的模块中仍未实现的折叠：
+- constant_inputs：输入全部是常量、却没有被 FoldConstant 折叠的调用
+- inference_op：推理时应当消失的算子（batch_norm、dropout）仍然存在
+- into_weights：卷积 / 矩阵乘之后按通道的常量缩放（如分解后的 batch_norm），可以合并进权重
+- affine_chain：连续的按通道常量运算，可以合并为一次缩放加一次平移
+这条化简链不做重结合，后两类需要专门的改写。
+"""
+
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import torch
+import tvm
+from torch import nn
+from tvm import relax
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+from def_use_index import DefUseIndex  # noqa: E402
+from ir_iterator import iter_bindings, iter_nodes  # noqa: E402
+from memory_estimation_demo import LargeModel, MediumModel, convert_to_relax  # noqa: E402
+from memory_validation_harness import lower_for_memory_estimation  # noqa: E402
+from post_order_visit_demo import DemoModel  # noqa: E402
+from precision_conversion import parameter_bytes, run_on_cpu  # noqa: E402
+from symbolic_memory_estimation import estimate_symbolic_memory_usage, evaluate_memory  # noqa: E402
+
+
+# 化简链，按顺序累积执行
+STAGES = (
+    ("decompose", relax.transform.DecomposeOpsForInference),
+    ("fold_constant", relax.transform.FoldConstant),
+    ("canonicalize", relax.transform.CanonicalizeBindings),
+    ("dce", relax.transform.DeadCodeElimination),
+)
+
+# 推理时应当被分解或删除的算子
+INFERENCE_OPS = ("relax.nn.batch_norm", "relax.nn.dropout")
+# 与常量的逐元素运算；其中缩放类可以合并进前一个卷积 / 矩阵乘的常量权重
+_AFFINE_OPS = ("relax.add", "relax.subtract", "relax.multiply", "relax.divide")
+_SCALE_OPS = ("relax.multiply", "relax.divide")
+_WEIGHTED_OPS = ("relax.nn.conv2d", "relax.matmul")
+
+
+def _op_name(call):
+    return call.op.name if isinstance(call.op, tvm.ir.Op) else None
+
+
+def _is_constant_arg(expr):
+    if isinstance(expr, relax.Tuple):
+        return all(_is_constant_arg(field) for field in expr.fields)
+    return isinstance(expr, (relax.Constant, relax.ShapeExpr, relax.PrimValue, relax.StringImm, relax.DataTypeImm))
+
+
+def _static_bytes(sinfo):
+    if not isinstance(sinfo, relax.TensorStructInfo) or sinfo.shape is None:
+        return None
+    try:
+        numel = int(np.prod([int(dim) for dim in sinfo.shape.values], dtype=np.int64))
+    except TypeError:
+        return None
+    dtype = tvm.DataType(sinfo.dtype)
+    return numel * ((dtype.bits + 7) // 8) * dtype.lanes
+
+
+def module_stats(mod, func_name="main"):
+    """
+    统计模块的绑定、算子调用与常量，并估算规划前后的内存
+
+    返回:
+        {'bindings', 'calls', 'ops': Counter, 'constants', 'constant_bytes',
+         'memory_before_plan', 'memory_after_plan'}
+    """
+    ops = Counter(
+        _op_name(node) for node in iter_nodes(mod) if isinstance(node, relax.Call) and _op_name(node)
+    )
+    before_plan, after_plan = lower_for_memory_estimation(mod)
+    memory = {}
+    for key, planned in (("memory_before_plan", before_plan), ("memory_after_plan", after_plan)):
+        estimate = estimate_symbolic_memory_usage(planned)[func_name]
+        memory[key] = int(evaluate_memory(estimate, {})["total"])
+    return {
+        "bindings": sum(1 for _ in iter_bindings(mod)),
+        "calls": sum(ops.values()),
+        "ops": ops,
+        "constants": sum(isinstance(node, relax.Constant) for node in iter_nodes(mod, unique=True)),
+        "constant_bytes": parameter_bytes(mod),
+        **memory,
+    }
+
+
+def _weighted_producer(index, var):
+    """沿只被使用一次的逐元素常量运算向上查找，返回产生 var 的常量权重卷积 / 矩阵乘的算子名"""
+    while isinstance(var, relax.Var) and var in index and index.use_count(var) == 1:
+        binding = index.binding(var)
+        if binding is None or not isinstance(binding.value, relax.Call):
+            return None
+        call = binding.value
+        name = _op_name(call)
+        if name in _WEIGHTED_OPS:
+            return name if isinstance(call.args[1], relax.Constant) else None
+        if name not in _AFFINE_OPS:
+            return None
+        var = _affine_input(call)
+    return None
+
+
+def _per_channel_constant(call):
+    """逐元素运算的另一个操作数是常量，且最多只有一个维度大于 1（按通道的缩放或平移）"""
+    if not isinstance(call, relax.Call) or _op_name(call) not in _AFFINE_OPS:
+        return False
+    constants = [arg for arg in call.args if isinstance(arg, relax.Constant)]
+    if len(constants) != 1:
+        return False
+    # 常量作被减数或被除数时不是仿射变换
+    if _op_name(call) in ("relax.subtract", "relax.divide") and not isinstance(call.args[1], relax.Constant):
+        return False
+    shape = constants[0].data.shape
+    return sum(dim > 1 for dim in shape) <= 1
+
+
+def _affine_input(call):
+    return next((arg for arg in call.args if isinstance(arg, relax.Var)), None)
+
+
+def find_unrealized_folds(mod, func_name="main"):
+    """
+    查找化简后仍未实现的折叠
+
+    返回:
+        [{'kind', 'var', 'op', 'detail'}]，kind 为 constant_inputs / inference_op / into_weights / affine_chain
+    """
+    index = DefUseIndex(mod[func_name])
+    findings = []
+    for binding in index.bindings:
+        call = binding.value
+        if not isinstance(call, relax.Call):
+            continue
+        name = _op_name(call)
+        var = binding.var.name_hint
+        if name is None:
+            continue
+
+        if name in INFERENCE_OPS:
+            findings.append({"kind": "inference_op", "var": var, "op": name, "detail": "推理时应当被分解或删除"})
+        elif call.args and all(_is_constant_arg(arg) for arg in call.args) and any(
+            isinstance(arg, relax.Constant) for arg in call.args
+        ):
+            out_bytes = _static_bytes(call.struct_info)
+            in_bytes = sum(_static_bytes(a.struct_info) or 0 for a in call.args if isinstance(a, relax.Constant))
+            if tvm.ir.Op.get(name).get_attr("FLegalize") is None:
+                detail = "算子没有合法化实现，FoldConstant 无法求值"
+            elif out_bytes is not None and out_bytes > in_bytes:
+                detail = f"输出 {out_bytes} 字节大于常量输入 {in_bytes} 字节，折叠会增大模块"
+            else:
+                detail = "输入全部为常量但未被折叠"
+            findings.append({"kind": "constant_inputs", "var": var, "op": name, "detail": detail})
+        elif _per_channel_constant(call):
+            source = _affine_input(call)
+            producer = _weighted_producer(index, source) if name in _SCALE_OPS else None
+            previous = index.binding(source) if source is not None and source in index else None
+            if producer is not None:
+                findings.append(
+                    {"kind": "into_weights", "var": var, "op": name, "detail": f"可合并进前面 {producer} 的常量权重"}
+                )
+            elif previous is not None and index.use_count(source) == 1 and _per_channel_constant(previous.value):
+                findings.append(
+                    {"kind": "affine_chain", "var": var, "op": name,
+                     "detail": f"可与前面的 {_op_name(previous.value)}({source.name_hint}) 合并"}
+                )
+    return findings
+
+
+def simplify_for_inference(mod, input_np, func_name="main", measure=True):
+    """
+    依次执行化简链，统计每个阶段
+
+    参数:
+        mod: from_exported_program 得到的模块（权重嵌入为常量）
+        input_np: NumPy 输入，用于测量延迟与核对输出
+        measure: 为 False 时跳过编译与延迟测量
+    返回:
+        {'stages': [{'stage', **module_stats, 'latency_ms', 'max_abs_error'}], 'unrealized': [...], 'module': 化简后的模块}
+    """
+    stages = []
+    reference = None
+    current = mod
+    for stage, make_pass in (("original", None),) + STAGES:
+        if make_pass is not None:
+            current = make_pass()(current)
+        row = {"stage": stage, **module_stats(current, func_name)}
+        if measure:
+            output, row["latency_ms"] = run_on_cpu(current, input_np, func_name)
+            if reference is None:
+                reference = output
+            row["max_abs_error"] = float(np.max(np.abs(output - reference)))
+        stages.append(row)
+    return {"stages": stages, "unrealized": find_unrealized_folds(current, func_name), "module": current}
+
+
+def print_simplification_report(report):
+    """打印每个阶段相对上一阶段的变化，以及未实现的折叠"""
+    kb = 1024
+    header = (
+        f"{'阶段':<15}{'绑定':>8}{'调用':>8}{'常量':>8}{'常量(KB)':>12}"
+        f"{'规划前(KB)':>12}{'规划后(KB)':>12}{'延迟(ms)':>10}{'误差':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    previous = None
+    for row in report["stages"]:
+        latency = f"{row['latency_ms']:>10.3f}" if "latency_ms" in row else f"{'-':>10}"
+        error = f"{row['max_abs_error']:>10.1e}" if "max_abs_error" in row else f"{'-':>10}"
+        print(
+            f"{row['stage']:<15}{row['bindings']:>8}{row['calls']:>8}{row['constants']:>8}"
+            f"{row['constant_bytes'] / kb:>12.1f}{row['memory_before_plan'] / kb:>12.1f}"
+            f"{row['memory_after_plan'] / kb:>12.1f}{latency}{error}"
+        )
+        if previous is not None:
+            removed = previous["ops"] - row["ops"]
+            added = row["ops"] - previous["ops"]
+            if removed or added:
+                changes = [f"-{n} {op}" for op, n in removed.most_common()] + [f"+{n} {op}" for op, n in added.most_common()]
+                print(f"{'':<15}{', '.join(changes)}")
+        previous = row
+
+    unrealized = report["unrealized"]
+    print(f"\n未实现的折叠: {len(unrealized)} 处")
+    for kind, count in Counter(item["kind"] for item in unrealized).items():
+        print(f"  {kind}: {count}")
+    for item in unrealized:
+        print(f"    [{item['kind']}] {item['var']} = {item['op']}(...): {item['detail']}")
+
+
+class ConvBNModel(nn.Module):
+    """conv-bn-relu 结构的小型 CNN，batch_norm 在推理时由 DecomposeOpsForInference 分解"""
+
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            nn.Conv2d(3, 16, 3, padding=1), nn.BatchNorm2d(16), nn.ReLU(),
+            nn.Conv2d(16, 32, 3, padding=1), nn.BatchNorm2d(32), nn.ReLU(),
+            nn.AdaptiveAvgPool2d(1),
+        )
+        self.classifier = nn.Sequential(nn.Dropout(0.2), nn.Linear(32, 10))
+
+    def forward(self, x):
+        return self.classifier(torch.flatten(self.features(x), 1))
+
+
+def demo_inference_simplification():
+    """对 ConvBNModel、MediumModel、LargeModel、DemoModel 输出化简报告"""
+    print("=== 推理图化简报告 ===")
+    models = {
+        "conv_bn": ConvBNModel(),
+        "medium": MediumModel(),
+        "large": LargeModel(),
+        "demo_cnn": DemoModel(),
+    }
+    reports = {}
+    for name, model in models.items():
+        # 随机化 running_mean / running_var，使分解后的常量不是平凡的 0 与 1
+        for module in model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 1.5)
+        x = torch.randn(1, 3, 32, 32)
+        mod = convert_to_relax({"model": model, "input": x, "input_spec": [("input", x.shape, "float32")]})
+        print(f"\n--- {name} ---")
+        reports[name] = simplify_for_inference(mod, x.numpy())
+        print_simplification_report(reports[name])
+    return reports
+
+
+if __name__ == "__main__":
+    demo_inference_simplification()
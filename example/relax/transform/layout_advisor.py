@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+布局变换顾问
+
+ConvertLayout 可以把所有 conv2d 统一换成某种布局，但对具体模型哪种布局更快、
+是否值得为单个算子插入布局转换，只能靠实测。本文件为 conv / matmul 密集的模型
+（MediumModel、LargeModel、DemoModel）自动完成这一步：
+- 枚举每个 conv2d 的候选布局（NCHW、NHWC、分块的 NCHW{b}c）与每个常量权重 matmul 的候选布局（KN、分块的 KN{b}n），
+  以及用 ConvertLayout 整体转换的候选
+- 每个候选改写为独立的 IRModule，布局转换以显式的 permute_dims / layout_transform 出现在图中；
+  权重上的转换由 FoldConstant 在编译期完成，激活上的转换计入端到端延迟
+- 在进程池中并行编译所有候选，然后逐个在 CPU 上测量延迟并与原模块对比数值
+- 按单算子的实测收益组合出最终方案，输出最佳的改写后模块与报告
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import torch
+import tvm
+from tvm import relax
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+from memory_estimation_demo import LargeModel, MediumModel, convert_to_relax  # noqa: E402
+from post_order_visit_demo import DemoModel  # noqa: E402
+
+
+# 分块布局的块大小
+DEFAULT_BLOCK_SIZES = (8, 16)
+
+# 整体转换的候选：ConvertLayout 会沿 relu / pool 等算子传播布局，减少转换次数
+GLOBAL_CANDIDATES = {
+    "all:NHWC": {"relax.nn.conv2d": ["NHWC", "OHWI"]},
+}
+
+_CONV_OP = "relax.nn.conv2d"
+_MATMUL_OP = "relax.matmul"
+
+
+def _static_shape(expr):
+    sinfo = expr.struct_info
+    if not isinstance(sinfo, relax.TensorStructInfo) or sinfo.shape is None:
+        return None
+    try:
+        return [int(dim) for dim in sinfo.shape.values]
+    except TypeError:
+        return None
+
+
+def _conv_candidates(call, block_sizes):
+    attrs = call.attrs
+    data_shape, weight_shape = _static_shape(call.args[0]), _static_shape(call.args[1])
+    if (
+        data_shape is None or weight_shape is None or int(attrs.groups) != 1
+        or (attrs.data_layout, attrs.kernel_layout, attrs.out_layout or attrs.data_layout) != ("NCHW", "OIHW", "NCHW")
+    ):
+        return []
+    cout, cin = weight_shape[0], weight_shape[1]
+    return ["NHWC"] + [f"NCHW{b}c" for b in block_sizes if cin % b == 0 and cout % b == 0]
+
+
+def _matmul_candidates(call, block_sizes):
+    data_shape = _static_shape(call.args[0])
+    weight = call.args[1]
+    if data_shape is None or len(data_shape) != 2 or not isinstance(weight, relax.Constant):
+        return []
+    weight_shape = _static_shape(weight)
+    if weight_shape is None or len(weight_shape) != 2:
+        return []
+    return [f"KN{b}n" for b in block_sizes if weight_shape[1] % b == 0 and weight_shape[1] > b]
+
+
+def find_layout_sites(mod, func_name="main", block_sizes=DEFAULT_BLOCK_SIZES):
+    """
+    找出函数中布局敏感的调用点
+
+    返回:
+        列表，每项 {'site', 'op', 'var', 'data_shape', 'weight_shape', 'candidates'}；
+        site 形如 "conv2d#0"，按调用在函数中的顺序编号，与 LayoutRewriter 的编号一致
+    """
+    sites = []
+    counters = {_CONV_OP: 0, _MATMUL_OP: 0}
+    for block in mod[func_name].body.blocks:
+        for binding in block.bindings:
+            call = binding.value
+            if not (isinstance(call, relax.Call) and isinstance(call.op, tvm.ir.Op) and call.op.name in counters):
+                continue
+            index = counters[call.op.name]
+            counters[call.op.name] += 1
+            is_conv = call.op.name == _CONV_OP
+            candidates = _conv_candidates(call, block_sizes) if is_conv else _matmul_candidates(call, block_sizes)
+            sites.append({
+                "site": f"{'conv2d' if is_conv else 'matmul'}#{index}",
+                "op": call.op.name,
+                "var": binding.var.name_hint,
+                "data_shape": _static_shape(call.args[0]),
+                "weight_shape": _static_shape(call.args[1]),
+                "candidates": candidates,
+            })
+    return sites
+
+
+@relax.expr_functor.mutator
+class LayoutRewriter(relax.PyExprMutator):
+    """
+    按 choices 改写指定调用点的布局
+
+    参数:
+        mod: 输入模块（应已执行 FoldConstant，使权重成为直接的常量）
+        choices: {site: 布局}，site 与 find_layout_sites 的编号一致，未列出的调用点保持原布局
+        func_name: 改写的函数
+
+    每个被改写的调用在输入端插入到目标布局的转换，在输出端转换回原布局，
+    调用点之外的图保持不变。
+    """
+
+    def __init__(self, mod, choices, func_name="main"):
+        super().__init__(mod)
+        self.mod_ = mod
+        self.choices = dict(choices)
+        self.func_name = func_name
+        self._counters = {_CONV_OP: 0, _MATMUL_OP: 0}
+
+    def transform(self):
+        gvar = self.mod_.get_global_var(self.func_name)
+        self.builder_.update_func(gvar, self.visit_expr(self.mod_[gvar]))
+        return self.builder_.get()
+
+    def visit_call_(self, call):
+        call = self.visit_expr_post_order(call)
+        if not isinstance(call.op, tvm.ir.Op) or call.op.name not in self._counters:
+            return call
+        index = self._counters[call.op.name]
+        self._counters[call.op.name] += 1
+        if call.op.name == _CONV_OP:
+            layout = self.choices.get(f"conv2d#{index}", "NCHW")
+            return call if layout == "NCHW" else self._rewrite_conv(call, layout)
+        layout = self.choices.get(f"matmul#{index}", "KN")
+        return call if layout == "KN" else self._rewrite_matmul(call, layout)
+
+    def _conv(self, call, data, weight, data_layout, kernel_layout):
+        attrs = call.attrs
+        return self.builder_.emit(
+            relax.op.nn.conv2d(
+                data,
+                weight,
+                strides=attrs.strides,
+                padding=attrs.padding,
+                dilation=attrs.dilation,
+                groups=attrs.groups,
+                data_layout=data_layout,
+                kernel_layout=kernel_layout,
+                out_layout=data_layout,
+                out_dtype=call.struct_info.dtype,
+            )
+        )
+
+    def _rewrite_conv(self, call, layout):
+        data, weight = call.args[0], call.args[1]
+        emit = self.builder_.emit
+        if layout == "NHWC":
+            out = self._conv(
+                call,
+                emit(relax.op.permute_dims(data, [0, 2, 3, 1])),
+                emit(relax.op.permute_dims(weight, [0, 2, 3, 1])),
+                "NHWC",
+                "OHWI",
+            )
+            return relax.op.permute_dims(out, [0, 3, 1, 2])
+
+        b = int(layout[len("NCHW"):-1])
+        out = self._conv(
+            call,
+            emit(relax.op.layout_transform(data, lambda n, c, h, w: (n, c // b, h, w, c % b))),
+            emit(relax.op.layout_transform(weight, lambda o, i, h, w: (o // b, i // b, h, w, i % b, o % b))),
+            layout,
+            f"OIHW{b}i{b}o",
+        )
+        return relax.op.layout_transform(out, lambda n, c, h, w, cb: (n, c * b + cb, h, w))
+
+    def _rewrite_matmul(self, call, layout):
+        # 权重 (K, N) 按输出列分块为 (N/b, K, b)，每块 b 列在 K 方向上连续存放；
+        # 以批量 matmul 计算 (N/b, M, b)，再转换回 (M, N)
+        b = int(layout[len("KN"):-1])
+        x, weight = call.args[0], call.args[1].data.numpy()
+        k, n = weight.shape
+        packed = np.ascontiguousarray(weight.reshape(k, n // b, b).transpose(1, 0, 2))
+        emit = self.builder_.emit
+        out = emit(relax.op.matmul(x, relax.const(packed, str(weight.dtype)), out_dtype=call.struct_info.dtype))
+        out = emit(relax.op.permute_dims(out, [1, 0, 2]))
+        return relax.op.reshape(out, [_static_shape(x)[0], n])
+
+
+def apply_layout_choices(mod, choices, func_name="main"):
+    """按 choices 改写模块，并折叠权重上的布局转换"""
+    if choices:
+        mod = LayoutRewriter(mod, choices, func_name).transform()
+    return tvm.transform.Sequential(
+        [relax.transform.FoldConstant(), relax.transform.CanonicalizeBindings()]
+    )(mod)
+
+
+def apply_global_layout(mod, desired_layouts):
+    """用 ConvertLayout 整体转换布局"""
+    return tvm.transform.Sequential(
+        [
+            relax.transform.ConvertToDataflow(),
+            relax.transform.ConvertLayout(desired_layouts),
+            relax.transform.Normalize(),
+            relax.transform.FoldConstant(),
+            relax.transform.CanonicalizeBindings(),
+        ]
+    )(mod)
+
+
+def _compile_variant(name, mod_json, target, lib_path):
+    """工作进程：编译一个候选并导出动态库"""
+    try:
+        mod = tvm.ir.load_json(mod_json)
+        start = time.perf_counter()
+        executable = tvm.compile(mod, target=target)
+        compile_s = time.perf_counter() - start
+        executable.export_library(lib_path)
+        return {"name": name, "lib_path": lib_path, "compile_s": compile_s, "error": None}
+    except Exception as e:  # pylint: disable=broad-except
+        return {"name": name, "lib_path": None, "compile_s": None, "error": f"{type(e).__name__}: {e}"[:2000]}
+
+
+def compile_variants(variants, target, out_dir, workers=None):
+    """
+    在进程池中并行编译候选
+
+    参数:
+        variants: {名称: IRModule}
+    返回:
+        {名称: {'lib_path', 'compile_s', 'error'}}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_compile_variant, name, tvm.ir.save_json(mod), str(target),
+                        os.path.join(out_dir, re.sub(r"[^0-9A-Za-z_.-]", "_", name) + ".so"))
+            for name, mod in variants.items()
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.pop("name")] = result
+    return results
+
+
+def measure_variant(lib_path, inputs_np, number=20, repeat=10):
+    """加载编译好的候选，返回 (输出 numpy 数组, 每次运行的延迟毫秒列表)"""
+    dev = tvm.cpu()
+    vm = relax.VirtualMachine(tvm.runtime.load_module(lib_path), dev)
+    inputs = [tvm.nd.array(x, dev) for x in inputs_np]
+    out = vm["main"](*inputs)
+    # from_exported_program 生成的 main 以元组返回
+    out = out if hasattr(out, "numpy") else out[0]
+    timing = vm.time_evaluator("main", dev, number=number, repeat=repeat)(*inputs)
+    return out.numpy(), [t * 1000 for t in timing.results]
+
+
+def _evaluate(variants, choices_by_name, inputs_np, reference, target, out_dir, workers, number, repeat, rtol, atol):
+    compiled = compile_variants(variants, target, out_dir, workers)
+    rows = []
+    for name in variants:
+        row = {"name": name, "choices": choices_by_name.get(name, {}), **compiled[name]}
+        row.update(latency_ms=None, latency_std_ms=None, max_abs_err=None, status="compile_error")
+        if row["error"] is None:
+            try:
+                out, samples = measure_variant(row["lib_path"], inputs_np, number, repeat)
+                row["latency_ms"] = float(np.median(samples))
+                row["latency_std_ms"] = float(np.std(samples))
+                if reference is not None:
+                    row["max_abs_err"] = float(np.max(np.abs(out - reference)))
+                    ok = np.allclose(out, reference, rtol=rtol, atol=atol)
+                    row["status"] = "ok" if ok else "mismatch"
+                else:
+                    row["status"] = "ok"
+                    row["output"] = out
+            except Exception as e:  # pylint: disable=broad-except
+                row["status"], row["error"] = "run_error", f"{type(e).__name__}: {e}"[:2000]
+        rows.append(row)
+    return rows
+
+
+def advise_layouts(mod, inputs_np, target="llvm", out_dir="./layout_advisor", workers=None,
+                   block_sizes=DEFAULT_BLOCK_SIZES, number=20, repeat=10, min_gain=0.02,
+                   rtol=1e-4, atol=1e-4):
+    """
+    为模块选择布局
+
+    流程:
+        1. 基线与 GLOBAL_CANDIDATES 中的整体转换
+        2. 每个调用点的每个候选布局单独改写（其余调用点保持原布局）
+        3. 把单独改写后延迟下降超过 min_gain 的选择组合成一个方案
+        每一轮的候选都并行编译，然后串行测量，数值与基线不一致的候选不参与选择。
+
+    参数:
+        mod: 输入模块（常量权重嵌入在图中）
+        inputs_np: main 的输入 numpy 数组列表
+        out_dir: 编译产物、最佳模块与报告的输出目录
+        min_gain: 单个调用点被采用所需的最小相对收益
+    返回:
+        报告字典 {'sites', 'variants', 'best', 'best_choices', 'baseline_ms', 'best_ms', 'speedup',
+                  'best_module_path', 'report_path'}
+    """
+    mod = relax.transform.FoldConstant()(mod)
+    sites = find_layout_sites(mod, block_sizes=block_sizes)
+    modules, choices_by_name, build_errors = {}, {}, {}
+
+    def add_variant(name, build, choices):
+        try:
+            modules[name] = build()
+            choices_by_name[name] = choices
+            return [name]
+        except Exception as e:  # pylint: disable=broad-except
+            build_errors[name] = f"{type(e).__name__}: {e}"[:2000]
+            return []
+
+    def evaluate(names, reference):
+        return _evaluate({name: modules[name] for name in names}, choices_by_name, inputs_np, reference,
+                         target, out_dir, workers, number, repeat, rtol, atol)
+
+    # 先单独测量基线，作为数值对比的参考
+    add_variant("baseline", lambda: apply_layout_choices(mod, {}), {})
+    rows = evaluate(["baseline"], None)
+    baseline = rows[0]
+    if baseline["status"] != "ok":
+        raise RuntimeError(f"基线编译或运行失败: {baseline['error']}")
+    reference = baseline.pop("output")
+
+    names = []
+    for name, desired in GLOBAL_CANDIDATES.items():
+        names += add_variant(name, lambda desired=desired: apply_global_layout(mod, desired),
+                             {"*": name.split(":", 1)[1]})
+    for site in sites:
+        for layout in site["candidates"]:
+            choices = {site["site"]: layout}
+            names += add_variant(f"{site['site']}={layout}",
+                                 lambda choices=choices: apply_layout_choices(mod, choices), choices)
+    rows += evaluate(names, reference)
+
+    # 每个调用点取单独改写时最快且超过 min_gain 的布局
+    combined = {}
+    for site in sites:
+        best_row = min(
+            (r for r in rows if r["status"] == "ok" and list(r["choices"]) == [site["site"]]),
+            key=lambda r: r["latency_ms"],
+            default=None,
+        )
+        if best_row is not None and best_row["latency_ms"] < baseline["latency_ms"] * (1 - min_gain):
+            combined.update(best_row["choices"])
+    if len(combined) > 1:
+        rows += evaluate(add_variant("combined", lambda: apply_layout_choices(mod, combined), combined), reference)
+
+    for name, error in build_errors.items():
+        rows.append({"name": name, "choices": {}, "status": "build_error", "error": error,
+                     "latency_ms": None, "latency_std_ms": None, "compile_s": None, "max_abs_err": None})
+
+    best = min((r for r in rows if r["status"] == "ok"), key=lambda r: r["latency_ms"])
+    best_module_path = os.path.join(out_dir, "best_module.json")
+    with open(best_module_path, "w") as f:
+        f.write(tvm.ir.save_json(modules[best["name"]]))
+    report = {
+        "sites": sites,
+        "variants": [{k: v for k, v in r.items() if k != "lib_path"} for r in rows],
+        "best": best["name"],
+        "best_choices": best["choices"],
+        "baseline_ms": baseline["latency_ms"],
+        "best_ms": best["latency_ms"],
+        "speedup": baseline["latency_ms"] / best["latency_ms"],
+        "best_module_path": best_module_path,
+        "report_path": os.path.join(out_dir, "layout_report.json"),
+    }
+    with open(report["report_path"], "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def print_layout_report(report):
+    print(f"{'候选':<28}{'编译 (s)':>10}{'延迟 (ms)':>12}{'±':>8}{'加速':>8}  状态")
+    for row in sorted(report["variants"], key=lambda r: (r["latency_ms"] is None, r["latency_ms"] or 0)):
+        compile_s = "-" if row["compile_s"] is None else f"{row['compile_s']:.2f}"
+        if row["latency_ms"] is None:
+            print(f"{row['name']:<28}{compile_s:>10}{'-':>12}{'-':>8}{'-':>8}  {row['status']}: {row['error']}")
+            continue
+        speedup = report["baseline_ms"] / row["latency_ms"]
+        print(f"{row['name']:<28}{compile_s:>10}{row['latency_ms']:>12.4f}{row['latency_std_ms']:>8.4f}"
+              f"{speedup:>7.2f}x  {row['status']}")
+    print(f"最佳: {report['best']} {report['best_choices']}，{report['speedup']:.2f}x，"
+          f"模块已保存到 {report['best_module_path']}")
+
+
+def demo_layout_advisor(out_dir="./layout_advisor"):
+    """为 MediumModel、LargeModel、DemoModel 选择布局"""
+    print("=== 布局变换顾问演示 ===")
+    models = {"medium": MediumModel(), "large": LargeModel(), "demo_cnn": DemoModel()}
+    for name, model in models.items():
+        example_input = torch.randn(1, 3, 32, 32)
+        mod = convert_to_relax({"model": model, "input": example_input, "input_spec": None})
+        print(f"\n--- {name} ---")
+        for site in find_layout_sites(relax.transform.FoldConstant()(mod)):
+            print(f"  {site['site']:<10} {site['var']:<8} data={site['data_shape']} weight={site['weight_shape']} "
+                  f"候选={site['candidates']}")
+        report = advise_layouts(mod, [example_input.numpy()], out_dir=os.path.join(out_dir, name))
+        print_layout_report(report)
+
+
+if __name__ == "__main__":
+    demo_layout_advisor()
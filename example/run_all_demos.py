@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行 example 目录下的所有演示
+
+每个演示在其所在目录的导入环境下运行（分析示例之间以模块名互相导入），
+单个演示失败不影响其余演示，最后汇总各演示的耗时与状态；任一演示失败时以非零状态码退出。
+
+用法:
+    python run_all_demos.py                 # 运行全部演示
+    python run_all_demos.py --list          # 列出演示名称
+    python run_all_demos.py --only memory,build
+    python run_all_demos.py --suite -- --baseline baseline.json
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+import traceback
+
+EXAMPLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 演示名称 -> (相对目录, 模块名, 入口函数名)
+DEMOS = {
+    "analysis": ("relax/analysis", "relax_analysis_demo", "run_comprehensive_demo"),
+    "post_order_visit": ("relax/analysis", "post_order_visit_demo", "run_all_demos"),
+    "memory": ("relax/analysis", "memory_estimation_demo", "run_all_memory_demos"),
+    "symbolic_memory": ("relax/analysis", "symbolic_memory_estimation", "demo_symbolic_memory_estimation"),
+    "memory_validation": ("relax/analysis", "memory_validation_harness", "run_memory_validation"),
+    "precision": ("relax/analysis", "precision_conversion", "demo_precision_conversion"),
+    "roofline": ("relax/analysis", "roofline_cost_model", "demo_roofline_cost_model"),
+    "layout_advisor": ("relax/transform", "layout_advisor", "demo_layout_advisor"),
+    "inference_simplification": ("relax/transform", "inference_simplification", "demo_inference_simplification"),
+    "build": ("build", "incremental_build", "demo_incremental_build"),
+    "module_serialization": ("build", "module_serialization", "demo_module_serialization"),
+    "shared_kernels": ("build", "shared_kernel_library", "demo_shared_kernel_library"),
+    "streaming_allclose": ("testing", "streaming_allclose", "demo_streaming_allclose"),
+    "numerical_grads": ("testing", "numerical_grads", "demo_numerical_grads"),
+    "rpc_pool": ("testing", "rpc_pool", "demo_rpc_pool"),
+    "output_reuse": ("runtime/vm", "output_reuse", "benchmark_output_reuse"),
+    "vm_metrics": ("runtime/vm", "vm_metrics", "demo_vm_metrics"),
+    "cold_start": ("runtime/vm", "cold_start", "demo_cold_start"),
+    "workspace_pool": ("runtime/vm", "workspace_pool", "demo_workspace_pool"),
+}
+
+
+def run_demo(name):
+    """运行单个演示，返回 (是否成功, 耗时秒)"""
+    directory, module_name, entry = DEMOS[name]
+    path = os.path.join(EXAMPLE_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    start = time.perf_counter()
+    try:
+        getattr(importlib.import_module(module_name), entry)()
+        return True, time.perf_counter() - start
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return False, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="运行所有 TVM 示例演示")
+    parser.add_argument("--list", action="store_true", help="列出演示名称后退出")
+    parser.add_argument("--only", default=None, help="逗号分隔的演示名称，默认全部")
+    parser.add_argument("--suite", action="store_true", help="演示结束后运行 benchmark/perf_suite.py")
+    parser.add_argument("suite_args", nargs=argparse.REMAINDER, help="传给性能回归套件的参数，放在 -- 之后")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(DEMOS))
+        return 0
+
+    names = args.only.split(",") if args.only else list(DEMOS)
+    unknown = [name for name in names if name not in DEMOS]
+    if unknown:
+        parser.error(f"未知演示: {unknown}，可选: {list(DEMOS)}")
+
+    summary = []
+    for name in names:
+        print(f"\n{'=' * 60}\n▶ {name}\n{'=' * 60}")
+        summary.append((name, *run_demo(name)))
+
+    exit_code = 0
+    if args.suite:
+        sys.path.insert(0, os.path.join(EXAMPLE_DIR, "benchmark"))
+        suite_args = args.suite_args[1:] if args.suite_args[:1] == ["--"] else args.suite_args
+        exit_code = importlib.import_module("perf_suite").main(suite_args)
+
+    print(f"\n{'=' * 60}\n演示汇总")
+    for name, ok, elapsed in summary:
+        print(f"  {'✓' if ok else '✗'} {name:<20}{elapsed:>8.1f} s")
+    failed = [name for name, ok, _ in summary if not ok]
+    if failed:
+        print(f"失败: {failed}")
+        exit_code = exit_code or 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VM 冷启动基准测试
+
+把服务进程从启动到首次推理完成的时间拆分为：
+解释器启动、import numpy / torch / tvm、加载导出的库、创建 VirtualMachine、
+加载并上传参数、首次调用与第二次调用。每次测量都在全新的子进程中进行，
+对比三种加载方式：
+- full：与各示例相同的写法，导入 torch 与完整的 tvm，通过 relax.VirtualMachine 加载
+- slim：slim_loader.py 的运行时加载路径，不导入 torch 与编译器栈
+- slim_prewarm：slim 加载后先用全零输入预热，首个真实请求不再承担首次执行的开销
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import tvm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from e2e import TorchModel, convert_torch_model  # noqa: E402
+
+
+SLIM_LOADER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "slim_loader.py")
+MODES = ("full", "slim", "slim_prewarm")
+PHASES = (
+    "interpreter_start", "import_numpy", "import_torch", "import_tvm", "load_module",
+    "create_vm", "load_params", "prewarm", "first_call", "second_call",
+)
+
+
+def export_for_serving(model_dir, model=None, input_shape=(1, 784), target="llvm", func_name="main"):
+    """
+    编译并导出服务所需的文件：model.so、params.bin 与 meta.json
+
+    参数按 p0000、p0001... 的键名保存，加载时按键名排序即可恢复调用顺序。
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    mod, params = convert_torch_model(model if model is not None else TorchModel(), input_shape)
+    tvm.compile(mod, target=target).export_library(os.path.join(model_dir, "model.so"))
+
+    param_dict = {f"p{i:04d}": tvm.nd.array(p.numpy()) for i, p in enumerate(params[func_name])}
+    with open(os.path.join(model_dir, "params.bin"), "wb") as f:
+        f.write(tvm.runtime.save_param_dict(param_dict))
+
+    meta = {"func_name": func_name, "inputs": [{"shape": list(input_shape), "dtype": "float32"}]}
+    with open(os.path.join(model_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return model_dir
+
+
+def measure_cold_start(model_dir, mode):
+    """启动一个全新的子进程测量一次冷启动，返回各阶段耗时（秒）与首次推理时间"""
+    env = dict(os.environ)
+    if mode != "full":
+        # 只加载 libtvm_runtime，import tvm 时跳过编译器相关的 Python 模块
+        env["TVM_USE_RUNTIME_LIB"] = "1"
+    spawn_time = time.time()
+    output = subprocess.run(
+        [sys.executable, SLIM_LOADER, mode, model_dir],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["interpreter_start"] = timings.pop("process_start") - spawn_time
+    timings["time_to_first_inference"] = timings.pop("first_result_time") - spawn_time
+    return timings
+
+
+def benchmark_cold_start(model_dir, modes=MODES, runs=5):
+    """
+    每种加载方式测量 runs 次，取各阶段中位数
+
+    返回:
+        {mode: {phase: 中位数秒数}}
+    """
+    results = {}
+    for mode in modes:
+        samples = [measure_cold_start(model_dir, mode) for _ in range(runs)]
+        keys = set().union(*samples)
+        results[mode] = {key: float(np.median([s.get(key, 0.0) for s in samples])) for key in keys}
+    return results
+
+
+def print_cold_start_report(results):
+    modes = list(results)
+    print(f"{'阶段 (ms)':<24}" + "".join(f"{mode:>14}" for mode in modes))
+    for phase in PHASES + ("time_to_first_inference",):
+        if not any(phase in results[mode] for mode in modes):
+            continue
+        cells = "".join(
+            f"{results[mode][phase] * 1000:>14.1f}" if phase in results[mode] else f"{'-':>14}" for mode in modes
+        )
+        print(f"{phase:<24}{cells}")
+
+
+def demo_cold_start(runs=5):
+    """导出 e2e.py 的 TorchModel 并对比三种加载方式的冷启动时间"""
+    print("=== VM 冷启动演示 ===")
+    with tempfile.TemporaryDirectory() as model_dir:
+        export_for_serving(model_dir)
+        print_cold_start_report(benchmark_cold_start(model_dir, runs=runs))
+
+
+if __name__ == "__main__":
+    demo_cold_start()
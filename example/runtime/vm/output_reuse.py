@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VM 输出缓冲区复用（destination passing）
+
+vm[func_name](...) 每次调用都会为输出分配新的 NDArray。中间结果由 StaticPlanBlockMemory
+静态规划、在多次调用间复用，但函数的输出不参与规划，稳态服务时每个请求都要经过分配器。
+对 e2e.py 中的小型 MLP，这部分开销在单次延迟中占比明显。
+
+本文件提供：
+- to_destination_passing：为 Relax 函数生成 "{func_name}_dps" 变体，输出缓冲区作为额外参数传入，
+  产生输出的 call_tir 改写为 call_tir_inplace，内核直接写入调用方提供的缓冲区
+- OutputArena：按句柄持有一组输出缓冲区并在多次调用间复用；
+  也可以通过 call_into 传入调用方自己管理的缓冲区
+- 安全检查：复用前检查输出缓冲区是否仍被调用方引用，避免覆盖调用方仍在使用的结果
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import tvm
+from tvm import relax
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from e2e import TorchModel, convert_torch_model  # noqa: E402
+
+
+DPS_SUFFIX = "_dps"
+
+
+def _lower_to_call_tir(mod):
+    """降低到 call_tir 形式（与默认流水线的前半段相同），之后 tvm.compile 会跳过已完成的步骤"""
+    return tvm.transform.Sequential(
+        [
+            relax.transform.LegalizeOps(),
+            relax.transform.AnnotateTIROpPattern(),
+            relax.transform.FoldConstant(),
+            relax.transform.FuseOps(),
+            relax.transform.FuseTIR(),
+            relax.transform.CanonicalizeBindings(),
+            relax.transform.DeadCodeElimination(),
+        ]
+    )(mod)
+
+
+def _output_leaves(body, bindings):
+    """把函数返回值解析为产生各输出的 Var 列表，跟随变量别名与元组"""
+    if isinstance(body, relax.Var) and body in bindings and isinstance(bindings[body], (relax.Var, relax.Tuple)):
+        return _output_leaves(bindings[body], bindings)
+    if isinstance(body, relax.Tuple):
+        return [leaf for field in body.fields for leaf in _output_leaves(field, bindings)]
+    if isinstance(body, relax.Var):
+        return [body]
+    raise ValueError(f"不支持的返回值形式: {type(body).__name__}")
+
+
+def output_specs(func):
+    """返回函数各输出的 (shape, dtype)；只支持静态形状的张量输出"""
+    sinfo = func.ret_struct_info
+    fields = sinfo.fields if isinstance(sinfo, relax.TupleStructInfo) else [sinfo]
+    specs = []
+    for field in fields:
+        if not isinstance(field, relax.TensorStructInfo) or field.shape is None:
+            raise ValueError(f"输出必须是形状已知的张量，实际为 {field}")
+        try:
+            shape = tuple(int(dim) for dim in field.shape.values)
+        except TypeError as e:
+            raise ValueError(f"输出形状 {field.shape} 不是静态形状，无法预分配") from e
+        specs.append((shape, field.dtype))
+    return specs
+
+
+def to_destination_passing(mod, func_name="main"):
+    """
+    为 func_name 添加 destination-passing 变体 "{func_name}_dps"
+
+    新函数在原参数之后追加每个输出对应的缓冲区参数，产生输出的 call_tir 改写为
+    call_tir_inplace(..., inplace_indices=[输出参数位置])，返回值与原函数相同（与传入的缓冲区共享存储）。
+    原函数保持不变。
+
+    返回:
+        (新模块, 输出规格列表 [(shape, dtype)])
+    异常:
+        ValueError: 输出不是由单输出的 call_tir 产生，或输出形状不是静态的
+        RuntimeError: 改写后的模块不满足 well_formed
+    """
+    mod = _lower_to_call_tir(mod)
+    func = mod[func_name]
+    specs = output_specs(func)
+
+    call_tir_op = tvm.ir.Op.get("relax.call_tir")
+    bindings = {}
+    for block in func.body.blocks:
+        for binding in block.bindings:
+            if isinstance(binding, relax.VarBinding):
+                bindings[binding.var] = binding.value
+
+    leaves = _output_leaves(func.body.body, bindings)
+    if len(set(leaves)) != len(leaves):
+        raise ValueError("同一个张量多次出现在输出中，无法分别写入不同的缓冲区")
+    out_params = [
+        relax.Var(f"out{i}", relax.TensorStructInfo(shape, dtype)) for i, (shape, dtype) in enumerate(specs)
+    ]
+
+    replacements = {}
+    for leaf, out_param in zip(leaves, out_params):
+        call = bindings.get(leaf)
+        if not (isinstance(call, relax.Call) and call.op.same_as(call_tir_op)):
+            raise ValueError(f"输出 {leaf.name_hint} 不是由 call_tir 产生，无法写入预分配的缓冲区")
+        if isinstance(call.sinfo_args[0], relax.TupleStructInfo):
+            raise ValueError(f"输出 {leaf.name_hint} 来自多输出的内核，暂不支持")
+        args = list(call.args[1].fields)
+        replacements[leaf] = relax.call_tir_inplace(
+            call.args[0],
+            relax.Tuple(args + [out_param]),
+            inplace_indices=[len(args)],
+            out_sinfo=call.sinfo_args[0],
+            tir_vars=call.args[2] if len(call.args) > 2 else None,
+        )
+
+    new_blocks = []
+    for block in func.body.blocks:
+        new_bindings = [
+            relax.VarBinding(b.var, replacements[b.var]) if b.var in replacements else b
+            for b in block.bindings
+        ]
+        block_cls = relax.DataflowBlock if isinstance(block, relax.DataflowBlock) else relax.BindingBlock
+        new_blocks.append(block_cls(new_bindings))
+
+    dps_name = func_name + DPS_SUFFIX
+    dps_func = relax.Function(
+        list(func.params) + out_params,
+        relax.SeqExpr(new_blocks, func.body.body),
+        func.ret_struct_info,
+        func.is_pure,
+        func.attrs,
+    ).with_attr("global_symbol", dps_name)
+    # 新函数直接复用了原函数的参数与绑定变量；两个函数共享 Var 不满足 well_formed，这里整体换成新的 Var
+    mod[dps_name] = relax.utils.copy_with_new_vars(dps_func)
+    if not relax.analysis.well_formed(mod):
+        raise RuntimeError(f"生成 {dps_name} 后模块不满足 well_formed")
+    return mod, specs
+
+
+class OutputArena:
+    """
+    按句柄复用输出缓冲区的调用器
+
+    参数:
+        vm: relax.VirtualMachine，可执行文件需由 to_destination_passing 的结果编译
+        func_name: 原函数名，实际调用 "{func_name}_dps"
+        specs: to_destination_passing 返回的输出规格
+        device: 输出缓冲区所在设备
+        on_conflict: 复用前发现缓冲区仍被调用方引用时的处理方式
+            "reallocate"：把旧缓冲区留给调用方，为本次调用分配新缓冲区（默认）
+            "error"：抛出 RuntimeError，用于调试调用方的生命周期问题
+
+    安全检查基于 Python 引用计数：run 返回后，调用方应在下一次 run 之前释放对输出的引用
+    （例如先 .numpy() 拷贝，再 del）。通过 DLPack 等零拷贝方式持有的底层存储无法检测。
+    """
+
+    def __init__(self, vm, func_name, specs, device, on_conflict="reallocate"):
+        if on_conflict not in ("reallocate", "error"):
+            raise ValueError(f"不支持的 on_conflict: {on_conflict}")
+        self._func = vm[func_name + DPS_SUFFIX]
+        self.specs = specs
+        self.device = device
+        self.on_conflict = on_conflict
+        self._buffers = [self._allocate(i) for i in range(len(specs))]
+        # 只有 self._buffers 持有缓冲区时的引用计数，由同一个辅助函数测得
+        self._baseline_refs = self._refcount(0) if specs else 0
+        self.stats = {"calls": 0, "reuses": 0, "reallocations": 0}
+
+    def _allocate(self, index):
+        shape, dtype = self.specs[index]
+        return tvm.nd.empty(shape, dtype, self.device)
+
+    def _refcount(self, index):
+        return sys.getrefcount(self._buffers[index])
+
+    def _check_released(self):
+        """返回是否所有缓冲区都可以直接复用；仍被引用的缓冲区按 on_conflict 处理"""
+        released = True
+        for index in range(len(self._buffers)):
+            if self._refcount(index) <= self._baseline_refs:
+                continue
+            if self.on_conflict == "error":
+                raise RuntimeError(
+                    f"输出 {index} 仍被调用方引用，复用会覆盖其内容；请在下一次调用前释放引用或拷贝结果"
+                )
+            self._buffers[index] = self._allocate(index)
+            self.stats["reallocations"] += 1
+            released = False
+        return released
+
+    def run(self, *args):
+        """执行一次调用，结果写入复用的输出缓冲区；通过 outputs 读取，在下一次 run 之前有效"""
+        if self._check_released() and self.stats["calls"]:
+            self.stats["reuses"] += 1
+        self._func(*args, *self._buffers)
+        self.stats["calls"] += 1
+
+    @property
+    def outputs(self):
+        return tuple(self._buffers)
+
+    def __call__(self, *args):
+        self.run(*args)
+        return self._buffers[0] if len(self._buffers) == 1 else tuple(self._buffers)
+
+    def call_into(self, outs, *args):
+        """使用调用方提供的输出缓冲区，生命周期完全由调用方管理"""
+        outs = outs if isinstance(outs, (list, tuple)) else [outs]
+        if len(outs) != len(self.specs):
+            raise ValueError(f"需要 {len(self.specs)} 个输出缓冲区，实际为 {len(outs)}")
+        for index, (out, (shape, dtype)) in enumerate(zip(outs, self.specs)):
+            if tuple(out.shape) != shape or str(out.dtype) != dtype:
+                raise ValueError(f"输出 {index} 需要 {shape} {dtype}，实际为 {tuple(out.shape)} {out.dtype}")
+        self._func(*args, *outs)
+        return outs[0] if len(outs) == 1 else tuple(outs)
+
+
+def _python_loop_ms(fn, warmup, repeat):
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def benchmark_output_reuse(batch_sizes=(1, 16), warmup=100, repeat=2000):
+    """对比每次分配输出与复用输出缓冲区的单次调用延迟（e2e.py 的 TorchModel）"""
+    print("=== VM 输出缓冲区复用演示 ===")
+    dev = tvm.cpu()
+    print(f"{'shape':<14}{'alloc (ms)':>12}{'reuse (ms)':>12}{'TE alloc':>12}{'TE reuse':>12}")
+    for batch in batch_sizes:
+        shape = (batch, 784)
+        mod, params = convert_torch_model(TorchModel(), shape)
+        dps_mod, specs = to_destination_passing(mod)
+        vm = relax.VirtualMachine(tvm.compile(dps_mod, target="llvm"), dev)
+        args = [tvm.nd.array(np.random.randn(*shape).astype("float32"), dev), *params["main"]]
+
+        arena = OutputArena(vm, "main", specs, dev, on_conflict="error")
+        np.testing.assert_allclose(vm["main"](*args).numpy(), arena(*args).numpy(), rtol=1e-5, atol=1e-5)
+
+        main = vm["main"]
+        alloc_ms = _python_loop_ms(lambda: main(*args), warmup, repeat)
+        reuse_ms = _python_loop_ms(lambda: arena.run(*args), warmup, repeat)
+        # time_evaluator 在 C++ 侧循环，排除 Python 调用开销
+        te_alloc = vm.time_evaluator("main", dev, number=repeat, repeat=3)(*args).median * 1000
+        te_reuse = vm.time_evaluator("main" + DPS_SUFFIX, dev, number=repeat, repeat=3)(
+            *args, *arena.outputs
+        ).median * 1000
+        print(f"{str(shape):<14}{alloc_ms:>12.4f}{reuse_ms:>12.4f}{te_alloc:>12.4f}{te_reuse:>12.4f}")
+        print(f"  {arena.stats}")
+
+    # 调用方保留输出引用时，安全检查拒绝覆盖
+    kept = arena(*args)
+    try:
+        arena.run(*args)
+    except RuntimeError as e:
+        print(f"安全检查: {e}")
+    del kept
+
+
+if __name__ == "__main__":
+    benchmark_output_reuse()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+只依赖 TVM 运行时的 VM 加载路径
+
+服务进程加载已导出的可执行文件时，不需要 torch，也不需要编译器栈：
+- 设置 TVM_USE_RUNTIME_LIB=1 后 import tvm 只加载 libtvm_runtime 与运行时 Python 模块
+- 不经过 tvm.relax.VirtualMachine，直接调用运行时的 vm_load_executable / vm_initialization
+- 参数从 save_param_dict 生成的文件加载，上传到目标设备
+- 可选预热：就绪前用全零输入调用一次，完成线程池启动、内核首次执行与缓存预热
+
+本文件顶层只导入标准库，作为 cold_start.py 的子进程入口时各阶段耗时都能被单独测量。
+"""
+
+import json
+import os
+import sys
+import time
+
+
+# 与 tvm.runtime.memory_manager 中 AllocatorType.POOLED 对应
+POOLED_ALLOCATOR = 2
+
+
+class SlimVM:
+    """
+    运行时 VM 的最小包装
+
+    参数:
+        lib_path: export_library 导出的可执行文件
+        params_path: save_param_dict 保存的参数文件，按键名排序后作为函数的尾部参数
+        device: "cpu" / "cuda" 等
+        func_name: 调用的函数名
+    """
+
+    def __init__(self, lib_path, params_path=None, device="cpu", func_name="main"):
+        import tvm
+
+        self.timings = {}
+        start = time.perf_counter()
+        executable = tvm.runtime.load_module(lib_path)
+        self.timings["load_module"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.device = tvm.runtime.device(device, 0)
+        self.module = executable["vm_load_executable"]()
+        cpu = tvm.runtime.device("cpu", 0)
+        init_args = [self.device.device_type, self.device.device_id, POOLED_ALLOCATOR]
+        if self.device.device_type != cpu.device_type:
+            init_args += [cpu.device_type, cpu.device_id, POOLED_ALLOCATOR]
+        self.module["vm_initialization"](*init_args)
+        self.func = self.module[func_name]
+        self.timings["create_vm"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.params = []
+        if params_path is not None:
+            with open(params_path, "rb") as f:
+                params = tvm.runtime.load_param_dict(f.read())
+            self.params = [params[key].copyto(self.device) for key in sorted(params)]
+        self.timings["load_params"] = time.perf_counter() - start
+
+    def __call__(self, *inputs):
+        import tvm
+
+        args = [x if isinstance(x, tvm.nd.NDArray) else tvm.nd.array(x, self.device) for x in inputs]
+        return self.func(*args, *self.params)
+
+    def prewarm(self, input_specs, iterations=1):
+        """用全零输入调用 iterations 次；input_specs 为 [(shape, dtype)]"""
+        import numpy as np
+        import tvm
+
+        start = time.perf_counter()
+        inputs = [tvm.nd.array(np.zeros(shape, dtype=dtype), self.device) for shape, dtype in input_specs]
+        for _ in range(iterations):
+            self(*inputs)
+        self.device.sync()
+        self.timings["prewarm"] = time.perf_counter() - start
+
+
+def load_runtime_vm(model_dir, device="cpu", prewarm=True):
+    """
+    加载 cold_start.export_for_serving 导出的目录
+
+    目录中包含 model.so、params.bin 与记录输入规格的 meta.json。
+    """
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    vm = SlimVM(
+        os.path.join(model_dir, "model.so"),
+        os.path.join(model_dir, "params.bin"),
+        device=device,
+        func_name=meta["func_name"],
+    )
+    if prewarm:
+        vm.prewarm([(tuple(spec["shape"]), spec["dtype"]) for spec in meta["inputs"]])
+    return vm, meta
+
+
+def _child_main(mode, model_dir):
+    """
+    cold_start.py 启动的子进程入口，按阶段计时后以 JSON 输出到标准输出
+
+    mode:
+        full：与各示例相同，先 import torch 与完整的 tvm，用 relax.VirtualMachine 加载
+        slim / slim_prewarm：只加载运行时，后者在首个请求前预热
+    """
+    timings = {"process_start": time.time()}
+
+    def phase(name, start):
+        timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import numpy as np
+    phase("import_numpy", start)
+
+    if mode == "full":
+        start = time.perf_counter()
+        import torch  # noqa: F401  各示例顶层都会导入 torch
+        phase("import_torch", start)
+
+    start = time.perf_counter()
+    import tvm
+    phase("import_tvm", start)
+
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    inputs_np = [np.random.rand(*spec["shape"]).astype(spec["dtype"]) for spec in meta["inputs"]]
+
+    if mode == "full":
+        from tvm import relax
+
+        start = time.perf_counter()
+        executable = tvm.runtime.load_module(os.path.join(model_dir, "model.so"))
+        phase("load_module", start)
+        start = time.perf_counter()
+        dev = tvm.cpu()
+        vm = relax.VirtualMachine(executable, dev)
+        phase("create_vm", start)
+        start = time.perf_counter()
+        with open(os.path.join(model_dir, "params.bin"), "rb") as f:
+            params = tvm.runtime.load_param_dict(f.read())
+        params = [params[key].copyto(dev) for key in sorted(params)]
+        phase("load_params", start)
+
+        def run():
+            return vm[meta["func_name"]](*[tvm.nd.array(x, dev) for x in inputs_np], *params)
+    else:
+        vm, _ = load_runtime_vm(model_dir, prewarm=(mode == "slim_prewarm"))
+        timings.update(vm.timings)
+
+        def run():
+            return vm(*inputs_np)
+
+    start = time.perf_counter()
+    run().numpy()
+    phase("first_call", start)
+    timings["first_result_time"] = time.time()
+    start = time.perf_counter()
+    run().numpy()
+    phase("second_call", start)
+
+    print(json.dumps(timings))
+
+
+if __name__ == "__main__":
+    _child_main(sys.argv[1], sys.argv[2])
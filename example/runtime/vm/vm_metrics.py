@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常开的低开销 VM 推理指标
+
+benchmark_ir_module / profiling_ir_module 是离线工具，VirtualMachine 上线后缺少低成本的延迟可见性。
+VMMetrics 包装 VM 函数调用，记录：
+- 每个函数的调用次数与延迟分布（固定桶直方图，整数纳秒）
+- 输出字节数（静态形状函数在包装时预先算好，调用时只做一次加法）
+- 进行中的请求数与异常次数（异常调用不计入延迟分布）
+
+每个线程写自己的分片，调用路径上没有锁；导出时汇总各分片，结果以 Prometheus 文本格式
+写入文件（供 node_exporter textfile collector 采集）或通过本地 HTTP 端点提供。
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import tvm
+from tvm import relax
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from e2e import TorchModel, convert_torch_model  # noqa: E402
+
+
+# 默认延迟桶上界（秒）：10µs 到 10s，大致按 1-2.5-5 递增
+DEFAULT_BUCKETS = (
+    1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+    1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# 分片中除桶计数外的字段，位于桶计数（含 +Inf 桶）之后
+_SUM_NS, _INFLIGHT, _ERRORS, _BYTES = range(4)
+
+
+def _static_output_bytes(func):
+    """静态形状函数每次调用的输出字节数；包含动态形状或非张量输出时返回 None"""
+    sinfo = func.ret_struct_info
+    fields = sinfo.fields if isinstance(sinfo, relax.TupleStructInfo) else [sinfo]
+    total = 0
+    for field in fields:
+        if not isinstance(field, relax.TensorStructInfo) or field.shape is None:
+            return None
+        try:
+            numel = int(np.prod([int(dim) for dim in field.shape.values], dtype=np.int64))
+        except TypeError:
+            return None
+        total += numel * _dtype_bytes(field.dtype)
+    return total
+
+
+def _dtype_bytes(dtype):
+    dtype = tvm.DataType(str(dtype))
+    return ((dtype.bits + 7) // 8) * dtype.lanes
+
+
+def _result_bytes(result):
+    """动态形状函数按实际返回值统计输出字节数，兼容 NDArray 与元组"""
+    if isinstance(result, tvm.nd.NDArray):
+        return int(np.prod(result.shape, dtype=np.int64)) * _dtype_bytes(result.dtype)
+    if hasattr(result, "__len__") and hasattr(result, "__getitem__"):
+        return sum(_result_bytes(result[i]) for i in range(len(result)))
+    return 0
+
+
+class VMMetrics:
+    """
+    VirtualMachine 调用指标
+
+    参数:
+        vm: relax.VirtualMachine
+        mod: 编译前的 IRModule，可选；提供时按返回值的静态形状预先计算输出字节数
+        buckets: 延迟桶上界（秒），升序
+        namespace: 指标名前缀
+
+    用法:
+        metrics = VMMetrics(vm, mod)
+        main = metrics["main"]          # 与 vm["main"] 用法相同
+        out = main(x, *params)
+        metrics.write_prometheus("/var/lib/node_exporter/tvm.prom")
+        metrics.start_http_server(9100)
+
+    VirtualMachine 不是线程安全的。多线程推理时每个线程用同一个 Executable 创建自己的 VM，
+    再用 instrument(name, thread_vm[name]) 包装到同一个 VMMetrics 上，指标按函数名汇总。
+    """
+
+    def __init__(self, vm, mod=None, buckets=DEFAULT_BUCKETS, namespace="tvm_vm"):
+        self.vm = vm
+        self.mod = mod
+        self.buckets = tuple(sorted(buckets))
+        self._bounds_ns = [int(b * 1e9) for b in self.buckets]
+        self.namespace = namespace
+        # 函数名 -> {线程 id: 分片}；每个线程只写自己的分片，调用路径上无锁；
+        # 新增函数或分片时持有 _lock，汇总时在同一把锁下复制字典，避免遍历时字典被修改
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._wrapped = {}
+        self._server = None
+
+    def _new_shard(self, name):
+        shard = [0] * (len(self._bounds_ns) + 1 + 4)
+        with self._lock:
+            self._shards[name][threading.get_ident()] = shard
+        return shard
+
+    def instrument(self, name, func=None):
+        """返回带指标记录的函数；func 为空时包装 vm[name]"""
+        func = func if func is not None else self.vm[name]
+        static_bytes = None
+        if self.mod is not None and name in [g.name_hint for g in self.mod.get_global_vars()]:
+            static_bytes = _static_output_bytes(self.mod[name])
+        count_bytes = (lambda result: static_bytes) if static_bytes is not None else _result_bytes
+        with self._lock:
+            shards = self._shards.setdefault(name, {})
+
+        # 调用路径上用到的对象全部绑定为局部变量，避免属性与全局查找
+        bounds = self._bounds_ns
+        offset = len(bounds) + 1
+        sum_idx, inflight_idx, errors_idx, bytes_idx = (offset + i for i in (_SUM_NS, _INFLIGHT, _ERRORS, _BYTES))
+        new_shard = self._new_shard
+        get_ident = threading.get_ident
+        perf_counter_ns = time.perf_counter_ns
+        bisect_left = bisect.bisect_left
+
+        def call(*args):
+            shard = shards.get(get_ident())
+            if shard is None:
+                shard = new_shard(name)
+            shard[inflight_idx] += 1
+            start = perf_counter_ns()
+            try:
+                result = func(*args)
+            except BaseException:
+                shard[errors_idx] += 1
+                shard[inflight_idx] -= 1
+                raise
+            elapsed = perf_counter_ns() - start
+            shard[bisect_left(bounds, elapsed)] += 1
+            shard[sum_idx] += elapsed
+            shard[inflight_idx] -= 1
+            shard[bytes_idx] += count_bytes(result)
+            return result
+
+        self._wrapped[name] = call
+        return call
+
+    def __getitem__(self, name):
+        return self._wrapped.get(name) or self.instrument(name)
+
+    def snapshot(self):
+        """
+        汇总所有线程的分片
+
+        返回:
+            {函数名: {'buckets': 累计计数列表（最后一项为 +Inf）, 'count', 'sum_s', 'inflight', 'errors', 'bytes'}}
+        """
+        offset = len(self._bounds_ns) + 1
+        with self._lock:
+            all_shards = [(name, list(shards.values())) for name, shards in self._shards.items()]
+        result = {}
+        for name, shards in all_shards:
+            total = np.zeros(offset + 4, dtype=np.int64)
+            for shard in shards:
+                total += shard
+            cumulative = np.cumsum(total[:offset])
+            result[name] = {
+                "buckets": cumulative.tolist(),
+                "count": int(cumulative[-1]),
+                "sum_s": int(total[offset + _SUM_NS]) / 1e9,
+                "inflight": int(total[offset + _INFLIGHT]),
+                "errors": int(total[offset + _ERRORS]),
+                "bytes": int(total[offset + _BYTES]),
+            }
+        return result
+
+    def render_prometheus(self):
+        """以 Prometheus 文本格式（0.0.4）导出所有指标"""
+        ns = self.namespace
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {ns}_call_duration_seconds VM function call latency.",
+            f"# TYPE {ns}_call_duration_seconds histogram",
+        ]
+        for name, data in snapshot.items():
+            labels = f'function="{name}"'
+            for bound, count in zip(self.buckets, data["buckets"]):
+                lines.append(f'{ns}_call_duration_seconds_bucket{{{labels},le="{bound:g}"}} {count}')
+            lines.append(f'{ns}_call_duration_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+            lines.append(f"{ns}_call_duration_seconds_sum{{{labels}}} {data['sum_s']:.9f}")
+            lines.append(f"{ns}_call_duration_seconds_count{{{labels}}} {data['count']}")
+
+        for metric, key, kind, help_text in (
+            ("call_errors_total", "errors", "counter", "VM function calls that raised an exception."),
+            ("output_bytes_total", "bytes", "counter", "Bytes of output tensors returned by VM function calls."),
+            ("inflight_requests", "inflight", "gauge", "VM function calls currently executing."),
+        ):
+            lines.append(f"# HELP {ns}_{metric} {help_text}")
+            lines.append(f"# TYPE {ns}_{metric} {kind}")
+            for name, data in snapshot.items():
+                lines.append(f'{ns}_{metric}{{function="{name}"}} {data[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """原子地写入 Prometheus 文本文件，采集方不会读到写了一半的文件"""
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_http_server(self, port=9100, host="127.0.0.1"):
+        """在后台线程中启动 HTTP 端点，GET /metrics 返回 Prometheus 文本"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def stop_http_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def measure_overhead(calls=200000):
+    """测量包装本身的单次开销：对比直接调用与包装后调用空函数"""
+    metrics = VMMetrics(vm=None)
+
+    def noop(*args):
+        return None
+
+    wrapped = metrics.instrument("noop", noop)
+    results = {}
+    for label, fn in (("direct", noop), ("instrumented", wrapped)):
+        fn()
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            fn()
+        results[label] = (time.perf_counter_ns() - start) / calls
+    return results["instrumented"] - results["direct"]
+
+
+def demo_vm_metrics(calls=2000, num_threads=4):
+    """多线程调用 e2e.py 的 TorchModel，导出 Prometheus 指标；每个线程使用自己的 VM"""
+    print("=== VM 推理指标演示 ===")
+    print(f"包装开销: {measure_overhead():.0f} ns / call")
+
+    mod, params = convert_torch_model(TorchModel())
+    dev = tvm.cpu()
+    ex = tvm.compile(mod, target="llvm")
+    metrics = VMMetrics(relax.VirtualMachine(ex, dev), mod)
+    args = [tvm.nd.array(np.random.randn(1, 784).astype("float32"), dev), *params["main"]]
+
+    def worker():
+        # VM 不能被多个线程同时调用，各线程共享 Executable，各自创建 VM
+        main = metrics.instrument("main", relax.VirtualMachine(ex, dev)["main"])
+        for _ in range(calls // num_threads):
+            main(*args)
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    host, port = metrics.start_http_server(port=0)
+    print(f"指标端点: http://{host}:{port}/metrics")
+    text = metrics.render_prometheus()
+    print("\n".join(line for line in text.splitlines() if not line.startswith("#"))[:2000])
+    metrics.stop_http_server()
+
+
+if __name__ == "__main__":
+    demo_vm_metrics()
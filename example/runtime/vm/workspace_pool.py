@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多个 VM 共享工作区内存池
+
+每个 relax.VirtualMachine 的中间结果由 StaticPlanBlockMemory 规划为若干 alloc_storage，
+在 VM 的帧中各自持有。同一进程中部署多个模型时，即使请求按核串行执行，
+每个模型规划出的中间结果峰值也会同时占用内存。本文件提供：
+- plan_workspace：在 StaticPlanBlockMemory 之后把静态大小的 alloc_storage 排布到一个工作区中，
+  函数增加一个 uint8 工作区参数，中间张量改为工作区上的 R.memory.view
+- SharedWorkspacePool：进程级工作区池，按 slots 个工作区调度多个 VM 的调用
+  （slots=1 时同一时刻只有一个模型在执行，总占用为各模型工作区的最大值而不是总和），
+  并按模型统计调用次数、等待时间与执行时间
+- RSS 基准测试：在独立子进程中对比各模型单独运行的峰值之和、共同部署各自持有中间结果、
+  共同部署共享工作区三种情况
+
+输出与动态形状的分配仍经过 TVM 的池化分配器；该分配器按设备在进程内共享。
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+import tvm
+from torch import nn
+from tvm import relax, tir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "relax", "analysis"))
+from memory_validation_harness import lower_for_memory_estimation  # noqa: E402
+
+
+WORKSPACE_PARAM = "workspace"
+# 工作区中每段存储的对齐字节数
+WORKSPACE_ALIGNMENT = 64
+
+# StaticPlanBlockMemory 之后、VM 代码生成之前的剩余步骤（与默认流水线相同，
+# 开头的 LegalizeOps 用于降低插入的 R.memory.view）
+_FINISH_PASSES = (
+    "LegalizeOps", "LowerAllocTensor", "KillAfterLastUse", "LowerRuntimeBuiltin",
+    "ComputePrimValue", "VMShapeLower", "AttachGlobalSymbol",
+)
+
+
+def _round_up(size, alignment):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _is_op(expr, name):
+    return isinstance(expr, relax.Call) and isinstance(expr.op, tvm.ir.Op) and expr.op.name == name
+
+
+def _static_storage_bytes(call):
+    """静态大小的 global alloc_storage 返回字节数，其余返回 None"""
+    size, scope = call.args[0], call.args[2]
+    if not isinstance(size, relax.ShapeExpr) or scope.value != "global":
+        return None
+    if not all(isinstance(dim, tir.IntImm) for dim in size.values):
+        return None
+    return int(np.prod([dim.value for dim in size.values], dtype=np.int64))
+
+
+def plan_workspace(mod, func_name="main"):
+    """
+    把 func_name 中静态规划的中间存储排布到一个工作区参数上
+
+    参数:
+        mod: 高层 Relax 模块（参数嵌入为常量，或作为输入）
+        func_name: 要改写的函数
+    返回:
+        (改写后的模块, plan)；模块处于 StaticPlanBlockMemory 之后的阶段，需用 compile_with_workspace 编译；
+        plan 为 {'workspace_bytes', 'storages': [(存储名, 字节数, 偏移)], 'unplanned': 未纳入工作区的存储数}
+    异常:
+        ValueError: 改写后仍有对已移除存储的引用
+    """
+    _, planned = lower_for_memory_estimation(mod)
+    func = planned[func_name]
+
+    offsets = {}
+    storages = []
+    unplanned = 0
+    cursor = 0
+    for block in func.body.blocks:
+        for binding in block.bindings:
+            if not _is_op(binding.value, "relax.memory.alloc_storage"):
+                continue
+            nbytes = _static_storage_bytes(binding.value)
+            if nbytes is None:
+                unplanned += 1
+                continue
+            cursor = _round_up(cursor, WORKSPACE_ALIGNMENT)
+            offsets[binding.var] = cursor
+            storages.append((binding.var.name_hint, nbytes, cursor))
+            cursor += nbytes
+    workspace_bytes = _round_up(max(cursor, 1), WORKSPACE_ALIGNMENT)
+    # 工作区长度是符号变量，池中更大的工作区也可以直接传入；越界由 view 在运行时检查
+    workspace = relax.Var(
+        WORKSPACE_PARAM, relax.TensorStructInfo([tir.Var("workspace_bytes", "int64")], "uint8")
+    )
+
+    new_blocks = []
+    for block in func.body.blocks:
+        bindings = []
+        for binding in block.bindings:
+            value = binding.value
+            if isinstance(value, relax.Call) and value.args and value.args[0] in offsets:
+                if _is_op(value, "relax.memory.kill_storage"):
+                    continue
+                if _is_op(value, "relax.memory.alloc_tensor"):
+                    offset = offsets[value.args[0]] + int(value.args[1].value)
+                    value = relax.op.memory.view(
+                        workspace, value.args[2], value.args[3], relax.PrimValue(tir.IntImm("int64", offset))
+                    )
+            elif binding.var in offsets:
+                continue
+            bindings.append(relax.VarBinding(binding.var, value))
+        block_cls = relax.DataflowBlock if isinstance(block, relax.DataflowBlock) else relax.BindingBlock
+        new_blocks.append(block_cls(bindings))
+
+    new_func = relax.Function(
+        list(func.params) + [workspace],
+        relax.SeqExpr(new_blocks, func.body.body),
+        func.ret_struct_info,
+        func.is_pure,
+        func.attrs,
+        func.span,
+    )
+    leaked = [v.name_hint for v in relax.analysis.free_vars(new_func)]
+    if leaked:
+        raise ValueError(f"存储 {leaked} 除 alloc_tensor / kill_storage 外还有其他用途，无法放入工作区")
+
+    planned = planned.clone()
+    planned[func_name] = new_func
+    plan = {"workspace_bytes": workspace_bytes, "storages": storages, "unplanned": unplanned}
+    return planned, plan
+
+
+def compile_with_workspace(mod, target="llvm", func_name="main"):
+    """
+    plan_workspace 并完成编译
+
+    返回:
+        (可执行文件, plan)；调用方式为 vm[func_name](*原参数, workspace)，
+        workspace 为至少 plan["workspace_bytes"] 字节的一维 uint8 张量
+    """
+    planned, plan = plan_workspace(mod, func_name)
+    finish = tvm.transform.Sequential([getattr(relax.transform, name)() for name in _FINISH_PASSES])
+    return tvm.compile(planned, target=target, relax_pipeline=finish), plan
+
+
+class SharedWorkspacePool:
+    """
+    多个 VM 共享的工作区池
+
+    参数:
+        device: 工作区所在设备
+        slots: 工作区个数，即允许同时执行的调用数；1 表示所有模型串行执行
+        timeout: 等待空闲工作区的最长时间（秒），None 表示一直等待
+
+    工作区大小为已注册模型所需的最大值，注册更大的模型后，较小的工作区在下次取用时重新分配。
+    VirtualMachine 不是线程安全的，每个注册的模型同一时刻只执行一次调用；
+    同一模型需要并发时，为每个线程创建自己的 VM 并以不同名称分别注册。
+    工作区只承载中间结果，调用返回后即可交给下一个模型；在 GPU 上，同一个流上的后续内核
+    按顺序执行，不会与仍在执行的内核冲突，多个流时需要在归还前同步。
+    """
+
+    def __init__(self, device, slots=1, timeout=None):
+        if slots < 1:
+            raise ValueError(f"slots 至少为 1，实际为 {slots}")
+        self.device = device
+        self.slots = slots
+        self.timeout = timeout
+        self.capacity = WORKSPACE_ALIGNMENT
+        self._free = queue.Queue()
+        for _ in range(slots):
+            self._free.put(None)
+        self._lock = threading.Lock()
+        self._models = {}
+        self._active = 0
+        self.peak_active = 0
+
+    def register(self, name, vm, workspace_bytes, func_name="main"):
+        """
+        注册一个由 compile_with_workspace 编译的模型
+
+        返回:
+            可调用对象，用法与 vm[func_name] 相同（不需要传入工作区）
+        """
+        with self._lock:
+            if name in self._models:
+                raise ValueError(f"模型 {name} 已注册")
+            self.capacity = max(self.capacity, workspace_bytes)
+            stats = self._models[name] = {
+                "workspace_bytes": workspace_bytes, "calls": 0, "errors": 0,
+                "wait_s": 0.0, "max_wait_s": 0.0, "busy_s": 0.0,
+            }
+        func = vm[func_name]
+        # 同一个 VM 不能被多个线程同时调用
+        vm_lock = threading.Lock()
+
+        def call(*args):
+            start = time.perf_counter()
+            # 先取得模型锁再取工作区，等待同一模型的线程不会占着工作区
+            if not vm_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+                raise TimeoutError(f"模型 {name} 等待上一次调用完成超过 {self.timeout} s")
+            try:
+                workspace = self._acquire(name)
+            except BaseException:
+                vm_lock.release()
+                raise
+            acquired = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, workspace)
+                failed = False
+                return result
+            finally:
+                self._release(workspace)
+                vm_lock.release()
+                done = time.perf_counter()
+                with self._lock:
+                    stats["calls"] += 1
+                    stats["errors"] += failed
+                    stats["wait_s"] += acquired - start
+                    stats["max_wait_s"] = max(stats["max_wait_s"], acquired - start)
+                    stats["busy_s"] += done - acquired
+
+        return call
+
+    def _acquire(self, name):
+        try:
+            workspace = self._free.get(timeout=self.timeout)
+        except queue.Empty as e:
+            raise TimeoutError(f"模型 {name} 等待工作区超过 {self.timeout} s") from e
+        if workspace is None or workspace.shape[0] < self.capacity:
+            workspace = tvm.nd.empty((self.capacity,), "uint8", self.device)
+        with self._lock:
+            self._active += 1
+            self.peak_active = max(self.peak_active, self._active)
+        return workspace
+
+    def _release(self, workspace):
+        with self._lock:
+            self._active -= 1
+        self._free.put(workspace)
+
+    def stats(self):
+        """{'capacity', 'slots', 'reserved_bytes', 'peak_active', 'models': {名称: 统计}}"""
+        with self._lock:
+            models = {name: dict(s) for name, s in self._models.items()}
+        reserved = sum(w.shape[0] for w in list(self._free.queue) if w is not None)
+        return {
+            "capacity": self.capacity,
+            "slots": self.slots,
+            "reserved_bytes": reserved,
+            "private_bytes": sum(s["workspace_bytes"] for s in models.values()),
+            "peak_active": self.peak_active,
+            "models": models,
+        }
+
+
+class ActivationHeavyModel(nn.Module):
+    """中间结果远大于参数的卷积网络，用于测量共同部署时的工作区占用"""
+
+    def __init__(self, channels=32, depth=3):
+        super().__init__()
+        layers = [nn.Conv2d(3, channels, 3, padding=1), nn.ReLU()]
+        for _ in range(depth - 1):
+            layers += [nn.Conv2d(channels, channels, 3, padding=1), nn.ReLU()]
+        self.features = nn.Sequential(*layers)
+        self.head = nn.Linear(channels, 10)
+
+    def forward(self, x):
+        return self.head(self.features(x).mean(dim=(2, 3)))
+
+
+# 名称 -> (通道数, 深度)
+COHOST_MODELS = {"conv16": (16, 3), "conv24": (24, 3), "conv32": (32, 3), "conv48": (48, 2)}
+COHOST_INPUT_SHAPE = (1, 3, 160, 160)
+
+
+def export_cohost_models(model_dir, models=None, input_shape=COHOST_INPUT_SHAPE, target="llvm"):
+    """
+    把每个模型编译两次并导出：{name}.so（普通编译）与 {name}_ws.so（工作区参数），
+    工作区大小等信息写入 meta.json
+    """
+    from torch.export import export
+    from tvm.relax.frontend.torch import from_exported_program
+
+    os.makedirs(model_dir, exist_ok=True)
+    meta = {"input_shape": list(input_shape), "models": {}}
+    for name, (channels, depth) in (models or COHOST_MODELS).items():
+        with torch.no_grad():
+            exported = export(ActivationHeavyModel(channels, depth).eval(), (torch.randn(*input_shape),))
+            mod = from_exported_program(exported)
+        tvm.compile(mod, target=target).export_library(os.path.join(model_dir, f"{name}.so"))
+        ex, plan = compile_with_workspace(mod, target)
+        ex.export_library(os.path.join(model_dir, f"{name}_ws.so"))
+        meta["models"][name] = {"workspace_bytes": plan["workspace_bytes"], "storages": len(plan["storages"])}
+    with open(os.path.join(model_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _current_rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _rss_worker(model_dir, names, shared, rounds, result_queue):
+    """子进程：加载 names 中的模型并轮流执行 rounds 轮，报告相对加载完成时的 RSS 峰值增量"""
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    dev = tvm.cpu()
+    x = tvm.nd.array(np.random.randn(*meta["input_shape"]).astype("float32"), dev)
+
+    pool = SharedWorkspacePool(dev) if shared else None
+    calls = {}
+    for name in names:
+        lib = tvm.runtime.load_module(os.path.join(model_dir, f"{name}_ws.so" if shared else f"{name}.so"))
+        vm = relax.VirtualMachine(lib, dev)
+        calls[name] = pool.register(name, vm, meta["models"][name]["workspace_bytes"]) if shared else vm["main"]
+
+    rss_before = _current_rss_bytes()
+    for _ in range(rounds):
+        for name in names:
+            calls[name](x)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    result_queue.put({"peak_rss_delta_bytes": max(peak - rss_before, 0), "peak_rss_bytes": peak})
+
+
+def _measure_rss(model_dir, names, shared, rounds, timeout=600):
+    """
+    在子进程中运行 _rss_worker
+
+    异常:
+        RuntimeError: 子进程没有返回结果就退出（如崩溃）
+        TimeoutError: 超过 timeout 秒未完成
+    """
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    proc = ctx.Process(target=_rss_worker, args=(model_dir, names, shared, rounds, result_queue))
+    proc.start()
+    deadline = time.time() + timeout
+    try:
+        while True:
+            try:
+                return result_queue.get(timeout=1.0)
+            except queue.Empty:
+                pass
+            if not proc.is_alive():
+                # 子进程退出前可能刚写入结果
+                try:
+                    return result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    raise RuntimeError(f"RSS 测量子进程异常退出，退出码 {proc.exitcode}，模型 {names}") from None
+            if time.time() > deadline:
+                raise TimeoutError(f"RSS 测量超过 {timeout} s 未完成，模型 {names}")
+    finally:
+        if proc.is_alive():
+            proc.join(5)
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+
+
+def benchmark_cohosting(model_dir, rounds=3):
+    """
+    对比三种部署方式的 RSS 峰值增量（相对模型加载完成时）
+
+    返回:
+        {'individual': {名称: 字节}, 'sum_individual', 'cohosted_private', 'cohosted_shared',
+         'workspace_bytes': {名称: 字节}}
+    """
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    names = sorted(meta["models"])
+    individual = {name: _measure_rss(model_dir, [name], False, rounds)["peak_rss_delta_bytes"] for name in names}
+    return {
+        "individual": individual,
+        "sum_individual": sum(individual.values()),
+        "cohosted_private": _measure_rss(model_dir, names, False, rounds)["peak_rss_delta_bytes"],
+        "cohosted_shared": _measure_rss(model_dir, names, True, rounds)["peak_rss_delta_bytes"],
+        "workspace_bytes": {name: meta["models"][name]["workspace_bytes"] for name in names},
+    }
+
+
+def print_cohosting_report(result):
+    mb = 1024 * 1024
+    print(f"{'模型':<10}{'工作区(MB)':>12}{'单独运行RSS峰值增量(MB)':>26}")
+    for name, peak in result["individual"].items():
+        print(f"{name:<10}{result['workspace_bytes'][name] / mb:>12.2f}{peak / mb:>26.2f}")
+    print(f"单独运行峰值之和:       {result['sum_individual'] / mb:.2f} MB")
+    print(f"共同部署（各自持有）:   {result['cohosted_private'] / mb:.2f} MB")
+    print(f"共同部署（共享工作区）: {result['cohosted_shared'] / mb:.2f} MB")
+    print(f"工作区之和 / 最大值:    {sum(result['workspace_bytes'].values()) / mb:.2f} / "
+          f"{max(result['workspace_bytes'].values()) / mb:.2f} MB")
+
+
+def demo_workspace_pool(model_dir="./cohost_models", num_threads=4, calls_per_thread=5):
+    """共享工作区演示：多线程调用多个模型，输出与普通编译一致，并打印 RSS 对比"""
+    print("=== 多个 VM 共享工作区 ===")
+    meta = export_cohost_models(model_dir)
+    dev = tvm.cpu()
+    x = tvm.nd.array(np.random.randn(*meta["input_shape"]).astype("float32"), dev)
+
+    pool = SharedWorkspacePool(dev, slots=1)
+    calls = {}
+    for name, info in meta["models"].items():
+        vm = relax.VirtualMachine(tvm.runtime.load_module(os.path.join(model_dir, f"{name}_ws.so")), dev)
+        calls[name] = pool.register(name, vm, info["workspace_bytes"])
+        reference = relax.VirtualMachine(tvm.runtime.load_module(os.path.join(model_dir, f"{name}.so")), dev)
+        np.testing.assert_allclose(calls[name](x).numpy(), reference["main"](x).numpy(), rtol=1e-5, atol=1e-5)
+    print("共享工作区的输出与普通编译一致")
+
+    def worker(index):
+        names = list(calls)
+        for i in range(calls_per_thread):
+            calls[names[(index + i) % len(names)]](x)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = pool.stats()
+    print(f"工作区: {stats['slots']} 个 x {stats['capacity'] / 2**20:.2f} MB，"
+          f"各模型单独持有共需 {stats['private_bytes'] / 2**20:.2f} MB")
+    for name, s in stats["models"].items():
+        print(f"  {name}: 调用 {s['calls']} 次，等待 {s['wait_s'] * 1000:.1f} ms，执行 {s['busy_s'] * 1000:.1f} ms")
+
+    result = benchmark_cohosting(model_dir)
+    print_cohosting_report(result)
+    return result
+
+
+if __name__ == "__main__":
+    demo_workspace_pool()
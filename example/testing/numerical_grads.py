@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量化的数值梯度检查
+
+tvm.testing.check_numerical_grads 逐元素扰动输入，每个元素需要两次完整的函数求值，
+总计 O(n) 次调用，输入稍大就难以承受。本文件提供三种替代模式：
+- batched：函数支持前导批次维度时，一次调用求值大量扰动后的输入
+- directional：随机投影（方向导数）检查，求值次数固定，与输入大小无关
+- parallel：不支持批次维度的函数，把逐元素差分分发到进程池并行计算
+
+判定标准与 check_numerical_grads 保持一致：
+||ngrad - grad|| <= atol * sqrt(n) + rtol * ||ngrad||
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tvm.testing
+
+
+def _normalize_inputs(input_values, grad_values):
+    """统一为 (名称列表或 None, 输入列表, 梯度列表)"""
+    if isinstance(input_values, dict):
+        names = list(input_values.keys())
+        return names, [np.asarray(input_values[n]) for n in names], [np.asarray(grad_values[n]) for n in names]
+    return None, [np.asarray(v) for v in input_values], [np.asarray(g) for g in grad_values]
+
+
+def _call(function, names, values):
+    if names is None:
+        return function(*values)
+    return function(**dict(zip(names, values)))
+
+
+def _check_gradient(label, ngrad, grad, atol, rtol):
+    """与 check_numerical_grads 相同的误差判定"""
+    dist = np.sqrt(np.sum((ngrad - grad) ** 2))
+    grad_norm = np.sqrt(np.sum(ngrad ** 2))
+    if not (np.isfinite(dist) and np.isfinite(grad_norm)):
+        raise ValueError(f"输入 {label} 的梯度中出现 NaN 或无穷大: dist={dist}, grad_norm={grad_norm}")
+    if dist > atol * np.sqrt(ngrad.size) + rtol * grad_norm:
+        max_index = tuple(int(i) for i in np.unravel_index(np.argmax(np.abs(ngrad - grad)), grad.shape))
+        raise AssertionError(
+            f"输入 {label} 的数值梯度与解析梯度不一致: dist={dist:g}, grad_norm={grad_norm:g}, "
+            f"最大差异位于 {max_index}: 数值 {ngrad[max_index]:g} vs 解析 {grad[max_index]:g}"
+        )
+
+
+def _batched_numerical_grad(function, names, values, index, delta, batch_size, max_batch_bytes):
+    """
+    对第 index 个输入计算中心差分梯度，每次调用求值 2 * batch_size 个扰动输入
+
+    函数需接受所有输入带前导批次维度，并返回形状为 (batch,) 的结果。
+    扰动后的批次写入一块预先分配的缓冲区，每批只改写并恢复被扰动的元素；
+    缓冲区不超过 max_batch_bytes，输入很大时相应减小每批的元素数。
+    """
+    x = values[index]
+    flat_x = x.reshape(-1)
+    flat_size = x.size
+    batch_size = max(1, min(batch_size, flat_size, max_batch_bytes // max(2 * x.nbytes, 1)))
+    buffer = np.empty((2 * batch_size, flat_size), dtype=x.dtype)
+    buffer[:] = flat_x
+
+    ngrad = np.empty(flat_size, dtype=np.float64)
+    for start in range(0, flat_size, batch_size):
+        count = min(batch_size, flat_size - start)
+        rows = np.arange(count)
+        cols = start + rows
+        buffer[rows, cols] += delta
+        buffer[count + rows, cols] -= delta
+
+        batched_values = [
+            buffer[:2 * count].reshape((2 * count,) + x.shape) if i == index
+            else np.broadcast_to(v, (2 * count,) + v.shape)
+            for i, v in enumerate(values)
+        ]
+        out = np.asarray(_call(function, names, batched_values), dtype=np.float64).reshape(2 * count)
+        ngrad[start:start + count] = (out[:count] - out[count:]) / (2 * delta)
+        buffer[rows, cols] = flat_x[cols]
+        buffer[count + rows, cols] = flat_x[cols]
+    return ngrad.reshape(x.shape)
+
+
+# 进程池工作进程中的全局状态，由 _init_worker 设置一次，避免每个任务重复传输输入
+_WORKER_STATE = {}
+
+
+def _init_worker(function, names, values, delta):
+    _WORKER_STATE.update(function=function, names=names, values=values, delta=delta)
+
+
+def _parallel_chunk(index, start, stop):
+    function = _WORKER_STATE["function"]
+    names = _WORKER_STATE["names"]
+    values = [v.copy() for v in _WORKER_STATE["values"]]
+    delta = _WORKER_STATE["delta"]
+
+    flat = values[index].reshape(-1)
+    result = np.empty(stop - start, dtype=np.float64)
+    for i in range(start, stop):
+        original = flat[i]
+        flat[i] = original + delta
+        f_plus = float(_call(function, names, values))
+        flat[i] = original - delta
+        f_minus = float(_call(function, names, values))
+        flat[i] = original
+        result[i - start] = (f_plus - f_minus) / (2 * delta)
+    return start, result
+
+
+def _parallel_numerical_grads(function, names, values, delta, processes, chunk_size):
+    ngrads = [np.empty(v.size, dtype=np.float64) for v in values]
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=_init_worker, initargs=(function, names, values, delta)
+    ) as pool:
+        futures = {}
+        for index, v in enumerate(values):
+            for start in range(0, v.size, chunk_size):
+                future = pool.submit(_parallel_chunk, index, start, min(start + chunk_size, v.size))
+                futures[future] = index
+        for future, index in futures.items():
+            start, result = future.result()
+            ngrads[index][start:start + result.size] = result
+    return [g.reshape(v.shape) for g, v in zip(ngrads, values)]
+
+
+def _directional_check(function, names, values, grads, labels, delta, atol, rtol, num_directions, batched, seed):
+    """
+    随机方向导数检查：对每个输入取 k 个单位随机方向 v，比较 (f(x+δv) - f(x-δv)) / 2δ 与 <grad, v>
+
+    对随机单位方向，误差 <e, v> 的均方根约为 ||e|| / sqrt(n)，
+    因此阈值取 check_numerical_grads 的标准除以 sqrt(n)。逐个输入检查，
+    避免一个输入的梯度错误被其他输入较大的梯度范数掩盖。
+    """
+    rng = np.random.default_rng(seed)
+    for index, (label, grad) in enumerate(zip(labels, grads)):
+        x = values[index]
+        directions = rng.standard_normal((num_directions,) + x.shape)
+        directions /= np.sqrt(np.sum(directions.reshape(num_directions, -1) ** 2, axis=1)).reshape(
+            (num_directions,) + (1,) * x.ndim
+        )
+
+        if batched:
+            stacked = np.concatenate([x + delta * directions, x - delta * directions]).astype(x.dtype)
+            batched_values = [
+                stacked if i == index else np.broadcast_to(v, (2 * num_directions,) + v.shape)
+                for i, v in enumerate(values)
+            ]
+            out = np.asarray(_call(function, names, batched_values), dtype=np.float64).reshape(-1)
+            numeric = (out[:num_directions] - out[num_directions:]) / (2 * delta)
+        else:
+            numeric = np.empty(num_directions, dtype=np.float64)
+            for k in range(num_directions):
+                perturbed = list(values)
+                perturbed[index] = (x + delta * directions[k]).astype(x.dtype)
+                f_plus = float(_call(function, names, perturbed))
+                perturbed[index] = (x - delta * directions[k]).astype(x.dtype)
+                f_minus = float(_call(function, names, perturbed))
+                numeric[k] = (f_plus - f_minus) / (2 * delta)
+
+        analytic = np.sum((directions * grad).reshape(num_directions, -1), axis=1)
+        rms_error = np.sqrt(np.mean((numeric - analytic) ** 2))
+        grad_norm = np.sqrt(np.sum(grad.astype(np.float64) ** 2))
+        if not (np.isfinite(rms_error) and np.isfinite(grad_norm)):
+            raise ValueError(f"输入 {label} 的方向导数中出现 NaN 或无穷大: rms_error={rms_error}, grad_norm={grad_norm}")
+        threshold = atol + rtol * grad_norm / np.sqrt(x.size)
+        if rms_error > threshold:
+            worst = int(np.argmax(np.abs(numeric - analytic)))
+            raise AssertionError(
+                f"输入 {label} 的方向导数检查失败: 误差均方根 {rms_error:g} > 阈值 {threshold:g}，"
+                f"方向 {worst}: 数值 {numeric[worst]:g} vs 解析 {analytic[worst]:g}"
+            )
+
+
+def check_numerical_grads_fast(
+    function,
+    input_values,
+    grad_values,
+    delta=1e-3,
+    atol=1e-2,
+    rtol=0.1,
+    mode="batched",
+    batch_size=256,
+    max_batch_bytes=256 * 1024 * 1024,
+    num_directions=16,
+    processes=None,
+    chunk_size=1024,
+    seed=0,
+):
+    """
+    check_numerical_grads 的快速版本
+
+    参数:
+        function: 被检查的函数；batched 模式下需接受带前导批次维度的输入并返回 (batch,) 结果，
+            其余模式返回标量
+        input_values / grad_values: 与 check_numerical_grads 相同，列表或字典
+        delta / atol / rtol: 与 check_numerical_grads 相同
+        mode: "batched" / "directional" / "directional_batched" / "parallel"，
+            directional_batched 在一次调用中求值所有随机方向
+        batch_size: batched 模式下每次调用包含的扰动元素数（每个元素正负两次）
+        max_batch_bytes: batched 模式下扰动批次缓冲区的字节上限，超出时减小 batch_size
+        num_directions: directional 模式下每个输入的随机方向数，每个输入求值 2 * num_directions 次
+        processes: parallel 模式下的进程数，None 表示 CPU 核数；函数必须可被 pickle
+        chunk_size: parallel 模式下每个任务处理的元素数
+        seed: directional 模式的随机种子
+    异常:
+        AssertionError: 数值梯度与解析梯度不一致
+        ValueError: 梯度中出现 NaN 或无穷大
+    """
+    names, values, grads = _normalize_inputs(input_values, grad_values)
+    labels = names if names is not None else [str(i) for i in range(len(values))]
+
+    if mode == "batched":
+        for index, (label, grad) in enumerate(zip(labels, grads)):
+            ngrad = _batched_numerical_grad(function, names, values, index, delta, batch_size, max_batch_bytes)
+            _check_gradient(label, ngrad, grad, atol, rtol)
+    elif mode == "parallel":
+        ngrads = _parallel_numerical_grads(function, names, values, delta, processes, chunk_size)
+        for label, ngrad, grad in zip(labels, ngrads, grads):
+            _check_gradient(label, ngrad, grad, atol, rtol)
+    elif mode in ("directional", "directional_batched"):
+        _directional_check(
+            function, names, values, grads, labels, delta, atol, rtol, num_directions,
+            mode == "directional_batched", seed,
+        )
+    else:
+        raise ValueError(f"不支持的模式: {mode}")
+
+
+def _demo_function(x, w):
+    """f(x, w) = sum(tanh(x @ w))，对前导批次维度广播"""
+    return np.sum(np.tanh(np.matmul(x, w)), axis=(-2, -1))
+
+
+def demo_numerical_grads(n=32, m=32):
+    """对比逐元素检查与各快速模式的耗时"""
+    print("=== 批量化数值梯度检查演示 ===")
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((n, m))
+    w = rng.standard_normal((m, m)) / np.sqrt(m)
+
+    # 解析梯度: d/dx = (1 - tanh^2(xw)) @ w^T, d/dw = x^T @ (1 - tanh^2(xw))
+    s = 1 - np.tanh(x @ w) ** 2
+    grads = [s @ w.T, x.T @ s]
+
+    cases = [
+        ("tvm.testing.check_numerical_grads", lambda: tvm.testing.check_numerical_grads(_demo_function, [x, w], grads)),
+        ("batched", lambda: check_numerical_grads_fast(_demo_function, [x, w], grads, mode="batched")),
+        ("directional", lambda: check_numerical_grads_fast(_demo_function, [x, w], grads, mode="directional")),
+        ("directional_batched", lambda: check_numerical_grads_fast(_demo_function, [x, w], grads, mode="directional_batched")),
+        ("parallel", lambda: check_numerical_grads_fast(_demo_function, [x, w], grads, mode="parallel")),
+    ]
+    for label, run in cases:
+        start = time.perf_counter()
+        run()
+        print(f"{label:<36}{(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+    # 错误的梯度应被检测出来
+    wrong = [grads[0] * 1.5, grads[1]]
+    for mode in ("batched", "directional"):
+        try:
+            check_numerical_grads_fast(_demo_function, [x, w], wrong, mode=mode)
+            print(f"{mode}: 未检测到错误梯度")
+        except AssertionError as e:
+            print(f"{mode}: 检测到错误梯度 - {e}")
+
+
+if __name__ == "__main__":
+    demo_numerical_grads()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地多服务器 RPC 池与并行基准测试调度
+
+tvm.testing.rpc_run 每次在一个 RPC 会话上测量一个模块，逐个测量模型库时完全串行。
+本文件在同一台 Linux 主机上搭建自包含的 RPC 环境：
+- LocalRPCCluster：启动一个 RPC tracker 和 N 个 rpc_server 进程，每个服务器绑定互不相交的 CPU 集合，
+  线程数与绑定的核数一致，各服务器之间不争抢核心
+- RPCBenchmarkScheduler：把大量 (模块, 评估配置) 任务并发分发到各服务器，每次尝试在独立的子进程中执行，
+  支持单任务超时（超时后终止该子进程）、失败重试以及服务器进程崩溃后自动重启
+
+tracker 按空闲服务器分配会话，因此并发度等于服务器数量；
+RPCConfig 与真实基准测试集群的用法相同，切换到远程集群时只需替换 rpc_config。
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+import tvm
+from tvm import relax, te
+from tvm.meta_schedule.runner import EvaluatorConfig, RPCConfig
+from tvm.rpc.tracker import Tracker
+
+
+def split_cpus(num_servers, cpus=None):
+    """把可用 CPU 平均分成 num_servers 个互不相交的集合"""
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    if num_servers > len(cpus):
+        raise ValueError(f"服务器数 {num_servers} 超过可用 CPU 数 {len(cpus)}")
+    per_server = len(cpus) // num_servers
+    return [cpus[i * per_server:(i + 1) * per_server] for i in range(num_servers)]
+
+
+class LocalRPCCluster:
+    """
+    本地 RPC tracker 与 N 个绑核的 rpc_server
+
+    参数:
+        num_servers: 服务器进程数
+        key: 服务器在 tracker 上注册的设备键
+        host: 监听地址
+        tracker_port: tracker 起始端口，被占用时向后查找
+        server_port: 服务器起始端口
+        cpu_sets: 每个服务器绑定的 CPU 列表，默认平均划分当前进程可用的 CPU
+
+    用法:
+        with LocalRPCCluster(num_servers=4) as cluster:
+            tvm.testing.rpc_run(mod, "cpu", args, rpc_config=cluster.rpc_config())
+    """
+
+    def __init__(self, num_servers=2, key="local", host="127.0.0.1", tracker_port=9190,
+                 server_port=9090, cpu_sets=None):
+        self.num_servers = num_servers
+        self.key = key
+        self.host = host
+        self.tracker_port = tracker_port
+        self.server_port = server_port
+        self.cpu_sets = cpu_sets or split_cpus(num_servers)
+        self.tracker = None
+        self.servers = []
+
+    def _spawn_server(self, index):
+        cpus = self.cpu_sets[index]
+        env = dict(os.environ)
+        env["TVM_NUM_THREADS"] = str(len(cpus))
+        cmd = [
+            sys.executable, "-m", "tvm.exec.rpc_server",
+            f"--host={self.host}",
+            f"--port={self.server_port + index * 10}",
+            f"--port-end={self.server_port + index * 10 + 9}",
+            f"--tracker={self.host}:{self.tracker.port}",
+            f"--key={self.key}",
+        ]
+        # 绑核在 exec 前设置，服务器为每个会话 fork 的子进程继承同样的亲和性
+        return subprocess.Popen(
+            cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            preexec_fn=lambda: os.sched_setaffinity(0, cpus),
+        )
+
+    def start(self, wait_timeout=30.0):
+        self.tracker = Tracker(self.host, port=self.tracker_port, port_end=self.tracker_port + 100, silent=True)
+        self.servers = [self._spawn_server(i) for i in range(self.num_servers)]
+        self.wait_ready(wait_timeout)
+        return self
+
+    def free_servers(self):
+        """返回 tracker 上当前空闲的服务器数"""
+        summary = tvm.rpc.connect_tracker(self.host, self.tracker.port).summary()
+        return summary["queue_info"].get(self.key, {}).get("free", 0)
+
+    def wait_ready(self, timeout=30.0):
+        """等待所有服务器注册到 tracker，只适合在没有会话时调用"""
+        self.wait_for_free(self.num_servers, timeout)
+
+    def wait_for_free(self, count, timeout=30.0):
+        """等待 tracker 上至少有 count 个空闲服务器"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.free_servers() >= count:
+                return
+            time.sleep(0.2)
+        raise TimeoutError(f"{timeout} s 内只有 {self.free_servers()} / {count} 个空闲服务器")
+
+    def restart_dead_servers(self):
+        """重启已经退出的服务器进程，返回重启的数量"""
+        restarted = 0
+        for index, proc in enumerate(self.servers):
+            if proc.poll() is not None:
+                self.servers[index] = self._spawn_server(index)
+                restarted += 1
+        return restarted
+
+    def rpc_config(self, session_timeout_sec=60):
+        """
+        返回连接本集群的 RPCConfig
+
+        session_timeout_sec 由服务器端强制执行，超时的会话会被服务器终止。
+        """
+        return RPCConfig(
+            tracker_host=self.host,
+            tracker_port=self.tracker.port,
+            tracker_key=self.key,
+            session_priority=1,
+            session_timeout_sec=session_timeout_sec,
+        )
+
+    def stop(self):
+        for proc in self.servers:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.servers:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.servers = []
+        if self.tracker is not None:
+            self.tracker.terminate()
+            self.tracker = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class BenchmarkJob:
+    """
+    一个基准测试任务
+
+    参数:
+        name: 任务名称
+        mod: 编译好的模块，需支持 export_library；runtime.Module 测量入口函数，
+            relax.Executable 在远端创建 VirtualMachine 测量 func_name
+        args: 输入参数，NumPy 数组或标量
+        device_type: 远端设备类型
+        evaluator_config: 评估配置，默认 number=10, repeat=3
+        func_name: Relax VM 中被测量的函数名
+    """
+
+    def __init__(self, name, mod, args, device_type="cpu", evaluator_config=None, func_name="main"):
+        self.name = name
+        self.mod = mod
+        self.args = args
+        self.device_type = device_type
+        self.evaluator_config = evaluator_config or EvaluatorConfig(number=10, repeat=3)
+        self.func_name = func_name
+
+
+def _run_exported(path, is_vm, args, device_type, evaluator_config, func_name, rpc_config):
+    """上传导出的模块并在远端测量；Relax Executable 通过 VirtualMachine.time_evaluator 测量 func_name"""
+    session = rpc_config.connect_server()
+    name = os.path.basename(path)
+    session.upload(path)
+    rmod = session.load_module(name)
+    dev = session.device(device_type)
+    args = [tvm.nd.array(arg, dev) if isinstance(arg, np.ndarray) else arg for arg in args]
+
+    timer_kwargs = {
+        "number": evaluator_config.number or 1,
+        "repeat": evaluator_config.repeat or 1,
+        "min_repeat_ms": evaluator_config.min_repeat_ms or 0,
+    }
+    if is_vm:
+        timer = relax.VirtualMachine(rmod, dev).time_evaluator(func_name, dev, **timer_kwargs)
+    else:
+        timer = rmod.time_evaluator(rmod.entry_name, dev, **timer_kwargs)
+    profile = timer(*args)
+    session.remove(name)
+    return profile
+
+
+def _attempt_worker(spec, rpc_config, conn):
+    """子进程：执行一次尝试，通过管道返回 ("ok", (mean, median, std)) 或 ("error", 信息)"""
+    try:
+        profile = _run_exported(*spec, rpc_config)
+        conn.send(("ok", (profile.mean, profile.median, profile.std)))
+    except Exception as e:  # pylint: disable=broad-except
+        conn.send(("error", f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"))
+    finally:
+        conn.close()
+
+
+class RPCBenchmarkScheduler:
+    """
+    把基准测试任务并发分发到 RPC 集群
+
+    参数:
+        cluster: LocalRPCCluster；也可以是任何提供 rpc_config(session_timeout_sec) 的对象
+        timeout: 单次尝试的超时（秒），服务器端终止超时会话，客户端等待同样时长加宽限期
+        max_retries: 失败或超时后的最大重试次数
+        max_workers: 并发任务数，默认等于服务器数
+
+    每次尝试在独立的子进程中连接服务器并测量。客户端超时后直接终止该子进程，连接随之关闭，
+    不会像线程那样无法终止而继续占用并发名额，解释器退出时也没有需要等待的线程；
+    服务器端的会话由 session_timeout_sec 在同一时刻终止，服务器随后回到 tracker 的空闲队列。
+    子进程以 spawn 方式启动，每次尝试额外有一次导入 tvm 的开销。
+    """
+
+    # 客户端在服务器端超时之后额外等待的时间，用于会话建立与结果回传
+    CLIENT_GRACE_SEC = 10
+    # 等待重启的服务器重新注册的时间
+    RESTART_WAIT_SEC = 30
+
+    def __init__(self, cluster, timeout=60, max_retries=2, max_workers=None):
+        self.cluster = cluster
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_workers = max_workers or getattr(cluster, "num_servers", 1)
+        self.last_wall_time = 0.0
+
+    def _recover_servers(self, verbose):
+        """重启已退出的服务器，只等待重启的服务器重新注册；失败不影响其余任务"""
+        if not hasattr(self.cluster, "restart_dead_servers"):
+            return
+        try:
+            restarted = self.cluster.restart_dead_servers()
+            if restarted:
+                self.cluster.wait_for_free(restarted, self.RESTART_WAIT_SEC)
+        except Exception as e:  # pylint: disable=broad-except
+            # 重试时向 tracker 申请会话会一直等到有服务器空闲，这里只记录
+            if verbose:
+                print(f"  重启服务器失败: {type(e).__name__}: {e}")
+
+    def run(self, jobs, verbose=True):
+        """
+        运行所有任务
+
+        返回:
+            按输入顺序排列的结果字典列表，每项包含
+            {'name', 'status', 'attempts', 'mean_ms', 'median_ms', 'std_ms', 'elapsed_s', 'error'}
+        """
+        rpc_config = self.cluster.rpc_config(session_timeout_sec=self.timeout)
+        ctx = multiprocessing.get_context("spawn")
+        results = [None] * len(jobs)
+        attempts = [0] * len(jobs)
+        start = time.perf_counter()
+
+        def fail(index, error, elapsed):
+            results[index] = {
+                "name": jobs[index].name, "status": "failed", "attempts": attempts[index],
+                "mean_ms": None, "median_ms": None, "std_ms": None, "elapsed_s": elapsed, "error": error,
+            }
+            if verbose:
+                print(f"  [{jobs[index].name}] 失败: {error}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            specs = {}
+            for index, job in enumerate(jobs):
+                path = os.path.join(tmp_dir, f"{index:04d}_{job.name}.so")
+                try:
+                    job.mod.export_library(path)
+                except Exception as e:  # pylint: disable=broad-except
+                    fail(index, f"导出失败: {type(e).__name__}: {e}", 0.0)
+                    continue
+                is_vm = isinstance(job.mod, relax.Executable)
+                specs[index] = (path, is_vm, job.args, job.device_type, job.evaluator_config, job.func_name)
+
+            waiting = deque(specs)
+            running = {}
+            while waiting or running:
+                while waiting and len(running) < self.max_workers:
+                    index = waiting.popleft()
+                    parent_conn, child_conn = ctx.Pipe(duplex=False)
+                    proc = ctx.Process(target=_attempt_worker, args=(specs[index], rpc_config, child_conn))
+                    proc.start()
+                    child_conn.close()
+                    attempts[index] += 1
+                    running[index] = (proc, parent_conn, time.perf_counter())
+
+                for index, (proc, conn, submitted) in list(running.items()):
+                    elapsed = time.perf_counter() - submitted
+                    if conn.poll():
+                        try:
+                            status, payload = conn.recv()
+                        except EOFError:
+                            status, payload = "error", f"工作进程异常退出，退出码 {proc.exitcode}"
+                    elif not proc.is_alive():
+                        status, payload = "error", f"工作进程异常退出，退出码 {proc.exitcode}"
+                    elif elapsed > self.timeout + self.CLIENT_GRACE_SEC:
+                        proc.kill()
+                        status, payload = "error", f"超过 {self.timeout} s 未完成"
+                    else:
+                        continue
+
+                    del running[index]
+                    proc.join()
+                    conn.close()
+                    job = jobs[index]
+                    if status == "ok":
+                        mean, median, std = payload
+                        results[index] = {
+                            "name": job.name, "status": "ok", "attempts": attempts[index],
+                            "mean_ms": mean * 1000, "median_ms": median * 1000, "std_ms": std * 1000,
+                            "elapsed_s": elapsed, "error": None,
+                        }
+                        if verbose:
+                            print(f"  [{job.name}] {mean * 1000:.3f} ms (尝试 {attempts[index]} 次)")
+                        continue
+
+                    self._recover_servers(verbose)
+                    if attempts[index] <= self.max_retries:
+                        if verbose:
+                            print(f"  [{job.name}] 第 {attempts[index]} 次尝试失败，重试: {payload}")
+                        waiting.appendleft(index)
+                    else:
+                        fail(index, payload, elapsed)
+                time.sleep(0.05)
+
+        self.last_wall_time = time.perf_counter() - start
+        return results
+
+
+def _matmul_module(n):
+    A = te.placeholder((n, n), name="A")
+    B = te.placeholder((n, n), name="B")
+    k = te.reduce_axis((0, n), name="k")
+    C = te.compute((n, n), lambda i, j: te.sum(A[i, k] * B[k, j], axis=k), name="C")
+    func = te.create_prim_func([A, B, C]).with_attr("global_symbol", f"matmul_{n}")
+    return tvm.compile(tvm.IRModule({f"matmul_{n}": func}), target="llvm")
+
+
+def _demo_jobs(sizes):
+    jobs = []
+    for n in sizes:
+        a = np.random.rand(n, n).astype("float32")
+        b = np.random.rand(n, n).astype("float32")
+        c = np.zeros((n, n), dtype="float32")
+        jobs.append(BenchmarkJob(f"matmul_{n}", _matmul_module(n), [a, b, c]))
+    return jobs
+
+
+def demo_rpc_pool(num_servers=4, sizes=(128, 192, 256, 320, 384, 448, 512, 576)):
+    """对比单服务器串行测量与多服务器并行测量的总耗时"""
+    print("=== 本地多服务器 RPC 池演示 ===")
+    jobs = _demo_jobs(sizes)
+
+    for servers in (1, num_servers):
+        # 每个服务器绑定相同数量的核，保证串行与并行测量结果可比
+        cpu_sets = split_cpus(num_servers)[:servers]
+        with LocalRPCCluster(num_servers=servers, cpu_sets=cpu_sets) as cluster:
+            print(f"\n{servers} 个服务器, CPU 集合: {cluster.cpu_sets}")
+            scheduler = RPCBenchmarkScheduler(cluster, timeout=60, max_retries=1)
+            results = scheduler.run(jobs)
+            ok = sum(r["status"] == "ok" for r in results)
+            print(f"完成 {ok} / {len(results)} 个任务，总耗时 {scheduler.last_wall_time:.2f} s")
+
+
+if __name__ == "__main__":
+    demo_rpc_pool()
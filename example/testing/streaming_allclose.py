@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块流式 assert_allclose
+
+tvm.testing.assert_allclose 基于 np.testing.assert_allclose，会为 abs(actual - desired)
+和容差掩码创建与输入同样大小的临时数组。对于 LLM logits、激活值转储等 GB 级输出，
+峰值内存会翻两三倍且速度较慢。
+
+assert_allclose_chunked 按缓存大小的块处理张量：
+- 所有临时结果写入预分配的临时缓冲区，额外内存与输入大小无关
+- 直接接受 tvm NDArray、NumPy 数组和 np.memmap，不做整体转换
+- 可在发现前 N 个不匹配后提前终止，同时报告最大绝对/相对误差和不匹配数量
+"""
+
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import tvm
+import tvm.testing
+
+
+# 每个临时缓冲区的默认大小，约为 L2 缓存量级
+DEFAULT_CHUNK_BYTES = 256 * 1024
+
+
+def _is_ndarray(value):
+    return isinstance(value, tvm.nd.NDArray)
+
+
+def _flat_chunks(value, chunk_elems):
+    """
+    按块产出扁平化的一维 NumPy 视图
+
+    - NumPy 数组 / memmap：连续时直接切片视图，不拷贝；非连续时逐块拷贝
+    - CPU NDArray：优先通过 DLPack 零拷贝得到 NumPy 视图
+    - 其他设备上的 NDArray：用 _create_view 切出每块后只拷贝该块到主机
+    """
+    if _is_ndarray(value):
+        if value.device.device_type == tvm.cpu().device_type:
+            try:
+                value = np.from_dlpack(value)
+            except (TypeError, AttributeError, BufferError):
+                pass
+        if _is_ndarray(value):
+            yield from _ndarray_chunks(value, chunk_elems)
+            return
+
+    array = np.asarray(value)
+    if array.flags.c_contiguous:
+        flat = array.reshape(-1)
+        for start in range(0, flat.size, chunk_elems):
+            yield flat[start:start + chunk_elems]
+        return
+
+    # flatiter 切片按 C 顺序只拷贝这一块，保证与连续输入的分块边界一致
+    for start in range(0, array.size, chunk_elems):
+        yield array.flat[start:start + chunk_elems]
+
+
+def _ndarray_chunks(value, chunk_elems):
+    """逐块拷贝 NDArray 到主机；旧版本 TVM 没有 _create_view 时只能整体拷贝"""
+    if not hasattr(value, "_create_view"):
+        yield from _flat_chunks(value.numpy(), chunk_elems)
+        return
+    total = int(np.prod(value.shape, dtype=np.int64))
+    itemsize = np.dtype(value.dtype).itemsize
+    for start in range(0, total, chunk_elems):
+        n = min(chunk_elems, total - start)
+        yield value._create_view((n,), value.dtype, start * itemsize).numpy()
+
+
+def _shape_and_dtype(value):
+    if _is_ndarray(value):
+        return tuple(value.shape), np.dtype(value.dtype)
+    array = np.asarray(value)
+    return array.shape, array.dtype
+
+
+def assert_allclose_chunked(
+    actual,
+    desired,
+    rtol=1e-7,
+    atol=1e-7,
+    chunk_bytes=DEFAULT_CHUNK_BYTES,
+    max_mismatches=None,
+):
+    """
+    分块比较两个张量是否在容差内相等，判定规则与 tvm.testing.assert_allclose 相同：
+    |actual - desired| <= atol + rtol * |desired|，NaN 与 NaN 视为相等
+
+    参数:
+        actual: 实际结果，NDArray / np.ndarray / np.memmap
+        desired: 期望结果，类型同上
+        rtol: 相对容差
+        atol: 绝对容差
+        chunk_bytes: 每个临时缓冲区的字节数
+        max_mismatches: 发现该数量的不匹配后提前终止；None 表示完整扫描
+    返回:
+        统计字典 {'max_abs_error', 'max_rel_error', 'mismatches', 'checked', 'total', 'first_mismatches'}
+    异常:
+        AssertionError: 存在超出容差的元素
+    """
+    actual_shape, actual_dtype = _shape_and_dtype(actual)
+    desired_shape, desired_dtype = _shape_and_dtype(desired)
+    if actual_shape != desired_shape:
+        raise AssertionError(f"形状不一致: actual {actual_shape} vs desired {desired_shape}")
+
+    work_dtype = np.result_type(actual_dtype, desired_dtype, np.float32)
+    chunk_elems = max(1, chunk_bytes // work_dtype.itemsize)
+    total = int(np.prod(actual_shape, dtype=np.int64))
+
+    # 预分配的临时缓冲区，整个比较过程中复用
+    diff_buf = np.empty(chunk_elems, dtype=work_dtype)
+    abs_desired_buf = np.empty(chunk_elems, dtype=work_dtype)
+    tmp_buf = np.empty(chunk_elems, dtype=work_dtype)
+    mask_buf = np.empty(chunk_elems, dtype=bool)
+    aux_buf = np.empty(chunk_elems, dtype=bool)
+    is_float = np.issubdtype(work_dtype, np.floating)
+
+    max_abs = 0.0
+    max_rel = 0.0
+    mismatches = 0
+    checked = 0
+    first_mismatches = []
+    # 无论是否提前终止，都记录若干个不匹配位置用于报告
+    record_limit = max_mismatches if max_mismatches is not None else 10
+
+    # inf - inf 等运算产生的 NaN 已在下面单独处理
+    with np.errstate(invalid="ignore"):
+        for a, d in zip(_flat_chunks(actual, chunk_elems), _flat_chunks(desired, chunk_elems)):
+            n = a.size
+            diff, abs_d, tmp = diff_buf[:n], abs_desired_buf[:n], tmp_buf[:n]
+            mask, aux = mask_buf[:n], aux_buf[:n]
+
+            np.subtract(a, d, out=diff, dtype=work_dtype)
+            np.abs(diff, out=diff)
+            np.abs(d, out=abs_d, dtype=work_dtype)
+            np.multiply(abs_d, rtol, out=tmp)
+            np.add(tmp, atol, out=tmp)
+            np.greater(diff, tmp, out=mask)
+
+            if is_float:
+                # 掩码已经算出，之后可以借用 tmp 的存储；只有一侧为 NaN 时视为不匹配
+                np.not_equal(np.isnan(a, out=aux), np.isnan(d, out=tmp.view(bool)[:n]), out=aux)
+                np.logical_or(mask, aux, out=mask)
+                # 无穷值必须严格相等（inf - inf 为 NaN，上面的比较无法识别）
+                np.isinf(d, out=aux)
+                np.logical_and(aux, np.not_equal(a, d, out=tmp.view(bool)[:n]), out=aux)
+                np.logical_or(mask, aux, out=mask)
+
+            chunk_max_abs = np.fmax.reduce(diff) if n else 0.0
+            np.not_equal(abs_d, 0, out=aux)
+            np.divide(diff, abs_d, out=tmp, where=aux)
+            np.logical_not(aux, out=aux)
+            np.copyto(tmp, 0, where=aux)
+            chunk_max_rel = np.fmax.reduce(tmp) if n else 0.0
+            max_abs = max(max_abs, float(chunk_max_abs))
+            max_rel = max(max_rel, float(chunk_max_rel))
+
+            chunk_mismatches = int(np.count_nonzero(mask))
+            if chunk_mismatches:
+                if len(first_mismatches) < record_limit:
+                    for offset in np.flatnonzero(mask)[: record_limit - len(first_mismatches)]:
+                        index = np.unravel_index(checked + int(offset), actual_shape)
+                        first_mismatches.append(tuple(int(i) for i in index))
+                mismatches += chunk_mismatches
+            checked += n
+            if max_mismatches is not None and mismatches >= max_mismatches:
+                break
+
+    stats = {
+        "max_abs_error": max_abs,
+        "max_rel_error": max_rel,
+        "mismatches": mismatches,
+        "checked": checked,
+        "total": total,
+        "first_mismatches": first_mismatches,
+    }
+    if mismatches:
+        scope = "" if checked == total else f"（提前终止，仅检查了前 {checked} 个元素）"
+        lines = [
+            f"Not equal to tolerance rtol={rtol:g}, atol={atol:g}{scope}",
+            f"Mismatched elements: {mismatches} / {checked} ({mismatches / max(checked, 1):.3%})",
+            f"Max absolute difference: {max_abs:g}",
+            f"Max relative difference: {max_rel:g}",
+        ]
+        if first_mismatches:
+            lines.append(f"First mismatched indices: {first_mismatches[:10]}")
+        raise AssertionError("\n".join(lines))
+    return stats
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+    except AssertionError:
+        pass
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def demo_streaming_allclose(num_elements=64 * 1024 * 1024):
+    """对比 tvm.testing.assert_allclose 与分块实现的耗时和额外峰值内存"""
+    print("=== 分块流式 assert_allclose 演示 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        actual = np.memmap(f"{tmp_dir}/actual.bin", dtype="float32", mode="w+", shape=(num_elements,))
+        desired = np.memmap(f"{tmp_dir}/desired.bin", dtype="float32", mode="w+", shape=(num_elements,))
+        rng = np.random.default_rng(0)
+        for start in range(0, num_elements, 1 << 20):
+            block = rng.standard_normal(min(1 << 20, num_elements - start), dtype=np.float32)
+            desired[start:start + block.size] = block
+            actual[start:start + block.size] = block + 1e-6
+        actual[num_elements // 2] += 1.0
+
+        size_mb = num_elements * 4 / (1024 * 1024)
+        print(f"张量大小: {size_mb:.0f} MB x 2 (memmap)")
+
+        t, peak = _measure(lambda: tvm.testing.assert_allclose(actual, desired, rtol=1e-5, atol=1e-5))
+        print(f"tvm.testing.assert_allclose: {t:.2f} s, 额外峰值内存 {peak / (1024 * 1024):.1f} MB")
+
+        t, peak = _measure(lambda: assert_allclose_chunked(actual, desired, rtol=1e-5, atol=1e-5))
+        print(f"assert_allclose_chunked:     {t:.2f} s, 额外峰值内存 {peak / (1024 * 1024):.1f} MB")
+
+        t, peak = _measure(
+            lambda: assert_allclose_chunked(actual, desired, rtol=1e-5, atol=1e-5, max_mismatches=1)
+        )
+        print(f"首个不匹配即终止:            {t:.2f} s, 额外峰值内存 {peak / (1024 * 1024):.1f} MB")
+
+        try:
+            assert_allclose_chunked(actual, desired, rtol=1e-5, atol=1e-5)
+        except AssertionError as e:
+            print(f"\n报告示例:\n{e}")
+
+
+if __name__ == "__main__":
+    demo_streaming_allclose()
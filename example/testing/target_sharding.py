@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目标参数化测试的分片与并行调度插件
+
+parametrize_targets / enabled_targets 与 pytest_generate_tests 会为每个 target × 参数组合
+生成一个测试项，这些测试项在单个进程中串行执行，并各自编译自己的模块。
+本插件在 TVM 已有的 pytest 钩子之上提供分片调度：
+- 分组：同一测试函数、同一 target 的测试项归为一组，共享编译产物的测试项落在同一进程中，
+  配合 tvm_artifact_cache 固件，每个工作进程对同一产物只编译一次
+- 排序：pytest_sessionfinish 时记录每组的历史耗时，下次按耗时从长到短调度（LPT），缩短总墙钟时间
+- 分发：
+  * 安装 pytest-xdist 时，为测试项添加 xdist_group 标记，配合 `-n N --dist loadgroup` 使用
+  * 未安装时，`--tvm-shard=i/N` 按历史耗时做静态装箱，本文件的命令行入口并行启动 N 个 pytest 进程
+
+用法:
+    pytest -p target_sharding -n 8 --dist loadgroup tests/python/relax
+    python target_sharding.py --shards 8 -- tests/python/relax
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import pytest
+
+
+DEFAULT_DURATIONS_FILE = ".tvm_test_durations.json"
+# 历史耗时的指数滑动平均系数
+DURATION_EMA_ALPHA = 0.5
+
+# pytest_runtest_logreport 只接收 report，通过这里访问 config
+_CONFIG = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("tvm-sharding", "TVM 目标参数化测试分片")
+    group.addoption(
+        "--tvm-shard",
+        default=None,
+        help="只运行第 i 个分片，格式为 i/N（从 0 开始）",
+    )
+    group.addoption(
+        "--tvm-durations-file",
+        default=DEFAULT_DURATIONS_FILE,
+        help="历史耗时记录文件，用于按耗时排序与装箱",
+    )
+    group.addoption(
+        "--tvm-no-record-durations",
+        action="store_true",
+        default=False,
+        help="会话结束时不更新历史耗时记录",
+    )
+    group.addoption(
+        "--tvm-observed-file",
+        default=None,
+        help="会话结束时只把本次实测的分组耗时写入该文件，不更新历史记录（供分片进程使用）",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "tvm_artifact_group(name): 显式指定共享编译产物的分组名称"
+    )
+    config._tvm_durations = _load_durations(config.getoption("tvm_durations_file"))
+    config._tvm_observed = defaultdict(float)
+    _CONFIG["config"] = config
+
+
+def _load_durations(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def artifact_group(item):
+    """
+    返回测试项所属的编译产物分组
+
+    默认为 "文件::测试函数[target]"，与 parametrize_targets 生成的 target 参数对应；
+    可以用 @pytest.mark.tvm_artifact_group("name") 显式覆盖。
+    """
+    marker = item.get_closest_marker("tvm_artifact_group")
+    if marker is not None and marker.args:
+        base = str(marker.args[0])
+    else:
+        base = item.nodeid.split("[", 1)[0]
+    callspec = getattr(item, "callspec", None)
+    target = callspec.params.get("target") if callspec is not None else None
+    return f"{base}[{target}]" if target is not None else base
+
+
+def _parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise pytest.UsageError(f"--tvm-shard={value} 格式无效，应为 i/N，如 0/4") from None
+    if not 0 <= index < count:
+        raise pytest.UsageError(f"--tvm-shard={value} 无效，应满足 0 <= i < N")
+    return index, count
+
+
+def assign_shards(group_weights, num_shards):
+    """LPT 装箱：按权重从大到小，依次放入当前负载最小的分片"""
+    loads = [0.0] * num_shards
+    assignment = {}
+    for group, weight in sorted(group_weights.items(), key=lambda kv: (-kv[1], kv[0])):
+        shard = min(range(num_shards), key=lambda s: (loads[s], s))
+        assignment[group] = shard
+        loads[shard] += weight
+    return assignment, loads
+
+
+# xdist 的 loadgroup 调度在自己的钩子中按 xdist_group 标记改写 nodeid，标记必须在它之前添加
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(session, config, items):
+    durations = config._tvm_durations
+    groups = defaultdict(list)
+    for item in items:
+        groups[artifact_group(item)].append(item)
+
+    # 没有历史记录的分组使用已知分组耗时的中位数估计（记录的是整组耗时，不再乘以测试项数）
+    known = sorted(durations.values())
+    default_weight = known[len(known) // 2] if known else 1.0
+    weights = {group: durations.get(group, default_weight) for group in groups}
+
+    shard_option = config.getoption("tvm_shard")
+    if shard_option:
+        index, count = _parse_shard(shard_option)
+        assignment, _ = assign_shards(weights, count)
+        selected = [item for item in items if assignment[artifact_group(item)] == index]
+        deselected = [item for item in items if assignment[artifact_group(item)] != index]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+    # 同组测试项相邻，组间按历史耗时从长到短
+    order = {group: rank for rank, group in enumerate(sorted(weights, key=lambda g: (-weights[g], g)))}
+    items.sort(key=lambda item: order[artifact_group(item)])
+
+    if config.pluginmanager.hasplugin("xdist"):
+        for item in items:
+            item.add_marker(pytest.mark.xdist_group(name=artifact_group(item)))
+
+
+def pytest_runtest_setup(item):
+    # 分组名随报告一起转发，xdist 主进程无需重新计算
+    item.user_properties.append(("tvm_artifact_group", artifact_group(item)))
+
+
+def pytest_runtest_logreport(report):
+    # xdist 下工作进程的报告会转发到主进程，由主进程统一累计
+    config = _CONFIG.get("config")
+    if config is None:
+        return
+    group = dict(report.user_properties).get("tvm_artifact_group")
+    if group:
+        config._tvm_observed[group] += report.duration
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    # xdist 工作进程不写文件，由主进程统一记录
+    if hasattr(config, "workerinput") or config.getoption("tvm_no_record_durations"):
+        return
+    observed = config._tvm_observed
+    if not observed:
+        return
+
+    observed_file = config.getoption("tvm_observed_file")
+    if observed_file:
+        _write_json(observed_file, dict(observed))
+        return
+    path = config.getoption("tvm_durations_file")
+    _write_json(path, merge_observed(_load_durations(path), observed))
+
+
+def merge_observed(durations, observed):
+    """把本次实测的分组耗时以指数滑动平均并入历史记录，未观测到的分组保持不变"""
+    merged = dict(durations)
+    for group, duration in observed.items():
+        previous = merged.get(group)
+        merged[group] = duration if previous is None else (
+            DURATION_EMA_ALPHA * duration + (1 - DURATION_EMA_ALPHA) * previous
+        )
+    return merged
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@pytest.fixture(scope="session")
+def tvm_artifact_cache():
+    """
+    进程级编译产物缓存，同一工作进程内相同 key 只构建一次
+
+    用法:
+        def test_add(tvm_artifact_cache, target, dev):
+            ex = tvm_artifact_cache((mod_key, str(target)), lambda: tvm.compile(mod, target))
+    """
+    cache = {}
+
+    def get_or_build(key, build):
+        if key not in cache:
+            cache[key] = build()
+        return cache[key]
+
+    return get_or_build
+
+
+def run_sharded(pytest_args, num_shards, durations_file=DEFAULT_DURATIONS_FILE):
+    """
+    不依赖 pytest-xdist，并行启动 num_shards 个 pytest 进程，每个进程运行一个分片
+
+    各分片从同一个历史记录文件读取耗时（装箱结果在所有分片间一致），只把本次实测的分组耗时
+    写入各自的临时文件；全部结束后由本进程把实测值并入历史记录，避免并发写同一文件。
+    返回:
+        所有分片中最大的退出码；没有收集到测试的分片（退出码 5）按 0 计，全部分片都是 5 时返回 5
+    """
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [plugin_dir, env.get("PYTHONPATH")]))
+
+    start = time.perf_counter()
+    procs = []
+    for index in range(num_shards):
+        shard_file = f"{durations_file}.shard{index}"
+        if os.path.exists(shard_file):
+            os.remove(shard_file)
+        cmd = [
+            sys.executable, "-m", "pytest", "-p", "target_sharding",
+            f"--tvm-shard={index}/{num_shards}",
+            f"--tvm-durations-file={durations_file}",
+            f"--tvm-observed-file={shard_file}",
+            *pytest_args,
+        ]
+        procs.append((index, shard_file, subprocess.Popen(cmd, env=env)))
+
+    exit_codes = []
+    observed = {}
+    for index, shard_file, proc in procs:
+        exit_codes.append(proc.wait())
+        # 各分片的分组互不相交，只合并实际观测到的分组
+        observed.update(_load_durations(shard_file))
+        if os.path.exists(shard_file):
+            os.remove(shard_file)
+    if observed:
+        _write_json(durations_file, merge_observed(_load_durations(durations_file), observed))
+
+    # 分片数多于分组数时部分分片没有测试（退出码 5），只有所有分片都没有收集到测试时才返回 5
+    no_tests = int(pytest.ExitCode.NO_TESTS_COLLECTED)
+    if all(code == no_tests for code in exit_codes):
+        exit_code = no_tests
+    else:
+        exit_code = max(0 if code == no_tests else code for code in exit_codes)
+
+    print(f"{num_shards} 个分片完成，总耗时 {time.perf_counter() - start:.1f} s，退出码 {exit_code}")
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行分片运行 TVM 目标参数化测试")
+    parser.add_argument("--shards", type=int, default=os.cpu_count(), help="分片（进程）数")
+    parser.add_argument("--durations-file", default=DEFAULT_DURATIONS_FILE, help="历史耗时记录文件")
+    parser.add_argument("pytest_args", nargs=argparse.REMAINDER, help="传给 pytest 的参数，放在 -- 之后")
+    args = parser.parse_args()
+    pytest_args = args.pytest_args[1:] if args.pytest_args[:1] == ["--"] else args.pytest_args
+    sys.exit(run_sharded(pytest_args, args.shards, args.durations_file))
+
+
+if __name__ == "__main__":
+    main()